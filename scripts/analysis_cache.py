@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for analyzer results
+Keyed by the normalized page text, the page's structured product data, the
+domain and a fingerprint of the analyzer rules, so repeated fetches of the same page skip re-analysis
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "trusted-shopper", "analysis.sqlite")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Rule sources whose contents define the analyzer version: editing any
+# keyword list, pattern or score weight changes the fingerprint and so
+# invalidates every cached result.
+RULE_FILES = ["analyze_from_html.py"]
+# Module-level tables that importers can replace at run time (see bulk_scoring.py)
+RULE_TABLES = ["SCORE_WEIGHTS", "GST_RATE"]
+
+def rules_fingerprint():
+    """
+    SHA-256 over the analyzer rule sources, plus the RULE_TABLES of the
+    loaded analyzer as they are now, so a weights table changed in process
+    gets its own cache entries.
+    """
+    h = hashlib.sha256()
+    base = os.path.dirname(os.path.abspath(__file__))
+    for name in RULE_FILES:
+        with open(os.path.join(base, name), "rb") as f:
+            h.update(name.encode() + b"\0" + f.read())
+    main = sys.modules.get("__main__")
+    if "analyze_from_html" not in sys.modules and hasattr(main, "HtmlAnalyzer"):
+        analyzer = main  # analyze_from_html.py run as a script
+    else:
+        import analyze_from_html as analyzer
+    h.update(json.dumps({name: getattr(analyzer, name) for name in RULE_TABLES}, sort_keys=True).encode())
+    return h.hexdigest()
+
+class AnalysisCache:
+    """
+    SQLite-backed result cache with size-bounded LRU eviction.
+
+    Safe to share between threads, and between processes that open the same
+    file (WAL mode). Entries written under a different rules fingerprint are
+    purged on open.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.fingerprint = rules_fingerprint()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis ("
+            " key TEXT PRIMARY KEY, fingerprint TEXT, result TEXT,"
+            " size INTEGER, last_access REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS analysis_lru ON analysis(last_access)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+        with self._conn:
+            self._conn.execute("DELETE FROM analysis WHERE fingerprint != ?", (self.fingerprint,))
+
+    def key(self, text, domain, structured=None):
+        h = hashlib.sha256()
+        h.update(self.fingerprint.encode())
+        h.update(b"\0" + (domain or "").encode() + b"\0")
+        if structured:
+            h.update(json.dumps(structured, sort_keys=True, ensure_ascii=False).encode("utf-8") + b"\0")
+        h.update(text.encode("utf-8", "surrogatepass"))
+        return h.hexdigest()
+
+    def get(self, text, domain, structured=None):
+        """Cached result for this page text (and structured data) on this domain, or None."""
+        key = self.key(text, domain, structured)
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT result FROM analysis WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                self._bump("misses")
+                return None
+            self._conn.execute("UPDATE analysis SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            self._bump("hits")
+        return json.loads(row[0])
+
+    def put(self, text, domain, result, structured=None):
+        payload = json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis (key, fingerprint, result, size, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (self.key(text, domain, structured), self.fingerprint, payload, len(payload.encode("utf-8")), time.time()),
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM analysis").fetchone()[0]
+        while total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM analysis ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM analysis WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def _bump(self, name):
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def stats(self):
+        """Hit/miss counters for this session and for the cache file overall."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analysis"
+            ).fetchone()
+            lifetime = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "lifetime_hits": lifetime.get("hits", 0),
+            "lifetime_misses": lifetime.get("misses", 0),
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM analysis")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the analysis result cache")
+    parser.add_argument("--path", default=DEFAULT_CACHE_PATH, help="Cache file")
+    parser.add_argument("--clear", action="store_true", help="Delete all cached results")
+    args = parser.parse_args()
+
+    cache = AnalysisCache(args.path)
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {args.path}", file=sys.stderr)
+    print(json.dumps({"path": args.path, "fingerprint": cache.fingerprint, **cache.stats()}, indent=2))
+    cache.close()
+
+if __name__ == "__main__":
+    main()
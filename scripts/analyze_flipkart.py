@@ -5,16 +5,36 @@ Fetches product page HTML and runs trustworthiness analysis
 """
 
 import sys
-import os
 import json
-import subprocess
-import tempfile
 from playwright.sync_api import sync_playwright
 from playwright_stealth import Stealth
 
-def fetch_flipkart_product(url):
-    """Fetch Flipkart product page with enhanced stealth"""
+from analysis_cache import AnalysisCache
+from analyze_from_html import HtmlAnalyzer
+from deadline import Deadline
+from page_archive import PageArchive
+from rate_limiter import RateLimiter
+
+# Per-domain politeness and 429/503 backoff for product page loads
+LIMITER = RateLimiter()
+MAX_ATTEMPTS = 2
+
+def fetch_flipkart_product(url, deadline=None):
+    """Fetch Flipkart product page with enhanced stealth, retrying once after a throttle if the deadline allows"""
+    deadline = deadline or Deadline()
+    for attempt in range(MAX_ATTEMPTS):
+        html, throttled = _load_product_page(url, deadline)
+        if not throttled or attempt == MAX_ATTEMPTS - 1 or deadline.expired:
+            return html
+        print(f"Rate limited on {url}, retrying after backoff...", file=sys.stderr)
+    return None
+
+def _load_product_page(url, deadline):
+    """(html, throttled) for one page load; throttled means a 429/503 was reported to LIMITER"""
     try:
+        # Wait for this domain's token (and any backoff) before starting a browser, unless it outlasts the deadline
+        LIMITER.wait(url, deadline)
+        
         with sync_playwright() as p:
             browser = p.chromium.launch(
                 headless=True,
@@ -40,8 +60,10 @@ def fetch_flipkart_product(url):
             stealth_config = Stealth()
             stealth_config.apply_stealth_sync(page)
             
-            # Navigate
-            page.goto(url, wait_until='domcontentloaded', timeout=30000)
+            response = page.goto(url, wait_until='domcontentloaded', timeout=deadline.cap_ms(30000))
+            if response is not None and LIMITER.feedback(url, response.status, response.headers.get("retry-after")) is not None:
+                browser.close()
+                return None, True
             
             # Simulate human behavior
             page.wait_for_timeout(2000)
@@ -51,57 +73,53 @@ def fetch_flipkart_product(url):
             html = page.content()
             browser.close()
             
-            return html
+            return html, False
             
     except Exception as e:
         print(f"Error fetching {url}: {e}", file=sys.stderr)
-        return None
+        return None, False
 
-def analyze_flipkart_product(url):
-    """Fetch and analyze a Flipkart product page"""
+def analyze_flipkart_product(url, analyzer=None, archive=None, replay=False, deadline=None):
+    """Fetch and analyze a Flipkart product page (recorded to / replayed from `archive` when given)"""
     
-    # Fetch HTML
-    html = fetch_flipkart_product(url)
+    # Fetch HTML, or take the archived copy when replaying
+    if replay:
+        hit = archive.get(url)
+        if hit is None:
+            print(f"{url} is not in archive {archive.root}", file=sys.stderr)
+            return None
+        html = hit[0].decode("utf-8", errors="replace")
+    else:
+        html = fetch_flipkart_product(url, deadline)
+        if html and archive is not None:
+            archive.put(url, html.encode("utf-8"), kind="browser_page")
     if not html:
         return None
     
-    # Save to temp file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-        f.write(html)
-        tmp_file = f.name
-    
+    # Run analyzer in-process on the fetched HTML
     try:
-        # Run analyzer
-        analyzer_path = os.path.join(os.path.dirname(__file__), "analyze_from_html.py")
-        result = subprocess.run(
-            ["python3", analyzer_path, "--url", url, "--html_file", tmp_file],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        
-        if result.returncode == 0:
-            return json.loads(result.stdout)
-        else:
-            print(f"Analyzer error: {result.stderr}", file=sys.stderr)
-            return None
-            
-    finally:
-        # Cleanup
-        try:
-            os.unlink(tmp_file)
-        except:
-            pass
+        return (analyzer or HtmlAnalyzer()).analyze(url, html)
+    except Exception as e:
+        print(f"Analyzer error: {e}", file=sys.stderr)
+        return None
 
 def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Analyze Flipkart product page')
     parser.add_argument('--url', required=True, help='Product URL')
+    parser.add_argument('--analysis-cache', help='Reuse analyzer results from this cache (SQLite file)')
+    parser.add_argument('--archive', metavar='DIR', help='Record the rendered page into this page archive')
+    parser.add_argument('--replay', metavar='DIR', help='Analyze the archived page from DIR instead of opening a browser')
+    parser.add_argument('--timeout', type=float, help='Seconds the page load may take in total (caps waits and the retry)')
     
     args = parser.parse_args()
     
-    result = analyze_flipkart_product(args.url)
+    cache = AnalysisCache(args.analysis_cache) if args.analysis_cache else None
+    archive_dir = args.replay or args.archive
+    archive = PageArchive(archive_dir) if archive_dir else None
+    result = analyze_flipkart_product(args.url, HtmlAnalyzer(cache=cache), archive, replay=bool(args.replay),
+                                      deadline=Deadline(args.timeout))
     
     if result:
         print(json.dumps(result, ensure_ascii=False, indent=2))
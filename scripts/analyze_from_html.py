@@ -1,119 +1,812 @@
+import os
 import re
+import sys
 import json
+import time
 import argparse
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from html import unescape
 from urllib.parse import urlparse
 
+import profiling
+from analysis_cache import AnalysisCache
+from profiling import stage
+
+# All patterns are compiled once at import time so a long-lived process
+# (see HtmlAnalyzer / analyze_html below) never pays for recompilation.
+# They must stay linear-time on hostile input: a pattern that starts with a
+# repeated class (\d+, [\d,]+, a name) is anchored with a lookbehind so a
+# long run is tried once, not from every position inside it.
+NUMBER_RE = re.compile(r"[\d,]+")
+
+PRICE_PATTERNS = [
+    re.compile(r"(₹\s?\d[\d,]*(?:\.\d{1,2})?)"),
+    re.compile(r"(\$\s?\d[\d,]*(?:\.\d{1,2})?)"),
+    re.compile(r"(€\s?\d[\d,]*(?:\.\d{1,2})?)"),
+]
+
+RETURN_DAY_PATTERNS = [
+    re.compile(r"(?<!\d)(\d+)\s*days?\s*(return|replacement|refund|exchange)"),
+    re.compile(r"(return|replacement|refund|exchange)\s*within\s*(\d+)\s*days?"),
+    re.compile(r"(?<!\d)(\d+)[-\s]day\s*(return|replacement|refund)"),
+]
+
+WARRANTY_PATTERNS = [
+    re.compile(r"(?<!\d)(\d+)\s*(year|yr|years|yrs)\s*(warranty|guarantee)"),
+    re.compile(r"(?<!\d)(\d+)\s*(month|months|mo|mos)\s*(warranty|guarantee)"),
+    re.compile(r"(warranty|guarantee)\s*[:\-]?\s*(\d+)\s*(year|yr|month|mo)"),
+    re.compile(r"(?<!\d)(\d+)[-\s](year|month)\s*(warranty|guarantee)"),
+]
+
+DELIVERY_PATTERNS = [
+    re.compile(r"delivery\s*(?:charge|fee|cost)[:\s]*₹?\s*([\d,]+)"),
+    re.compile(r"shipping\s*(?:charge|fee|cost)[:\s]*₹?\s*([\d,]+)"),
+    re.compile(r"₹\s*([\d,]+)\s*(?:delivery|shipping)"),
+]
+
+INSTALLATION_PATTERNS = [
+    re.compile(r"installation\s*(?:charge|fee|cost)[:\s]*₹?\s*([\d,]+)"),
+    re.compile(r"₹\s*([\d,]+)\s*installation"),
+]
+
+CONVENIENCE_PATTERNS = [
+    re.compile(r"convenience\s*fee[:\s]*₹?\s*([\d,]+)"),
+    re.compile(r"platform\s*fee[:\s]*₹?\s*([\d,]+)"),
+    re.compile(r"service\s*fee[:\s]*₹?\s*([\d,]+)"),
+    re.compile(r"handling\s*(?:charge|fee)[:\s]*₹?\s*([\d,]+)"),
+]
+
+PACKAGING_PATTERNS = [
+    re.compile(r"packaging\s*(?:charge|fee)[:\s]*₹?\s*([\d,]+)"),
+]
+
+COD_PATTERN = re.compile(r"cod\s*(?:charge|fee)[:\s]*₹?\s*([\d,]+)")
+
+# Longer day/month counts are not real durations, and int() refuses digit
+# runs past 4300 characters on Python 3.11+
+MAX_DURATION_DIGITS = 6
+
+# Keyword tables. Every list here is compiled into KEYWORD_MATCHER, so a
+# single scan of the page answers all "is this phrase present" questions.
+RETURN_SNIPPET_KEYWORDS = ["return", "refund", "replacement", "warranty", "cancel"]
+REVIEW_KEYWORDS = ["review", "rating", "stars"]
+
+# score(): deal truth
+DISCOUNT_KEYWORDS = ["% off", "discount", "sale"]
+REFERENCE_PRICE_KEYWORDS = ["mrp", "list price", "was", "previous price"]
+
+# score(): review integrity
+RECENT_REVIEW_KEYWORDS = ["january", "february", "march", "april", "may", "june",
+                          "july", "august", "september", "october", "november", "december",
+                          "jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec",
+                          "ago", "days ago", "weeks ago", "month ago", "months ago"]
+AUTHENTIC_REVIEW_KEYWORDS = ["defect", "damage", "broken", "packaging", "delivery", "service",
+                             "customer care", "return", "refund", "issue", "problem", "complaint",
+                             "shipped", "arrived", "received", "quality", "build quality"]
+PHOTO_REVIEW_KEYWORDS = ["verified purchase", "customer image", "customer photo", "uploaded",
+                         "image from", "photo from", "review photo", "review image"]
+GENERIC_PRAISE_KEYWORDS = ["excellent product", "great product", "amazing product", "superb product",
+                           "highly recommend", "worth buying", "must buy", "very good", "fantastic"]
+HYPE_KEYWORDS = ["best ever", "100% recommended", "life changing", "miracle product",
+                 "perfect in every way", "flawless", "zero complaints"]
+
+# score(): store safety
+URGENCY_KEYWORDS = ["limited time", "act now", "only today", "hurry", "last chance"]
+
+# analyze_return_policy()
+REFUND_KEYWORDS = ["refund", "money back"]
+REPLACEMENT_KEYWORDS = ["replacement", "exchange"]
+NON_RETURNABLE_KEYWORDS = ["no return", "non-returnable", "final sale"]
+FREE_PICKUP_KEYWORDS = ["free pickup", "free return pickup", "pickup at doorstep"]
+PICKUP_KEYWORDS = ["pickup"]
+DROP_OFF_KEYWORDS = ["drop off", "dropoff", "self return", "courier"]
+FREE_KEYWORDS = ["free"]
+HASSLE_FREE_KEYWORDS = ["no questions asked", "hassle free", "easy return"]
+RETURN_CONDITION_KEYWORDS = ["original packaging", "unopened", "unused", "tags attached"]
+
+# analyze_warranty_support()
+BRAND_WARRANTY_KEYWORDS = ["brand warranty", "manufacturer warranty", "company warranty", "official warranty"]
+SELLER_WARRANTY_KEYWORDS = ["seller warranty", "platform warranty", "amazon fulfilled", "flipkart assured"]
+SERVICE_CENTER_KEYWORDS = [
+    "service center", "service centre", "authorized service", 
+    "repair center", "customer service center", "after sales service",
+    "service network", "nationwide service", "pan india service"
+]
+NATIONWIDE_KEYWORDS = ["nationwide", "pan india", "all cities", "across india"]
+INSTALLATION_KEYWORDS = [
+    "free installation", "installation service", "installation support",
+    "installation included", "demo", "setup", "on-site installation"
+]
+OFFICIAL_STORE_KEYWORDS = ["official store", "brand store", "authorized seller", "authorized dealer"]
+EXTENDED_WARRANTY_KEYWORDS = ["extended warranty", "additional warranty", "warranty extension"]
+
+# analyze_hidden_costs()
+FREE_DELIVERY_KEYWORDS = ["free delivery", "free shipping", "no delivery charge"]
+DELIVERY_KEYWORDS = ["delivery", "shipping"]
+FREE_INSTALLATION_KEYWORDS = ["free installation", "installation included", "no installation charge"]
+GST_INCLUDED_KEYWORDS = ["inclusive of all taxes", "inclusive of gst", "including tax", "tax included"]
+GST_EXCLUDED_KEYWORDS = ["exclusive of tax", "excluding gst", "plus gst", "+ gst", "taxes extra"]
+COD_KEYWORDS = ["cod charge", "cash on delivery charge", "cod fee"]
+
+# Top-level domains common among throwaway storefronts
+RISKY_TLDS = (".xyz", ".top", ".click")
+
+class KeywordHits:
+    """
+    Hit table produced by KeywordMatcher.scan(): per-keyword occurrence
+    counts and first match positions in the scanned (lowercased) text.
+
+    `end` limits a lookup to matches that finish at or before that offset,
+    which answers "k in lower[:end]" without slicing the text.
+    Keywords the matcher was not built with fall back to a direct search.
+    """
+
+    def __init__(self, lower, counts, first):
+        self._lower = lower
+        self._counts = counts
+        self._first = first
+
+    def first(self, keyword):
+        """Offset of the first occurrence of keyword, or -1."""
+        if keyword in self._first:
+            return self._first[keyword]
+        if keyword in self._counts:
+            return -1
+        return self._lower.find(keyword)
+
+    def count(self, keyword):
+        """Number of (possibly overlapping) occurrences of keyword."""
+        if keyword in self._counts:
+            return self._counts[keyword]
+        return sum(1 for _ in re.finditer("(?=%s)" % re.escape(keyword), self._lower))
+
+    def has(self, keyword, end=None):
+        idx = self.first(keyword)
+        if idx == -1:
+            return False
+        return end is None or idx + len(keyword) <= end
+
+    def any(self, keywords, end=None):
+        return any(self.has(k, end) for k in keywords)
+
+    def distinct(self, keywords, end=None):
+        """How many entries of keywords occur at least once."""
+        return sum(1 for k in keywords if self.has(k, end))
+
+class KeywordMatcher:
+    """
+    Multi-pattern substring matcher (Aho-Corasick semantics).
+
+    The keywords are folded into a prefix trie that is compiled to a single
+    regex, so the walk over the text runs inside the C regex engine rather
+    than a Python loop. The pattern sits in a lookahead, so matches that
+    overlap are all reported; at each position the longest keyword wins and
+    every keyword that is a prefix of it is credited too. One scan costs
+    about one pass over the text regardless of how many keywords there are.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = sorted(set(keywords))
+        trie = {}
+        for word in self.keywords:
+            node = trie
+            for ch in word:
+                node = node.setdefault(ch, {})
+            node[""] = True
+        self._regex = re.compile("(?=(%s))" % self._trie_pattern(trie))
+        self._longest = max((len(w) for w in self.keywords), default=0)
+        # Keywords that are prefixes of each keyword (itself included)
+        self._prefixes = {
+            word: [w for w in self.keywords if word.startswith(w)]
+            for word in self.keywords
+        }
+
+    @classmethod
+    def _trie_pattern(cls, node):
+        branches = [re.escape(ch) + cls._trie_pattern(child)
+                    for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:%s)" % "|".join(branches)
+        if "" in node:
+            # A keyword ends here; longer continuations are optional (greedy)
+            pattern = "(?:%s)?" % pattern
+        return pattern
+
+    def scan(self, lower: str) -> KeywordHits:
+        # One pass: count each distinct longest match and note where it first
+        # occurs; the text is never searched again per keyword. The pass runs
+        # in SCAN_SLICE pieces (each reading up to the longest keyword past
+        # its end) so the stage budget is checked between them.
+        found = {}
+        found_at = {}
+        size = len(lower)
+        for start in range(0, size, SCAN_SLICE):
+            stage_checkpoint()
+            stop = start + SCAN_SLICE
+            for m in self._regex.finditer(lower, start, min(size, stop + self._longest)):
+                if m.start() >= stop:
+                    break
+                word = m.group(1)
+                n = found.get(word)
+                if n is None:
+                    found[word] = 1
+                    found_at[word] = m.start()
+                else:
+                    found[word] = n + 1
+        counts = dict.fromkeys(self.keywords, 0)
+        first = {}
+        for word, n in found.items():
+            # The first occurrence of a keyword is the first occurrence of
+            # some longest match it is a prefix of.
+            pos = found_at[word]
+            for k in self._prefixes[word]:
+                counts[k] += n
+                if k not in first or pos < first[k]:
+                    first[k] = pos
+        return KeywordHits(lower, counts, first)
+
+KEYWORD_MATCHER = KeywordMatcher(
+    RETURN_SNIPPET_KEYWORDS + REVIEW_KEYWORDS
+    + DISCOUNT_KEYWORDS + REFERENCE_PRICE_KEYWORDS
+    + RECENT_REVIEW_KEYWORDS + AUTHENTIC_REVIEW_KEYWORDS + PHOTO_REVIEW_KEYWORDS
+    + GENERIC_PRAISE_KEYWORDS + HYPE_KEYWORDS + URGENCY_KEYWORDS
+    + REFUND_KEYWORDS + REPLACEMENT_KEYWORDS + NON_RETURNABLE_KEYWORDS
+    + FREE_PICKUP_KEYWORDS + PICKUP_KEYWORDS + DROP_OFF_KEYWORDS + FREE_KEYWORDS
+    + HASSLE_FREE_KEYWORDS + RETURN_CONDITION_KEYWORDS
+    + BRAND_WARRANTY_KEYWORDS + SELLER_WARRANTY_KEYWORDS + SERVICE_CENTER_KEYWORDS
+    + NATIONWIDE_KEYWORDS + INSTALLATION_KEYWORDS + OFFICIAL_STORE_KEYWORDS
+    + EXTENDED_WARRANTY_KEYWORDS
+    + FREE_DELIVERY_KEYWORDS + DELIVERY_KEYWORDS + FREE_INSTALLATION_KEYWORDS
+    + GST_INCLUDED_KEYWORDS + GST_EXCLUDED_KEYWORDS + COD_KEYWORDS
+)
+
+# Elements whose content is never visible page text
+SKIP_TAGS = ("script", "style", "noscript", "svg")
+SKIP_OPEN_RE = re.compile(r"<(%s)[\s/>]" % "|".join(SKIP_TAGS), re.I)
+SKIP_END_RES = {tag: re.compile(r"</%s[^>]*>" % tag, re.I) for tag in SKIP_TAGS}
+# Longest closing-tag prefix that may straddle a chunk boundary ("</noscript")
+SKIP_END_TAIL = max(len(tag) for tag in SKIP_TAGS) + 2
+# "<" followed by a tag name, "/", "!" or "?" opens markup; any other "<" is text
+MARKUP_START_RE = re.compile(r"<[A-Za-z/!?]")
+
+# Structured data picked up during the same pass
+LD_JSON_RE = re.compile(r"application/ld\+json", re.I)
+META_OPEN_RE = re.compile(r"<meta[\s/]", re.I)
+ATTR_RE = re.compile(r"""(?<![-A-Za-z0-9_:.])([A-Za-z_:][-A-Za-z0-9_:.]*)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+MAX_JSON_LD_SIZE = 512 * 1024
+
+# A "<" with no ">" within this many characters is text, not a tag, and a
+# comment with no "-->" within the comment limit ends there. Keeps the
+# carried-over buffer bounded on malformed or hostile markup.
+MAX_TAG_CHARS = 256 * 1024
+MAX_COMMENT_CHARS = 1024 * 1024
+
+class HtmlTextExtractor:
+    """
+    Single-pass, incremental HTML-to-text tokenizer.
+
+    Feed HTML in chunks of any size (e.g. straight from a streamed download)
+    and call close() to get (text, lower): whitespace-normalized visible text
+    and its lowercased twin. The markup is walked exactly once; content of
+    script/style/noscript/svg elements is skipped without being copied, and
+    only an unfinished tag is carried over between chunks.
+
+    Structured product data is collected on the way: application/ld+json
+    script bodies (json_ld), <meta property/name> tags (meta) and
+    itemprop/content attributes (microdata). See structured_data().
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._skip = None   # tag whose content is being dropped
+        self._scan = 0      # resume offset for an unterminated tag/comment
+        self._parts = []
+        self._capture = None  # JSON-LD body being collected
+        self._capture_size = 0
+        self.json_ld = []
+        self.meta = {}
+        self.microdata = {}
+
+    def _collect(self, piece):
+        self._capture_size += len(piece)
+        if self._capture_size <= MAX_JSON_LD_SIZE:
+            self._capture.append(piece)
+
+    def _read_attributes(self, tag):
+        attrs = {}
+        for m in ATTR_RE.finditer(tag):
+            value = m.group(2) if m.group(2) is not None else m.group(3) if m.group(3) is not None else m.group(4)
+            attrs.setdefault(m.group(1).lower(), value)
+        content = attrs.get("content")
+        if content is None:
+            return
+        content = unescape(content).strip()
+        if attrs.get("itemprop"):
+            self.microdata.setdefault(attrs["itemprop"], content)
+        key = attrs.get("property") or attrs.get("name")
+        if key:
+            self.meta.setdefault(key.lower(), content)
+
+    def feed(self, chunk: str):
+        if len(chunk) > FEED_SLICE:
+            # Large inputs go through in slices so the stage budget is checked between them
+            for start in range(0, len(chunk), FEED_SLICE):
+                self.feed(chunk[start:start + FEED_SLICE])
+            return
+        stage_checkpoint()
+        buf = self._buf + chunk if self._buf else chunk
+        parts = self._parts
+        pos = 0
+        n = len(buf)
+        while pos < n:
+            if self._skip:
+                m = SKIP_END_RES[self._skip].search(buf, pos)
+                if not m:
+                    # Keep just enough to match a closing tag split across chunks
+                    keep = max(pos, n - SKIP_END_TAIL - 64)
+                    if self._capture is not None:
+                        self._collect(buf[pos:keep])
+                    pos = keep
+                    break
+                if self._capture is not None:
+                    self._collect(buf[pos:m.start()])
+                    if self._capture_size <= MAX_JSON_LD_SIZE:
+                        self.json_ld.append("".join(self._capture))
+                    self._capture = None
+                pos = m.end()
+                self._skip = None
+                parts.append(" ")
+                continue
+
+            m = MARKUP_START_RE.search(buf, pos)
+            if m is None:
+                # Plain text to the end; hold back a "<" that may open markup
+                end = n - 1 if buf.endswith("<") else n
+                if end > pos:
+                    parts.append(buf[pos:end])
+                pos = end
+                break
+            lt = m.start()
+            if lt > pos:
+                parts.append(buf[pos:lt])
+                pos = lt
+
+            if buf.startswith("<!--", lt):
+                limit = lt + MAX_COMMENT_CHARS
+                end = buf.find("-->", max(lt + 4, self._scan - 2), limit + 3)
+                if end != -1:
+                    pos = end + 3
+                elif n >= limit + 3:
+                    pos = limit  # runaway comment: drop up to the limit
+                else:
+                    self._scan = max(lt + 4, n - 2)
+                    break
+            else:
+                limit = lt + MAX_TAG_CHARS
+                gt = buf.find(">", max(lt + 2, self._scan), limit)
+                if gt == -1:
+                    if n < limit:
+                        self._scan = n
+                        break
+                    # Runaway tag: the "<" was text after all. There is no ">"
+                    # before `limit`, so later tags resume the search there.
+                    self._scan = limit
+                    parts.append("<")
+                    pos = lt + 1
+                    continue
+                skip = SKIP_OPEN_RE.match(buf, lt)
+                if skip and buf[gt - 1] != "/":
+                    self._skip = skip.group(1).lower()
+                    if self._skip == "script" and LD_JSON_RE.search(buf, lt, gt):
+                        self._capture = []
+                        self._capture_size = 0
+                elif META_OPEN_RE.match(buf, lt) or buf.find("itemprop", lt, gt) != -1:
+                    self._read_attributes(buf[lt:gt])
+                pos = gt + 1
+            self._scan = 0
+            parts.append(" ")
+        # Rebase the resume offset onto the retained buffer
+        if self._scan:
+            self._scan = max(0, self._scan - pos)
+        self._buf = buf[pos:]
+
+    def close(self):
+        """Flush pending text and return (text, lower)."""
+        buf = self._buf
+        # Drop an unterminated tag/comment or skipped element at EOF
+        if buf and not self._skip and not MARKUP_START_RE.match(buf):
+            self._parts.append(buf)
+        raw = "".join(self._parts)
+        self._buf = ""
+        self._skip = None
+        self._scan = 0
+        self._parts = []
+        self._capture = None
+        if "&" in raw:
+            raw = unescape(raw)
+        text = " ".join(raw.split())
+        return text, text.lower()
+
+    def structured_data(self):
+        """Product fields from JSON-LD, microdata and OpenGraph (see parse_structured_data)."""
+        return parse_structured_data(self.json_ld, self.microdata, self.meta)
+
+def html_to_text(html: str):
+    """Return (text, lower) for a complete HTML document."""
+    extractor = HtmlTextExtractor()
+    extractor.feed(html)
+    return extractor.close()
+
+def parse_html(html: str):
+    """
+    Return (text, lower, structured) for a complete HTML document in one pass.
+
+    If the stage budget runs out part-way, StageOverrun carries what was
+    parsed so far.
+    """
+    extractor = HtmlTextExtractor()
+    try:
+        extractor.feed(html)
+    except StageOverrun:
+        text, lower = extractor.close()
+        raise StageOverrun((text, lower, extractor.structured_data()))
+    text, lower = extractor.close()
+    return text, lower, extractor.structured_data()
+
+CURRENCY_SYMBOLS = {"INR": "₹", "USD": "$", "EUR": "€"}
+
+def _ld_nodes(node):
+    """Every JSON object in a JSON-LD document, following lists and @graph."""
+    if isinstance(node, list):
+        for item in node:
+            yield from _ld_nodes(item)
+    elif isinstance(node, dict):
+        yield node
+        for key in ("@graph", "mainEntity", "itemOffered"):
+            if key in node:
+                yield from _ld_nodes(node[key])
+
+def _ld_is(node, type_name):
+    t = node.get("@type")
+    return t == type_name or (isinstance(t, list) and type_name in t)
+
+def _first(value):
+    return value[0] if isinstance(value, list) and value else value
+
+def _number(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = re.search(r"\d[\d,]*(?:\.\d+)?", value)
+        if match:
+            return float(match.group().replace(",", ""))
+    return None
+
+def _availability(value):
+    # "https://schema.org/InStock" -> "InStock"
+    if isinstance(value, str) and value:
+        return value.rstrip("/").rsplit("/", 1)[-1]
+    return None
+
+def parse_structured_data(json_ld, microdata, meta):
+    """
+    Merge product fields from JSON-LD Product/Offer blocks, schema.org
+    microdata and OpenGraph/product meta tags, in that order of preference.
+    Returns a dict with any of: name, price, currency, availability,
+    rating, review_count, plus the sources that contributed.
+    """
+    found = {}
+    sources = []
+
+    def merge(source, fields):
+        added = False
+        for key, value in fields.items():
+            if value not in (None, "") and key not in found:
+                found[key] = value
+                added = True
+        if added:
+            sources.append(source)
+
+    for block in json_ld:
+        try:
+            nodes = list(_ld_nodes(json.loads(block)))
+        except (ValueError, RecursionError):
+            # Malformed or pathologically nested JSON-LD is ignored
+            continue
+        for node in nodes:
+            if _ld_is(node, "Product"):
+                offer = _first(node.get("offers")) or {}
+                rating = node.get("aggregateRating") or {}
+                if not isinstance(offer, dict):
+                    offer = {}
+                if not isinstance(rating, dict):
+                    rating = {}
+                merge("json-ld", {
+                    "name": node.get("name") if isinstance(node.get("name"), str) else None,
+                    "price": _number(offer.get("price", offer.get("lowPrice"))),
+                    "currency": offer.get("priceCurrency"),
+                    "availability": _availability(offer.get("availability")),
+                    "rating": _number(rating.get("ratingValue")),
+                    "review_count": _number(rating.get("reviewCount", rating.get("ratingCount"))),
+                })
+            elif _ld_is(node, "Offer") or _ld_is(node, "AggregateOffer"):
+                merge("json-ld", {
+                    "price": _number(node.get("price", node.get("lowPrice"))),
+                    "currency": node.get("priceCurrency"),
+                    "availability": _availability(node.get("availability")),
+                })
+
+    merge("microdata", {
+        "name": microdata.get("name"),
+        "price": _number(microdata.get("price", microdata.get("lowPrice"))),
+        "currency": microdata.get("priceCurrency"),
+        "availability": _availability(microdata.get("availability")),
+        "rating": _number(microdata.get("ratingValue")),
+        "review_count": _number(microdata.get("reviewCount", microdata.get("ratingCount"))),
+    })
+
+    merge("opengraph", {
+        "name": meta.get("og:title"),
+        "price": _number(meta.get("product:price:amount", meta.get("og:price:amount"))),
+        "currency": meta.get("product:price:currency", meta.get("og:price:currency")),
+        "availability": _availability(meta.get("product:availability", meta.get("og:availability"))),
+    })
+
+    if "review_count" in found:
+        found["review_count"] = int(found["review_count"])
+    if sources:
+        found["sources"] = sources
+    return found
+
+def format_structured_price(structured):
+    """Render a structured price like the text heuristics do ("₹1,299"), or None."""
+    price = structured.get("price")
+    if price is None:
+        return None
+    currency = (structured.get("currency") or "INR").upper()
+    amount = f"{price:,.0f}" if price == int(price) else f"{price:,.2f}"
+    symbol = CURRENCY_SYMBOLS.get(currency)
+    return f"{symbol}{amount}" if symbol else f"{currency} {amount}"
+
 def strip_html(html: str) -> str:
-    html = re.sub(r"(?is)<(script|style).*?>.*?</\1>", " ", html)
-    html = re.sub(r"(?s)<.*?>", " ", html)
-    html = re.sub(r"\s+", " ", html).strip()
-    return html
+    return html_to_text(html)[0]
 
 def extract_title(text: str) -> str:
     # Heuristic: first meaningful chunk
     return text[:140].strip()
 
 def extract_price(text: str):
-    patterns = [
-        r"(₹\s?\d[\d,]*(?:\.\d{1,2})?)",
-        r"(\$\s?\d[\d,]*(?:\.\d{1,2})?)",
-        r"(€\s?\d[\d,]*(?:\.\d{1,2})?)",
-    ]
-    for p in patterns:
-        m = re.search(p, text)
+    for p in PRICE_PATTERNS:
+        m = p.search(text)
         if m:
             return m.group(1)
     return None
 
-def extract_snippet(text: str, keywords):
-    lower = text.lower()
-    hits = [lower.find(k) for k in keywords if lower.find(k) != -1]
-    if not hits:
-        return ""
-    idx = min(hits)
-    start = max(0, idx - 140)
-    end = min(len(text), idx + 260)
-    return text[start:end].strip()
-
-def analyze_return_policy(text: str):
+# Named page sections, located by the first hit of any of their keywords
+SECTION_KEYWORDS = {
+    "returns": RETURN_SNIPPET_KEYWORDS,
+    "reviews": REVIEW_KEYWORDS,
+}
+
+class Document:
+    """
+    Pre-normalized view of one page, built once and handed to every stage.
+
+    Holds the visible text, its lowercased form, the shared keyword hit
+    table, section offsets and the parsed price, so no analyzer has to
+    lowercase, slice or rescan the page itself. Title and price come from
+    the page's structured data when present; the text heuristics are the
+    fallback.
+    """
+
+    def __init__(self, text: str, lower: str = None, hits: KeywordHits = None, structured: dict = None):
+        self.text = text
+        self.lower = lower if lower is not None else text.lower()
+        self.hits = hits if hits is not None else KEYWORD_MATCHER.scan(self.lower)
+        self.structured = structured or {}
+        self.title = self.structured.get("name") or extract_title(text)
+        self.price = format_structured_price(self.structured) or extract_price(text)
+        self.sections = {
+            name: self.first_of(keywords) for name, keywords in SECTION_KEYWORDS.items()
+        }
+
+    @classmethod
+    def from_html(cls, html: str) -> "Document":
+        text, lower, structured = parse_html(html)
+        return cls(text, lower, structured=structured)
+
+    @property
+    def price_value(self):
+        """Numeric value of the parsed price, or None."""
+        if not self.price:
+            return None
+        match = NUMBER_RE.search(self.price)
+        return float(match.group().replace(",", "")) if match else None
+
+    def first_of(self, keywords):
+        """Offset of the earliest hit among keywords, or -1."""
+        positions = [p for p in (self.hits.first(k) for k in keywords) if p != -1]
+        return min(positions) if positions else -1
+
+    def window(self, idx, before=140, after=260):
+        """Text surrounding offset idx (empty when idx is -1)."""
+        if idx == -1:
+            return ""
+        start = max(0, idx - before)
+        end = min(len(self.text), idx + after)
+        return self.text[start:end].strip()
+
+    def snippet(self, section):
+        return self.window(self.sections[section])
+
+def as_document(doc) -> Document:
+    """Accept either a Document or plain page text."""
+    return doc if isinstance(doc, Document) else Document(doc)
+
+def extract_snippet(doc, keywords):
+    doc = as_document(doc)
+    return doc.window(doc.first_of(keywords))
+
+def find_return_window(lower: str):
+    """Longest return window in days mentioned on the page, or None."""
+    days_found = []
+    for pattern in RETURN_DAY_PATTERNS:
+        stage_checkpoint()
+        matches = pattern.findall(lower)
+        for match in matches:
+            for part in match:
+                if part.isdigit() and len(part) <= MAX_DURATION_DIGITS:
+                    days_found.append(int(part))
+    return max(days_found) if days_found else None  # Take the longest window mentioned
+
+def find_warranty_months(lower: str):
+    """Longest warranty mentioned on the page, in months, or None."""
+    durations_found = []
+    for pattern in WARRANTY_PATTERNS:
+        stage_checkpoint()
+        matches = pattern.findall(lower)
+        for match in matches:
+            for i, part in enumerate(match):
+                if part.isdigit():
+                    if len(part) > MAX_DURATION_DIGITS:
+                        break
+                    value = int(part)
+                    # Check next part for unit
+                    if i + 1 < len(match):
+                        unit = match[i + 1]
+                        if "year" in unit or "yr" in unit:
+                            durations_found.append(value * 12)  # Convert to months
+                        elif "month" in unit or "mo" in unit:
+                            durations_found.append(value)
+                    break
+    return max(durations_found) if durations_found else None
+
+def find_fee(patterns, lower: str):
+    """Amount captured by the first matching fee pattern, or None."""
+    for pattern in patterns:
+        stage_checkpoint()
+        match = pattern.search(lower)
+        if match:
+            return float(match.group(1).replace(",", ""))
+    return None
+
+def parse_amount(price_str):
+    """Numeric value of a price string like "₹1,299", or 0."""
+    if price_str:
+        match = NUMBER_RE.search(price_str)
+        if match:
+            return float(match.group().replace(",", ""))
+    return 0
+
+# Score = base + sum(weight * term), clamped to 0..100. The one copy of the
+# scoring weights: score() and the analyze_* stages add them term by term,
+# bulk_scoring.py applies them as a matrix over the indicators built in its
+# design_columns(). "pre" terms are applied before "reset": pages with the
+# reset flag set restart from the reset value (a non-returnable item drops
+# flexibility to 10).
+SCORE_WEIGHTS = {
+    "deal_truth": {"base": 70, "terms": {
+        "no_price": -15, "discount_without_reference": -10,
+    }},
+    "review_integrity": {"base": 70, "terms": {
+        "no_reviews": -15, "recent_review": 5, "no_recent_review": -5,
+        "authentic_3plus": 10, "authentic_1to2": 5, "no_authentic": -5,
+        "photo_review": 10, "no_photo_review": -5, "generic_4plus": -10, "hype_2plus": -10,
+    }},
+    "store_safety": {"base": 80, "terms": {
+        "urgency_3plus": -10, "risky_tld": -10,
+    }},
+    "flexibility_score": {"base": 50, "pre": {"refund": 15, "replacement": 10},
+                          "reset": ["non_returnable", 10], "terms": {
+        "free_pickup": 20, "paid_pickup": 10, "drop_off_not_free": -5,
+        "window_30plus": 25, "window_15to29": 15, "window_10to14": 10, "window_7to9": 5,
+        "hassle_free": 10, "return_conditions": -5,
+    }},
+    "support_score": {"base": 50, "terms": {
+        "warranty_24plus": 30, "warranty_12to23": 20, "warranty_6to11": 10, "warranty_short": 5,
+        "brand_warranty": 15, "seller_warranty": 8, "no_warranty_type": -5,
+        "service_center": 15, "nationwide_service": 5, "installation_support": 10,
+        "official_store": 15, "extended_warranty": 5,
+    }},
+    "transparency_score": {"base": 100, "terms": {
+        "delivery_charged": -10, "delivery_unclear": -5, "installation_charged": -15,
+        "convenience_fee_found": -10, "gst_extra": -20, "packaging_fees": -5,
+        "cod_fee_found": -5, "cod_unclear": -3, "hidden_over_20pct": -20, "hidden_10to20pct": -10,
+    }},
+}
+
+GST_RATE = 0.18  # estimated when a page says GST is extra
+
+def analyze_return_policy(doc):
     """
     Analyze return policy and extract key details:
     - Return window (7, 10, 15, 30 days, etc.)
     - Type (replacement, refund, exchange)
     - Method (pickup, drop-off, self-return)
     """
-    lower = text.lower()
+    doc = as_document(doc)
+    lower, hits = doc.lower, doc.hits
+    weights = SCORE_WEIGHTS["flexibility_score"]
+    pre, w = weights["pre"], weights["terms"]
     
     policy = {
         "return_window_days": None,
         "type": [],
         "method": [],
-        "flexibility_score": 50,  # Base score out of 100
+        "flexibility_score": weights["base"],  # Base score out of 100
         "highlights": []
     }
     
     # Extract return window (days)
-    day_patterns = [
-        r"(\d+)\s*days?\s*(return|replacement|refund|exchange)",
-        r"(return|replacement|refund|exchange)\s*within\s*(\d+)\s*days?",
-        r"(\d+)[-\s]day\s*(return|replacement|refund)"
-    ]
-    
-    days_found = []
-    for pattern in day_patterns:
-        matches = re.findall(pattern, lower)
-        for match in matches:
-            for part in match:
-                if part.isdigit():
-                    days_found.append(int(part))
-    
-    if days_found:
-        policy["return_window_days"] = max(days_found)  # Take the longest window mentioned
+    policy["return_window_days"] = find_return_window(lower)
     
     # Return types
-    if "refund" in lower or "money back" in lower:
+    if hits.any(REFUND_KEYWORDS):
         policy["type"].append("refund")
-        policy["flexibility_score"] += 15
+        policy["flexibility_score"] += pre["refund"]
         policy["highlights"].append("Full refund available")
     
-    if "replacement" in lower or "exchange" in lower:
+    if hits.any(REPLACEMENT_KEYWORDS):
         policy["type"].append("replacement")
-        policy["flexibility_score"] += 10
+        policy["flexibility_score"] += pre["replacement"]
         policy["highlights"].append("Replacement offered")
     
-    if "no return" in lower or "non-returnable" in lower or "final sale" in lower:
+    if hits.any(NON_RETURNABLE_KEYWORDS):
         policy["type"] = ["non-returnable"]
-        policy["flexibility_score"] = 10
+        policy["flexibility_score"] = weights["reset"][1]
         policy["highlights"].append("⚠️ Non-returnable item")
     
     # Return methods
-    if any(k in lower for k in ["free pickup", "free return pickup", "pickup at doorstep"]):
+    if hits.any(FREE_PICKUP_KEYWORDS):
         policy["method"].append("free-pickup")
-        policy["flexibility_score"] += 20
+        policy["flexibility_score"] += w["free_pickup"]
         policy["highlights"].append("✅ Free doorstep pickup")
-    elif "pickup" in lower:
+    elif hits.any(PICKUP_KEYWORDS):
         policy["method"].append("pickup")
-        policy["flexibility_score"] += 10
+        policy["flexibility_score"] += w["paid_pickup"]
     
-    if any(k in lower for k in ["drop off", "dropoff", "self return", "courier"]):
+    if hits.any(DROP_OFF_KEYWORDS):
         policy["method"].append("drop-off")
-        if "free" not in lower:
-            policy["flexibility_score"] -= 5
+        if not hits.any(FREE_KEYWORDS):
+            policy["flexibility_score"] += w["drop_off_not_free"]
     
     # Bonus for generous windows
     if policy["return_window_days"]:
         days = policy["return_window_days"]
         if days >= 30:
-            policy["flexibility_score"] += 25
+            policy["flexibility_score"] += w["window_30plus"]
             policy["highlights"].append(f"🏆 {days}-day return window (excellent)")
         elif days >= 15:
-            policy["flexibility_score"] += 15
+            policy["flexibility_score"] += w["window_15to29"]
             policy["highlights"].append(f"✅ {days}-day return window (good)")
         elif days >= 10:
-            policy["flexibility_score"] += 10
+            policy["flexibility_score"] += w["window_10to14"]
             policy["highlights"].append(f"{days}-day return window")
         elif days >= 7:
-            policy["flexibility_score"] += 5
+            policy["flexibility_score"] += w["window_7to9"]
             policy["highlights"].append(f"⚠️ Only {days}-day return window (short)")
         else:
             policy["highlights"].append(f"⚠️ Very short {days}-day return window")
@@ -121,12 +814,12 @@ def analyze_return_policy(text: str):
         policy["highlights"].append("⚠️ Return window not clearly stated")
     
     # Check for conditions
-    if any(k in lower for k in ["no questions asked", "hassle free", "easy return"]):
-        policy["flexibility_score"] += 10
+    if hits.any(HASSLE_FREE_KEYWORDS):
+        policy["flexibility_score"] += w["hassle_free"]
         policy["highlights"].append("Hassle-free returns")
     
-    if any(k in lower for k in ["original packaging", "unopened", "unused", "tags attached"]):
-        policy["flexibility_score"] -= 5
+    if hits.any(RETURN_CONDITION_KEYWORDS):
+        policy["flexibility_score"] += w["return_conditions"]
         policy["highlights"].append("Conditions apply (packaging/tags required)")
     
     # Clamp score
@@ -134,7 +827,7 @@ def analyze_return_policy(text: str):
     
     return policy
 
-def analyze_warranty_support(text: str):
+def analyze_warranty_support(doc):
     """
     Analyze warranty and after-sales support:
     - Warranty duration (6 months, 1 year, 2 years, etc.)
@@ -142,43 +835,24 @@ def analyze_warranty_support(text: str):
     - Service center availability
     - Installation support
     """
-    lower = text.lower()
+    doc = as_document(doc)
+    lower, hits = doc.lower, doc.hits
+    weights = SCORE_WEIGHTS["support_score"]
+    w = weights["terms"]
     
     support = {
         "warranty_duration": None,
         "warranty_type": [],
         "service_centers": None,
         "installation": False,
-        "support_score": 50,  # Base score out of 100
+        "support_score": weights["base"],  # Base score out of 100
         "highlights": []
     }
     
     # Extract warranty duration
-    warranty_patterns = [
-        r"(\d+)\s*(year|yr|years|yrs)\s*(warranty|guarantee)",
-        r"(\d+)\s*(month|months|mo|mos)\s*(warranty|guarantee)",
-        r"(warranty|guarantee)\s*[:\-]?\s*(\d+)\s*(year|yr|month|mo)",
-        r"(\d+)[-\s](year|month)\s*(warranty|guarantee)"
-    ]
+    max_duration = find_warranty_months(lower)
     
-    durations_found = []
-    for pattern in warranty_patterns:
-        matches = re.findall(pattern, lower)
-        for match in matches:
-            for i, part in enumerate(match):
-                if part.isdigit():
-                    value = int(part)
-                    # Check next part for unit
-                    if i + 1 < len(match):
-                        unit = match[i + 1]
-                        if "year" in unit or "yr" in unit:
-                            durations_found.append(value * 12)  # Convert to months
-                        elif "month" in unit or "mo" in unit:
-                            durations_found.append(value)
-                    break
-    
-    if durations_found:
-        max_duration = max(durations_found)
+    if max_duration is not None:
         support["warranty_duration"] = max_duration
         
         # Convert back to readable format
@@ -194,74 +868,63 @@ def analyze_warranty_support(text: str):
         
         # Score based on duration
         if max_duration >= 24:  # 2+ years
-            support["support_score"] += 30
+            support["support_score"] += w["warranty_24plus"]
             support["highlights"].append(f"🏆 {readable} warranty (excellent)")
         elif max_duration >= 12:  # 1 year
-            support["support_score"] += 20
+            support["support_score"] += w["warranty_12to23"]
             support["highlights"].append(f"✅ {readable} warranty (good)")
         elif max_duration >= 6:  # 6 months
-            support["support_score"] += 10
+            support["support_score"] += w["warranty_6to11"]
             support["highlights"].append(f"{readable} warranty")
         else:
-            support["support_score"] += 5
+            support["support_score"] += w["warranty_short"]
             support["highlights"].append(f"⚠️ Only {readable} warranty (short)")
     else:
         support["highlights"].append("⚠️ Warranty duration not clearly stated")
     
     # Warranty type
-    if any(k in lower for k in ["brand warranty", "manufacturer warranty", "company warranty", "official warranty"]):
+    if hits.any(BRAND_WARRANTY_KEYWORDS):
         support["warranty_type"].append("brand")
-        support["support_score"] += 15
+        support["support_score"] += w["brand_warranty"]
         support["highlights"].append("✅ Brand/Manufacturer warranty")
     
-    if any(k in lower for k in ["seller warranty", "platform warranty", "amazon fulfilled", "flipkart assured"]):
+    if hits.any(SELLER_WARRANTY_KEYWORDS):
         support["warranty_type"].append("seller")
-        support["support_score"] += 8
+        support["support_score"] += w["seller_warranty"]
         support["highlights"].append("Seller warranty included")
     
     if not support["warranty_type"]:
         support["warranty_type"].append("unknown")
-        support["support_score"] -= 5
+        support["support_score"] += w["no_warranty_type"]
     
     # Service centers
-    service_keywords = [
-        "service center", "service centre", "authorized service", 
-        "repair center", "customer service center", "after sales service",
-        "service network", "nationwide service", "pan india service"
-    ]
-    
-    if any(k in lower for k in service_keywords):
+    if hits.any(SERVICE_CENTER_KEYWORDS):
         support["service_centers"] = "available"
-        support["support_score"] += 15
+        support["support_score"] += w["service_center"]
         support["highlights"].append("✅ Authorized service centers available")
         
         # Bonus for nationwide coverage
-        if any(k in lower for k in ["nationwide", "pan india", "all cities", "across india"]):
-            support["support_score"] += 5
+        if hits.any(NATIONWIDE_KEYWORDS):
+            support["support_score"] += w["nationwide_service"]
             support["highlights"].append("Nationwide service network")
     else:
         support["service_centers"] = "not mentioned"
         support["highlights"].append("⚠️ Service center availability not mentioned")
     
     # Installation support
-    installation_keywords = [
-        "free installation", "installation service", "installation support",
-        "installation included", "demo", "setup", "on-site installation"
-    ]
-    
-    if any(k in lower for k in installation_keywords):
+    if hits.any(INSTALLATION_KEYWORDS):
         support["installation"] = True
-        support["support_score"] += 10
+        support["support_score"] += w["installation_support"]
         support["highlights"].append("✅ Installation support available")
     
     # Official brand store bonus
-    if any(k in lower for k in ["official store", "brand store", "authorized seller", "authorized dealer"]):
-        support["support_score"] += 15
+    if hits.any(OFFICIAL_STORE_KEYWORDS):
+        support["support_score"] += w["official_store"]
         support["highlights"].append("🏆 Official brand store/Authorized seller")
     
     # Extended warranty available
-    if any(k in lower for k in ["extended warranty", "additional warranty", "warranty extension"]):
-        support["support_score"] += 5
+    if hits.any(EXTENDED_WARRANTY_KEYWORDS):
+        support["support_score"] += w["extended_warranty"]
         support["highlights"].append("Extended warranty available")
     
     # Clamp score
@@ -269,7 +932,7 @@ def analyze_warranty_support(text: str):
     
     return support
 
-def analyze_hidden_costs(text: str, base_price_str: str):
+def analyze_hidden_costs(doc, base_price_str: str = None):
     """
     Detect hidden costs that increase final payable amount:
     - Delivery/shipping charges
@@ -278,7 +941,10 @@ def analyze_hidden_costs(text: str, base_price_str: str):
     - GST inclusion/exclusion
     - Packaging charges
     """
-    lower = text.lower()
+    doc = as_document(doc)
+    lower, hits = doc.lower, doc.hits
+    weights = SCORE_WEIGHTS["transparency_score"]
+    w = weights["terms"]
     
     costs = {
         "delivery_charge": None,
@@ -287,122 +953,89 @@ def analyze_hidden_costs(text: str, base_price_str: str):
         "gst_included": None,
         "other_fees": [],
         "total_hidden_cost": 0,
-        "transparency_score": 100,  # Start at perfect, deduct for hidden costs
+        "transparency_score": weights["base"],  # Start at perfect, deduct for hidden costs
         "warnings": []
     }
     
     # Extract base price numeric value for calculations
-    base_price = 0
-    if base_price_str:
-        match = re.search(r'[\d,]+', base_price_str)
-        if match:
-            base_price = float(match.group().replace(",", ""))
+    if base_price_str is None:
+        base_price_str = doc.price
+    base_price = parse_amount(base_price_str)
     
     # Delivery charges
-    delivery_patterns = [
-        r"delivery\s*(?:charge|fee|cost)[:\s]*₹?\s*([\d,]+)",
-        r"shipping\s*(?:charge|fee|cost)[:\s]*₹?\s*([\d,]+)",
-        r"₹\s*([\d,]+)\s*(?:delivery|shipping)"
-    ]
-    
-    if any(k in lower for k in ["free delivery", "free shipping", "no delivery charge"]):
+    if hits.any(FREE_DELIVERY_KEYWORDS):
         costs["delivery_charge"] = 0
         costs["warnings"].append("✅ Free delivery")
     else:
-        for pattern in delivery_patterns:
-            match = re.search(pattern, lower)
-            if match:
-                charge = float(match.group(1).replace(",", ""))
-                costs["delivery_charge"] = charge
-                costs["total_hidden_cost"] += charge
-                costs["transparency_score"] -= 10
-                costs["warnings"].append(f"⚠️ Delivery charge: ₹{charge:.0f}")
-                break
+        charge = find_fee(DELIVERY_PATTERNS, lower)
+        if charge is not None:
+            costs["delivery_charge"] = charge
+            costs["total_hidden_cost"] += charge
+            costs["transparency_score"] += w["delivery_charged"]
+            costs["warnings"].append(f"⚠️ Delivery charge: ₹{charge:.0f}")
         
         # If no specific charge found but delivery mentioned without "free"
-        if costs["delivery_charge"] is None and any(k in lower for k in ["delivery", "shipping"]):
+        if costs["delivery_charge"] is None and hits.any(DELIVERY_KEYWORDS):
             costs["warnings"].append("⚠️ Delivery charges may apply (not clearly stated)")
-            costs["transparency_score"] -= 5
+            costs["transparency_score"] += w["delivery_unclear"]
     
     # Installation fees
-    installation_patterns = [
-        r"installation\s*(?:charge|fee|cost)[:\s]*₹?\s*([\d,]+)",
-        r"₹\s*([\d,]+)\s*installation"
-    ]
-    
-    if any(k in lower for k in ["free installation", "installation included", "no installation charge"]):
+    if hits.any(FREE_INSTALLATION_KEYWORDS):
         costs["installation_fee"] = 0
         costs["warnings"].append("✅ Free installation")
     else:
-        for pattern in installation_patterns:
-            match = re.search(pattern, lower)
-            if match:
-                fee = float(match.group(1).replace(",", ""))
-                costs["installation_fee"] = fee
-                costs["total_hidden_cost"] += fee
-                costs["transparency_score"] -= 15
-                costs["warnings"].append(f"⚠️ Installation fee: ₹{fee:.0f}")
-                break
+        fee = find_fee(INSTALLATION_PATTERNS, lower)
+        if fee is not None:
+            costs["installation_fee"] = fee
+            costs["total_hidden_cost"] += fee
+            costs["transparency_score"] += w["installation_charged"]
+            costs["warnings"].append(f"⚠️ Installation fee: ₹{fee:.0f}")
     
     # Convenience/Platform fees
-    convenience_patterns = [
-        r"convenience\s*fee[:\s]*₹?\s*([\d,]+)",
-        r"platform\s*fee[:\s]*₹?\s*([\d,]+)",
-        r"service\s*fee[:\s]*₹?\s*([\d,]+)",
-        r"handling\s*(?:charge|fee)[:\s]*₹?\s*([\d,]+)"
-    ]
-    
-    for pattern in convenience_patterns:
-        match = re.search(pattern, lower)
-        if match:
-            fee = float(match.group(1).replace(",", ""))
-            costs["convenience_fee"] = fee
-            costs["total_hidden_cost"] += fee
-            costs["transparency_score"] -= 10
-            costs["warnings"].append(f"⚠️ Convenience/platform fee: ₹{fee:.0f}")
-            break
+    fee = find_fee(CONVENIENCE_PATTERNS, lower)
+    if fee is not None:
+        costs["convenience_fee"] = fee
+        costs["total_hidden_cost"] += fee
+        costs["transparency_score"] += w["convenience_fee_found"]
+        costs["warnings"].append(f"⚠️ Convenience/platform fee: ₹{fee:.0f}")
     
     # GST inclusion
-    if any(k in lower for k in ["inclusive of all taxes", "inclusive of gst", "including tax", "tax included"]):
+    if hits.any(GST_INCLUDED_KEYWORDS):
         costs["gst_included"] = True
         costs["warnings"].append("✅ GST included in price")
-    elif any(k in lower for k in ["exclusive of tax", "excluding gst", "plus gst", "+ gst", "taxes extra"]):
+    elif hits.any(GST_EXCLUDED_KEYWORDS):
         costs["gst_included"] = False
-        costs["transparency_score"] -= 20
+        costs["transparency_score"] += w["gst_extra"]
         # Estimate 18% GST if base price available
         if base_price > 0:
-            gst_amount = base_price * 0.18
+            gst_amount = base_price * GST_RATE
             costs["total_hidden_cost"] += gst_amount
             costs["warnings"].append(f"⚠️ GST extra: ~₹{gst_amount:.0f} (18% of base price)")
         else:
             costs["warnings"].append("⚠️ GST not included (typically 18% extra)")
     
     # Packaging charges
-    packaging_patterns = [
-        r"packaging\s*(?:charge|fee)[:\s]*₹?\s*([\d,]+)"
-    ]
-    
-    for pattern in packaging_patterns:
-        match = re.search(pattern, lower)
+    for pattern in PACKAGING_PATTERNS:
+        stage_checkpoint()
+        match = pattern.search(lower)
         if match:
             fee = float(match.group(1).replace(",", ""))
             costs["other_fees"].append(("packaging", fee))
             costs["total_hidden_cost"] += fee
-            costs["transparency_score"] -= 5
+            costs["transparency_score"] += w["packaging_fees"]
             costs["warnings"].append(f"⚠️ Packaging charge: ₹{fee:.0f}")
     
     # COD charges
-    if any(k in lower for k in ["cod charge", "cash on delivery charge", "cod fee"]):
-        cod_pattern = r"cod\s*(?:charge|fee)[:\s]*₹?\s*([\d,]+)"
-        match = re.search(cod_pattern, lower)
+    if hits.any(COD_KEYWORDS):
+        match = COD_PATTERN.search(lower)
         if match:
             fee = float(match.group(1).replace(",", ""))
             costs["other_fees"].append(("cod", fee))
-            costs["transparency_score"] -= 5
+            costs["transparency_score"] += w["cod_fee_found"]
             costs["warnings"].append(f"⚠️ COD charge: ₹{fee:.0f} (choose prepaid to save)")
         else:
             costs["warnings"].append("⚠️ COD charges may apply")
-            costs["transparency_score"] -= 3
+            costs["transparency_score"] += w["cod_unclear"]
     
     # Calculate final payable amount if base price available
     if base_price > 0 and costs["total_hidden_cost"] > 0:
@@ -414,10 +1047,10 @@ def analyze_hidden_costs(text: str, base_price_str: str):
         
         # Extra penalty for high hidden costs
         if hidden_percentage > 20:
-            costs["transparency_score"] -= 20
+            costs["transparency_score"] += w["hidden_over_20pct"]
             costs["warnings"].append("🚨 HIGH hidden costs (>20% of base price)")
         elif hidden_percentage > 10:
-            costs["transparency_score"] -= 10
+            costs["transparency_score"] += w["hidden_10to20pct"]
             costs["warnings"].append("⚠️ Significant hidden costs (>10% of base price)")
     
     # Clamp score
@@ -427,23 +1060,34 @@ def analyze_hidden_costs(text: str, base_price_str: str):
 
 def score(signals):
     # Simple, hackathon-friendly scoring. Improve iteratively.
-    deal = 70
-    review = 70
-    safety = 80
+    deal_w = SCORE_WEIGHTS["deal_truth"]["terms"]
+    review_w = SCORE_WEIGHTS["review_integrity"]["terms"]
+    safety_w = SCORE_WEIGHTS["store_safety"]["terms"]
+    deal = SCORE_WEIGHTS["deal_truth"]["base"]
+    review = SCORE_WEIGHTS["review_integrity"]["base"]
+    safety = SCORE_WEIGHTS["store_safety"]["base"]
     reasons = {"deal": [], "review": [], "safety": []}
 
-    text = signals["text"].lower()
     domain = signals["domain"]
     price = signals["price"]
 
+    # Keyword checks read the page's shared hit table, which indexes the
+    # whole document in one pass, so full coverage costs no more than a
+    # prefix. `text_window` optionally limits them to the first N characters.
+    doc = signals.get("document")
+    if doc is None:
+        doc = as_document(signals["text"])
+    hits = doc.hits
+    end = signals.get("text_window")
+
     # Deal Truth
     if price is None:
-        deal -= 15
+        deal += deal_w["no_price"]
         reasons["deal"].append("No clear price found on page (lower confidence).")
     
-    if any(k in text for k in ["% off", "discount", "sale"]):
-        if not any(k in text for k in ["mrp", "list price", "was", "previous price"]):
-            deal -= 10
+    if hits.any(DISCOUNT_KEYWORDS, end):
+        if not hits.any(REFERENCE_PRICE_KEYWORDS, end):
+            deal += deal_w["discount_without_reference"]
             reasons["deal"].append("Discount claim seen but no clear reference price detected.")
         else:
             reasons["deal"].append("Discount/reference pricing signals present.")
@@ -455,67 +1099,50 @@ def score(signals):
     review_signals = []
     
     # Basic check: Are reviews present?
-    if not any(k in text for k in ["review", "rating", "stars"]):
-        review -= 15
+    if not hits.any(REVIEW_KEYWORDS, end):
+        review += review_w["no_reviews"]
         reasons["review"].append("No obvious review/rating section detected.")
     else:
         review_signals.append("Review section detected")
     
     # Check 1: Recent reviews (last 1-3 months)
-    recent_months = ["january", "february", "march", "april", "may", "june", 
-                     "july", "august", "september", "october", "november", "december",
-                     "jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec",
-                     "ago", "days ago", "weeks ago", "month ago", "months ago"]
-    
-    if any(month in text for month in recent_months):
-        review_points += 5
+    if hits.any(RECENT_REVIEW_KEYWORDS, end):
+        review_points += review_w["recent_review"]
         review_signals.append("Recent review timestamps detected")
     else:
-        review -= 5
+        review += review_w["no_recent_review"]
         reasons["review"].append("No recent review dates found (prefer reviews from last 1-3 months).")
     
     # Check 2: Defects, packaging, service mentions (authentic review signals)
-    authentic_keywords = ["defect", "damage", "broken", "packaging", "delivery", "service", 
-                         "customer care", "return", "refund", "issue", "problem", "complaint",
-                         "shipped", "arrived", "received", "quality", "build quality"]
-    
-    authentic_hits = sum(1 for k in authentic_keywords if k in text)
+    authentic_hits = hits.distinct(AUTHENTIC_REVIEW_KEYWORDS, end)
     if authentic_hits >= 3:
-        review_points += 10
+        review_points += review_w["authentic_3plus"]
         review_signals.append(f"Authentic review signals detected ({authentic_hits} mentions of defects/packaging/service)")
     elif authentic_hits >= 1:
-        review_points += 5
+        review_points += review_w["authentic_1to2"]
         review_signals.append("Some authentic review content detected")
     else:
-        review -= 5
+        review += review_w["no_authentic"]
         reasons["review"].append("Lack of detailed review content (defects, packaging, service mentions).")
     
     # Check 3: User photos in reviews
-    photo_keywords = ["verified purchase", "customer image", "customer photo", "uploaded", 
-                     "image from", "photo from", "review photo", "review image"]
-    
-    if any(k in text for k in photo_keywords):
-        review_points += 10
+    if hits.any(PHOTO_REVIEW_KEYWORDS, end):
+        review_points += review_w["photo_review"]
         review_signals.append("User-uploaded photos/verified purchases detected (high authenticity)")
     else:
-        review -= 5
+        review += review_w["no_photo_review"]
         reasons["review"].append("No evidence of user-uploaded photos in reviews.")
     
     # Check 4: Generic 5-star review filter
-    generic_praise = ["excellent product", "great product", "amazing product", "superb product",
-                     "highly recommend", "worth buying", "must buy", "very good", "fantastic"]
-    
-    generic_hits = sum(1 for g in generic_praise if g in text)
+    generic_hits = hits.distinct(GENERIC_PRAISE_KEYWORDS, end)
     if generic_hits >= 4:
-        review -= 10
+        review += review_w["generic_4plus"]
         reasons["review"].append(f"Overly generic 5-star reviews detected ({generic_hits} generic praise phrases).")
     
     # Check 5: Excessive hype patterns
-    hype = ["best ever", "100% recommended", "life changing", "miracle product", 
-            "perfect in every way", "flawless", "zero complaints"]
-    hype_hits = sum(1 for h in hype if h in text)
+    hype_hits = hits.distinct(HYPE_KEYWORDS, end)
     if hype_hits >= 2:
-        review -= 10
+        review += review_w["hype_2plus"]
         reasons["review"].append("Overly promotional language patterns detected in page text.")
     
     # Apply bonus points and add positive signals to reasons
@@ -527,16 +1154,15 @@ def score(signals):
         reasons["review"].append("Basic review integrity checks passed.")
 
     # Store/Seller Safety
-    urgency = ["limited time", "act now", "only today", "hurry", "last chance"]
-    urgency_hits = sum(1 for u in urgency if u in text)
+    urgency_hits = hits.distinct(URGENCY_KEYWORDS, end)
     if urgency_hits >= 3:
-        safety -= 10
+        safety += safety_w["urgency_3plus"]
         reasons["safety"].append("Heavy urgency messaging detected (common in risky storefronts).")
     else:
-        reasons["safety"].append("No heavy urgency pattern detected in sampled text.")
+        reasons["safety"].append("No heavy urgency pattern detected in page text.")
     
-    if domain.endswith((".xyz", ".top", ".click")):
-        safety -= 10
+    if domain.endswith(RISKY_TLDS):
+        safety += safety_w["risky_tld"]
         reasons["safety"].append(f"Domain ends with a higher-risk TLD pattern: {domain}")
 
     # Clamp + shorten reasons
@@ -558,58 +1184,403 @@ def score(signals):
         "reasons": reasons
     }
 
+# Guardrails: pages longer than this are analyzed on their first
+# MAX_INPUT_CHARS characters, and a stage that burns more CPU than its
+# budget ends the analysis early with a degraded result. Budgets are checked
+# cooperatively: the tokenizer, the keyword scan and the pattern loops call
+# stage_checkpoint() every FEED_SLICE/SCAN_SLICE characters or pattern, so a
+# stage stops within one slice of its budget instead of after it returns.
+MAX_INPUT_CHARS = 16 * 1024 * 1024
+FEED_SLICE = 256 * 1024
+SCAN_SLICE = 64 * 1024
+STAGE_BUDGETS_MS = {
+    "strip_html": 5000,
+    "keyword_index": 3000,
+    "analyze_return_policy": 1000,
+    "analyze_warranty_support": 1000,
+    "analyze_hidden_costs": 1000,
+    "score": 500,
+}
+
+class StageOverrun(Exception):
+    """Raised by stage_checkpoint() once the running stage is over its CPU budget; may carry a partial result."""
+
+    def __init__(self, partial=None):
+        super().__init__("stage CPU budget exceeded")
+        self.partial = partial
+
+_stage_limit = threading.local()
+
+@contextmanager
+def stage_cpu_limit(limit_ms):
+    """Arm stage_checkpoint() in this thread until the block ends (limit_ms None: no limit)."""
+    previous = getattr(_stage_limit, "until", None)
+    _stage_limit.until = time.thread_time() + limit_ms / 1000 if limit_ms is not None else None
+    try:
+        yield
+    finally:
+        _stage_limit.until = previous
+
+def stage_checkpoint():
+    """Raise StageOverrun if this thread has used up the CPU time armed by stage_cpu_limit()."""
+    until = getattr(_stage_limit, "until", None)
+    if until is not None and time.thread_time() > until:
+        raise StageOverrun()
+
+class StageBudget:
+    """
+    Per-page CPU budget tracker.
+
+    run() times a stage in CPU seconds of the calling thread and arms
+    stage_checkpoint() with its budget, so a stage that runs over is stopped
+    at its next checkpoint: run() then returns the partial result it raised
+    with, or `skipped`. Once any stage has overrun its budget, later stages
+    are skipped and return `skipped`.
+    """
+
+    def __init__(self, budgets_ms=None):
+        self.budgets_ms = STAGE_BUDGETS_MS if budgets_ms is None else budgets_ms
+        self.overruns = []
+        self.skipped = []
+        self.truncated = None  # (input_chars, analyzed_chars)
+        self.download_cut_at = None  # bytes read before a streamed download was stopped
+
+    def run(self, name, fn, *args, skipped=None):
+        if self.overruns:
+            self.skipped.append(name)
+            return skipped
+        limit = self.budgets_ms.get(name)
+        interrupted = False
+        with stage(name), stage_cpu_limit(limit):
+            start = time.thread_time()
+            try:
+                result = fn(*args)
+            except StageOverrun as e:
+                result = e.partial if e.partial is not None else skipped
+                interrupted = True
+            spent_ms = (time.thread_time() - start) * 1000
+        if limit is not None and (interrupted or spent_ms > limit):
+            overrun = {"stage": name, "cpu_ms": round(spent_ms, 1), "budget_ms": limit}
+            if interrupted:
+                overrun["interrupted"] = True
+            self.overruns.append(overrun)
+        return result
+
+    @property
+    def degraded(self):
+        return bool(self.overruns or self.truncated or self.download_cut_at)
+
+    def report(self):
+        """The `degraded` block attached to a result that hit a guardrail."""
+        report = {}
+        if self.truncated:
+            report["input_chars"], report["analyzed_chars"] = self.truncated
+        if self.download_cut_at:
+            report["download_cut_at_bytes"] = self.download_cut_at
+        if self.overruns:
+            report["budget_overruns"] = self.overruns
+            report["skipped_stages"] = self.skipped
+        return report
+
+class HtmlAnalyzer:
+    """
+    Reusable in-process page analyzer.
+
+    Holds the compiled pattern tables, so one instance can analyze any number
+    of pages without spawning a Python process or touching disk per page.
+    With an AnalysisCache attached, pages whose visible text was already
+    analyzed under the current rules are answered from the cache.
+
+    Guardrails: input beyond max_input_chars is ignored, and stages are run
+    under per-stage CPU budgets (STAGE_BUDGETS_MS). A page that hits either
+    limit still gets a result, marked with a `degraded` block.
+    """
+
+    def __init__(self, cache=None, max_input_chars=MAX_INPUT_CHARS, stage_budgets_ms=None):
+        self.cache = cache
+        self.max_input_chars = max_input_chars
+        self.stage_budgets_ms = stage_budgets_ms
+
+    def analyze(self, url: str, html, encoding: str = "utf-8") -> dict:
+        """
+        Analyze one page. html may be str, or bytes/bytearray/memoryview
+        straight from a fetcher (decoded here with `encoding`), so pages
+        never need a trip through a file.
+        """
+        budget = StageBudget(self.stage_budgets_ms)
+        if not isinstance(html, str):
+            html = decode_html(html, encoding, self.max_input_chars)
+        if self.max_input_chars and len(html) > self.max_input_chars:
+            budget.truncated = (len(html), self.max_input_chars)
+            html = html[:self.max_input_chars]
+
+        text, lower, structured = budget.run("strip_html", parse_html, html)
+        return self.analyze_parsed(url, text, lower, structured, budget)
+
+    def analyze_parsed(self, url: str, text: str, lower: str, structured: dict = None,
+                       budget: StageBudget = None, download_cut_at: int = None) -> dict:
+        """
+        Analyze a page already run through HtmlTextExtractor, e.g. one fed
+        chunk by chunk from a streamed download. download_cut_at marks a page
+        whose download stopped at a byte cap (reported under `degraded`).
+        """
+        budget = budget or StageBudget(self.stage_budgets_ms)
+        budget.download_cut_at = download_cut_at
+        domain = urlparse(url).netloc
+        if self.cache is not None and not budget.overruns:
+            with stage("analysis_cache_get"):
+                cached = self.cache.get(text, domain, structured)
+            if cached is not None:
+                # Truncation and download cuts belong to this fetch, not to the cached text
+                cached.pop("degraded", None)
+                if budget.degraded:
+                    cached["degraded"] = budget.report()
+                return {"url": url, **cached}
+
+        doc = budget.run("keyword_index", Document, text, lower, None, structured)
+        if doc is None:
+            doc = Document(text, lower, KeywordHits(lower, Counter(), {}), structured)
+        result = self.analyze_document(url, domain, doc, budget)
+        # Budget overruns depend on machine load, so only clean results are cached
+        if self.cache is not None and not budget.overruns:
+            with stage("analysis_cache_put"):
+                self.cache.put(text, domain, {k: v for k, v in result.items() if k not in ("url", "degraded")},
+                               structured)
+        return result
+
+    def analyze_document(self, url: str, domain: str, doc: Document, budget: StageBudget = None) -> dict:
+        budget = budget or StageBudget(self.stage_budgets_ms)
+        title = doc.title
+        price = doc.price
+        return_policy = doc.snippet("returns")
+        review_snip = doc.snippet("reviews")
+        
+        # Analyze return policy
+        return_analysis = budget.run("analyze_return_policy", analyze_return_policy, doc, skipped={})
+        
+        # Analyze warranty & support
+        warranty_analysis = budget.run("analyze_warranty_support", analyze_warranty_support, doc, skipped={})
+        
+        # Analyze hidden costs
+        hidden_costs = budget.run("analyze_hidden_costs", analyze_hidden_costs, doc, price, skipped={})
+
+        signals = {
+            "url": url,
+            "domain": domain,
+            "title": title,
+            "price": price,
+            "return_policy_snippet": return_policy,
+            "review_snippet": review_snip,
+            "document": doc
+        }
+
+        scored = budget.run("score", score, signals, skipped={"scores": {}, "reasons": {}})
+
+        result = {
+            "url": url,
+            "domain": domain,
+            "title_guess": title,
+            "price_guess": price,
+            "structured_data": doc.structured,
+            "snippets": {
+                "return_policy": return_policy,
+                "reviews": review_snip
+            },
+            "return_policy_analysis": return_analysis,
+            "warranty_support_analysis": warranty_analysis,
+            "hidden_costs_analysis": hidden_costs,
+            **scored,
+            "evidence_sample": doc.text[:600]
+        }
+        if budget.degraded:
+            result["degraded"] = budget.report()
+        return result
+
+_default_analyzer = HtmlAnalyzer()
+
+def analyze_html(url: str, html: str) -> dict:
+    """Analyze one product page in-process and return the analysis dict."""
+    return _default_analyzer.analyze(url, html)
+
+def decode_html(data, encoding: str = "utf-8", max_chars: int = 0) -> str:
+    """
+    Text of an in-memory page (bytes, bytearray or memoryview) without an
+    intermediate copy. With max_chars, bytes that cannot fall within the
+    first max_chars characters (4 bytes per character at most) are skipped.
+    """
+    view = memoryview(data)
+    if max_chars and view.nbytes > max_chars * 4:
+        view = view[:max_chars * 4]
+    try:
+        return str(view, encoding or "utf-8", "replace")
+    except LookupError:
+        return str(view, "utf-8", "replace")
+
+def read_html_file(path: str) -> str:
+    """Page text from a file, or from stdin when path is "-" (so fetchers can pipe HTML in)."""
+    if path == "-":
+        return decode_html(sys.stdin.buffer.read())
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+class BadBatchLine(ValueError):
+    """A batch line that is not a usable record; carries its 1-based line number."""
+
+    def __init__(self, line, message):
+        super().__init__(line, message)
+        self.line = line
+        self.message = message
+
+    def __str__(self):
+        return f"line {self.line}: {self.message}"
+
+def iter_batch_records(lines, base_dir="."):
+    """
+    Yield (url, html_path) pairs from a batch stream, one record per line.
+
+    Lines are either NDJSON objects ({"url": ..., "html_path": ...}) or plain
+    manifest entries ("<url> <html_path>"). Blank lines and "#" comments are
+    skipped; relative paths resolve against base_dir. Lines are consumed
+    lazily, so arbitrarily large manifests stream in constant memory.
+
+    A line that is not valid JSON, or is JSON but not an object with string
+    fields, is yielded as (None, BadBatchLine) so the batch carries on;
+    check_batch_record() raises it and batch_error() reports its line number.
+    """
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line[0] in "{[\"":
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield None, BadBatchLine(line_no, f"invalid JSON: {e}")
+                continue
+            if not isinstance(record, dict):
+                yield None, BadBatchLine(line_no, f"expected a JSON object, got {type(record).__name__}")
+                continue
+            url, path = record.get("url"), record.get("html_path")
+            if not isinstance(url, (str, type(None))) or not isinstance(path, (str, type(None))):
+                yield None, BadBatchLine(line_no, "url and html_path must be strings")
+                continue
+        else:
+            parts = line.split(None, 1)
+            url, path = parts[0], parts[1] if len(parts) > 1 else None
+        if path:
+            path = os.path.join(base_dir, path)
+        yield url, path
+
+def check_batch_record(url, path):
+    """Raise if a batch record cannot be analyzed (a bad line, or a missing url/html_path)."""
+    if isinstance(path, BadBatchLine):
+        raise path
+    if not url or not path:
+        raise ValueError("record needs both url and html_path")
+
+def batch_error(url, path, error):
+    """The {"url", "html_path", "error"} line written for a failed record (plus "line" for a bad one)."""
+    if isinstance(error, BadBatchLine):
+        return {"url": None, "line": error.line, "error": str(error)}
+    return {"url": url, "html_path": path, "error": str(error)}
+
+def iter_html_dir(directory: str):
+    """Yield (url, html_path) for every .html/.htm file in directory."""
+    names = sorted(
+        e.name for e in os.scandir(directory)
+        if e.is_file() and e.name.lower().endswith((".html", ".htm"))
+    )
+    for name in names:
+        path = os.path.abspath(os.path.join(directory, name))
+        yield "file://" + path, path
+
+def analyze_batch(records, out=sys.stdout, analyzer: HtmlAnalyzer = None):
+    """
+    Analyze (url, html_path) records in this process and write one compact
+    JSON line per record as soon as it is done. Failures, including
+    unreadable manifest lines, become error lines instead of aborting the
+    batch.
+    Returns (succeeded, failed).
+    """
+    analyzer = analyzer or _default_analyzer
+    ok = failed = 0
+    for url, path in records:
+        try:
+            check_batch_record(url, path)
+            result = analyzer.analyze(url, read_html_file(path))
+            ok += 1
+        except Exception as e:
+            result = batch_error(url, path, e)
+            failed += 1
+        out.write(json.dumps(result, ensure_ascii=False, separators=(",", ":")) + "\n")
+        out.flush()
+    return ok, failed
+
+def open_batch_source(source: str):
+    """Return (lines, base_dir) for a manifest path or "-" (stdin)."""
+    if source == "-":
+        return sys.stdin, "."
+    return open(source, "r", encoding="utf-8"), os.path.dirname(os.path.abspath(source))
+
+def _dump_profile(path):
+    if path and profiling.dump(path):
+        print(f"cProfile stats written to {path} (python3 -m pstats {path})", file=sys.stderr)
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--url", required=True)
-    ap.add_argument("--html_file", required=True)
+    ap.add_argument("--url")
+    ap.add_argument("--html_file", help="Page to analyze; '-' reads the HTML from stdin")
+    ap.add_argument("--batch", metavar="MANIFEST",
+                    help="NDJSON {url, html_path} records or '<url> <html_path>' lines; '-' reads stdin")
+    ap.add_argument("--html_dir", help="Analyze every .html file in this directory")
+    ap.add_argument("--cache", metavar="PATH", help="Reuse results from this analysis cache (SQLite file)")
+    ap.add_argument("--max-input-chars", type=int, default=MAX_INPUT_CHARS,
+                    help="Analyze at most this many characters of each page")
+    ap.add_argument("--stage-budget-ms", type=float,
+                    help="CPU budget for every analyzer stage (default: per-stage STAGE_BUDGETS_MS)")
+    ap.add_argument("--profile", action="store_true", help="Record per-stage wall/CPU time under a `timings` key")
+    ap.add_argument("--profile-dump", metavar="PATH", help="Also write cProfile stats (pstats format) to PATH")
     args = ap.parse_args()
 
-    with open(args.html_file, "r", encoding="utf-8", errors="ignore") as f:
-        html = f.read()
-
-    text = strip_html(html)
-    domain = urlparse(args.url).netloc
-    title = extract_title(text)
-    price = extract_price(text)
-    return_policy = extract_snippet(text, ["return", "refund", "replacement", "warranty", "cancel"])
-    review_snip = extract_snippet(text, ["review", "rating", "stars"])
-    
-    # Analyze return policy
-    return_analysis = analyze_return_policy(text)
-    
-    # Analyze warranty & support
-    warranty_analysis = analyze_warranty_support(text)
-    
-    # Analyze hidden costs
-    hidden_costs = analyze_hidden_costs(text, price)
-
-    signals = {
-        "url": args.url,
-        "domain": domain,
-        "title": title,
-        "price": price,
-        "return_policy_snippet": return_policy,
-        "review_snippet": review_snip,
-        "text": text[:4000]  # keep bounded for speed
-    }
+    if args.profile or args.profile_dump:
+        profiling.enable(cprofile=bool(args.profile_dump))
 
-    scored = score(signals)
+    budgets = {name: args.stage_budget_ms for name in STAGE_BUDGETS_MS} if args.stage_budget_ms else None
+    analyzer = HtmlAnalyzer(
+        cache=AnalysisCache(args.cache) if args.cache else None,
+        max_input_chars=args.max_input_chars,
+        stage_budgets_ms=budgets,
+    )
 
-    out = {
-        "url": args.url,
-        "domain": domain,
-        "title_guess": title,
-        "price_guess": price,
-        "snippets": {
-            "return_policy": return_policy,
-            "reviews": review_snip
-        },
-        "return_policy_analysis": return_analysis,
-        "warranty_support_analysis": warranty_analysis,
-        "hidden_costs_analysis": hidden_costs,
-        **scored,
-        "evidence_sample": text[:600]
-    }
+    if args.batch or args.html_dir:
+        # Batch mode: one warm process, compact NDJSON out, constant memory
+        if args.html_dir:
+            records = iter_html_dir(args.html_dir)
+            ok, failed = profiling.profiled(analyze_batch, records, analyzer=analyzer)
+        else:
+            lines, base_dir = open_batch_source(args.batch)
+            with lines:
+                ok, failed = profiling.profiled(analyze_batch, iter_batch_records(lines, base_dir), analyzer=analyzer)
+        print(f"Analyzed {ok} pages ({failed} failed)", file=sys.stderr)
+        if analyzer.cache is not None:
+            stats = analyzer.cache.stats()
+            print(f"Analysis cache: {stats['hits']} hits, {stats['misses']} misses", file=sys.stderr)
+        if profiling.enabled():
+            # Batch stdout stays one result per line; the totals go to stderr
+            print(json.dumps({"timings": profiling.timings()}), file=sys.stderr)
+            _dump_profile(args.profile_dump)
+        return
+
+    if not args.url or not args.html_file:
+        ap.error("--url and --html_file are required unless --batch or --html_dir is given")
+
+    with stage("read_html"):
+        html = read_html_file(args.html_file)
+
+    out = profiling.profiled(analyzer.analyze, args.url, html)
+    if profiling.enabled():
+        out["timings"] = profiling.timings()
+        _dump_profile(args.profile_dump)
 
     print(json.dumps(out, ensure_ascii=False, indent=2))
 
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Analyzer benchmark suite
+Per-stage timing and peak memory on synthetic pages, with saved baselines and regression checks (offline)
+"""
+
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+
+from analyze_from_html import (
+    HtmlAnalyzer, Document, parse_html, strip_html, extract_price, score,
+    analyze_return_policy, analyze_warranty_support, analyze_hidden_costs,
+    DISCOUNT_KEYWORDS, REFERENCE_PRICE_KEYWORDS, REVIEW_KEYWORDS, RECENT_REVIEW_KEYWORDS,
+    AUTHENTIC_REVIEW_KEYWORDS, PHOTO_REVIEW_KEYWORDS, GENERIC_PRAISE_KEYWORDS, HYPE_KEYWORDS, URGENCY_KEYWORDS,
+)
+from synthetic_pages import synthetic_page, adversarial_page, ADVERSARIAL_PAGES
+
+DEFAULT_SIZES = [50_000, 1_000_000, 5_000_000, 10_000_000]
+DEFAULT_BUDGET_MS = 2000  # per 5 MB page, full pipeline
+DEFAULT_SCORE_BUDGET_MS = 250  # per 5 MB page, keyword scan + score() over the whole document
+SCORE_BUDGET_FLOOR_MS = 10  # small pages: fixed per-page cost dominates, not size
+DEFAULT_THRESHOLD = 0.25  # flag stages more than 25% slower (or bigger) than baseline
+ADVERSARIAL_SIZES = [600_000, 1_200_000, 2_400_000]  # above the tag/comment caps
+MAX_GROWTH = 1.5  # time may grow at most 1.5x faster than input size (noise allowance)
+TRUNCATED_WINDOW = 4000
+
+def substring_scan(text):
+    """
+    The keyword work score() did before the shared keyword index: lower-case
+    the first TRUNCATED_WINDOW characters and test each keyword list with
+    `k in lower`, short-circuiting where the old checks used any().
+    """
+    lower = text[:TRUNCATED_WINDOW].lower()
+    hits = 0
+    for keywords in (DISCOUNT_KEYWORDS, REFERENCE_PRICE_KEYWORDS, REVIEW_KEYWORDS, RECENT_REVIEW_KEYWORDS,
+                     PHOTO_REVIEW_KEYWORDS, URGENCY_KEYWORDS):
+        hits += any(k in lower for k in keywords)
+    for keywords in (AUTHENTIC_REVIEW_KEYWORDS, GENERIC_PRAISE_KEYWORDS, HYPE_KEYWORDS):
+        hits += sum(1 for k in keywords if k in lower)
+    return hits
+
+def stage_functions(html):
+    """
+    (name, fn) pairs for each analyzer stage on one page. Inputs for each
+    stage are prepared up front so a stage's timing covers only that stage.
+
+    "score" reuses the page's prebuilt hit table; "score_full" and
+    "score_truncated" each build their own, from the whole text and from the
+    first TRUNCATED_WINDOW characters (the old main() path), so the cost of
+    scanning the full document is part of the comparison. "substring_scan"
+    is the old truncated path's keyword work, the reference for "score".
+    """
+    text, lower, structured = parse_html(html)
+    doc = Document(text, lower, structured=structured)
+    signals = {"domain": "shop.example.com", "price": doc.price, "document": doc}
+    analyzer = HtmlAnalyzer()
+    return [
+        ("strip_html", lambda: strip_html(html)),
+        ("extract_price", lambda: extract_price(text)),
+        ("document", lambda: Document(text, lower, structured=structured)),
+        ("analyze_return_policy", lambda: analyze_return_policy(doc)),
+        ("analyze_warranty_support", lambda: analyze_warranty_support(doc)),
+        ("analyze_hidden_costs", lambda: analyze_hidden_costs(doc)),
+        ("score", lambda: score(signals)),
+        ("score_full", lambda: score(dict(signals, document=Document(text, lower, structured=structured)))),
+        ("score_truncated", lambda: score({"domain": signals["domain"], "price": doc.price,
+                                           "text": text[:TRUNCATED_WINDOW]})),
+        ("substring_scan", lambda: substring_scan(text)),
+        ("analyze", lambda: analyzer.analyze("https://shop.example.com/p", html)),
+    ]
+
+def _best(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def _peak(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench_page(html, repeat=3):
+    """
+    Best-of-`repeat` wall time (ms) and peak traced allocation (KB) per stage.
+    Memory is measured in a separate run so tracing does not skew timings.
+    """
+    stages = {}
+    for name, fn in stage_functions(html):
+        stages[name] = {
+            "ms": round(_best(fn, repeat) * 1000, 3),
+            "peak_kb": round(_peak(fn) / 1024, 1),
+        }
+    return {"bytes": len(html.encode("utf-8")), "stages": stages}
+
+def run_suite(sizes, repeat=5, seed=0):
+    results = {}
+    for size in sizes:
+        row = bench_page(synthetic_page(size, seed), repeat)
+        results[str(size)] = row
+        st = row["stages"]
+        print(f"⏳ {row['bytes']:>9} bytes: analyze {st['analyze']['ms']} ms "
+              f"(peak {st['analyze']['peak_kb']} KB), full-document score {st['score_full']['ms']} ms "
+              f"({st['score']['ms']} ms over the page's hit table) vs truncated substring scan "
+              f"{st['substring_scan']['ms']} ms", file=sys.stderr)
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "seed": seed,
+        "results": results,
+    }
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, min_ms=0.05):
+    """
+    Stages slower or using more memory than baseline by more than `threshold`
+    (a fraction). Timings under `min_ms` in both runs are treated as noise.
+    """
+    regressions = []
+    for size, base_row in baseline["results"].items():
+        row = current["results"].get(size)
+        if row is None:
+            continue
+        for stage, base in base_row["stages"].items():
+            cur = row["stages"].get(stage)
+            if cur is None:
+                continue
+            if max(base["ms"], cur["ms"]) >= min_ms and cur["ms"] > base["ms"] * (1 + threshold):
+                regressions.append({"size": size, "stage": stage, "metric": "ms",
+                                    "baseline": base["ms"], "current": cur["ms"]})
+            if cur["peak_kb"] > base["peak_kb"] * (1 + threshold) and cur["peak_kb"] - base["peak_kb"] > 64:
+                regressions.append({"size": size, "stage": stage, "metric": "peak_kb",
+                                    "baseline": base["peak_kb"], "current": cur["peak_kb"]})
+    return regressions
+
+def slower_than(report, stage, reference, min_ms=0.05):
+    """Sizes where `stage` takes longer than `reference` (both under min_ms counts as a tie)."""
+    return [size for size, row in report["results"].items()
+            if max(row["stages"][stage]["ms"], row["stages"][reference]["ms"]) >= min_ms
+            and row["stages"][stage]["ms"] > row["stages"][reference]["ms"]]
+
+def over_budget(report, budget_ms, stage="analyze", floor_ms=0):
+    """Sizes where `stage` exceeds the 5 MB budget scaled to their size (never below floor_ms)."""
+    return [size for size, row in report["results"].items()
+            if row["stages"][stage]["ms"] > max(floor_ms, budget_ms * row["bytes"] / 5_000_000)]
+
+def run_adversarial(sizes=ADVERSARIAL_SIZES, repeat=2):
+    """
+    Full-pipeline time for every hostile page kind at doubling sizes.
+
+    Reports the worst time per MB and the largest growth factor between
+    consecutive sizes. Linear behaviour keeps growth near 1; the tag and
+    comment caps can raise it once a page crosses them, so growth is a
+    warning while the per-MB bound is the hard limit (a quadratic pattern
+    would blow it by orders of magnitude at these sizes).
+    """
+    analyzer = HtmlAnalyzer()
+    report = {}
+    for kind in ADVERSARIAL_PAGES:
+        times = []
+        for size in sizes:
+            html = adversarial_page(kind, size)
+            times.append(_best(lambda: analyzer.analyze("https://hostile.example/p", html), repeat))
+        # Time ratio per size ratio between consecutive runs (tiny timings are noise)
+        ratios = [(b / a) / (s2 / s1) for a, b, s1, s2 in zip(times, times[1:], sizes, sizes[1:]) if a > 0.001]
+        growth = max(ratios) if ratios else None
+        worst = max(t / (s / 1_000_000) for t, s in zip(times, sizes))
+        report[kind] = {
+            "ms": {str(s): round(t * 1000, 2) for s, t in zip(sizes, times)},
+            "worst_ms_per_mb": round(worst * 1000, 1),
+            "growth": round(growth, 2) if growth is not None else None,
+        }
+        print(f"⏳ {kind}: worst {report[kind]['worst_ms_per_mb']} ms/MB, growth x{report[kind]['growth']}",
+              file=sys.stderr)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analyzer stages on synthetic pages")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Page sizes in characters")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic page seed")
+    parser.add_argument("--save", metavar="BASELINE", help="Write results to this baseline file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Flag regressions against this baseline file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown/memory growth as a fraction (default 0.25)")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Full-pipeline latency budget for a 5 MB page (scaled for other sizes)")
+    parser.add_argument("--score-budget-ms", type=float, default=DEFAULT_SCORE_BUDGET_MS,
+                        help="Budget for scanning and scoring a whole 5 MB page (scaled for other sizes)")
+    parser.add_argument("--adversarial", action="store_true",
+                        help="Time hostile pages at doubling sizes; fail if 1 MB of hostile input "
+                             "costs more than the 5 MB budget, warn on super-linear growth")
+    args = parser.parse_args()
+
+    if args.adversarial:
+        report = run_adversarial()
+        print(json.dumps({"max_growth": MAX_GROWTH, "results": report}, indent=2))
+        for kind, r in report.items():
+            if (r["growth"] or 0) > MAX_GROWTH:
+                print(f"⚠️ {kind}: time grew x{r['growth']} faster than input size", file=sys.stderr)
+        bad = [k for k, r in report.items() if r["worst_ms_per_mb"] > args.budget_ms]
+        if bad:
+            print(f"❌ Super-linear or over-budget on: {', '.join(bad)}", file=sys.stderr)
+            sys.exit(1)
+        print("✅ All hostile inputs analyzed within budget", file=sys.stderr)
+        return
+
+    report = run_suite(args.sizes, args.repeat, args.seed)
+    report["budget_ms_per_5mb"] = args.budget_ms
+    report["score_budget_ms_per_5mb"] = args.score_budget_ms
+    failed = False
+
+    slow = over_budget(report, args.budget_ms)
+    if slow:
+        print(f"❌ Full pipeline over the latency budget at sizes: {', '.join(slow)}", file=sys.stderr)
+        failed = True
+
+    slow = over_budget(report, args.score_budget_ms, "score_full", SCORE_BUDGET_FLOOR_MS)
+    if slow:
+        print(f"❌ Full-document scoring over its budget at sizes: {', '.join(slow)}", file=sys.stderr)
+        failed = True
+    else:
+        print(f"✅ Full-document scoring within {args.score_budget_ms:g} ms per 5 MB", file=sys.stderr)
+
+    # The whole-document keyword index is built once per page and shared with every analyze_* stage;
+    # scoring from it must cost no more than the old truncated substring scan did
+    slow = slower_than(report, "score", "substring_scan")
+    if slow:
+        print(f"❌ Scoring the whole document is slower than the old truncated scan at sizes: {', '.join(slow)}",
+              file=sys.stderr)
+        failed = True
+    else:
+        print("✅ Scoring the whole document is no slower than the old truncated scan", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        report["regressions"] = regressions
+        for r in regressions:
+            print(f"❌ {r['stage']} @ {r['size']}: {r['metric']} {r['baseline']} -> {r['current']}", file=sys.stderr)
+        if regressions:
+            failed = True
+        else:
+            print(f"✅ No regressions beyond {args.threshold:.0%} against {args.compare}", file=sys.stderr)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Saved baseline to {args.save}", file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
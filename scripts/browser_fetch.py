@@ -7,11 +7,19 @@ Fixes Amazon search and multi-word query issues
 import sys
 import json
 import re
-import time
 from urllib.parse import quote_plus
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
 from playwright_stealth import Stealth
 
+from deadline import Deadline
+from rate_limiter import RateLimiter
+
+# Per-domain politeness (amazon.in gets a slower bucket); replaces fixed retry sleeps
+LIMITER = RateLimiter()
+
+class Throttled(Exception):
+    """The site answered 429/503; the limiter has already scheduled the backoff."""
+
 # Site-specific configurations
 SITE_CONFIGS = {
     "flipkart.com": {
@@ -19,8 +27,7 @@ SITE_CONFIGS = {
         "product_selector": "a[href*='/p/']",
         "wait_for": "div[data-id]",
         "wait_for_backup": "div._75nlfW",  # Backup selector
-        "max_wait": 10000,
-        "retry_delay": 2
+        "max_wait": 10000
     },
     "amazon.in": {
         "search_url": "https://www.amazon.in/s?k={query}",
@@ -28,7 +35,6 @@ SITE_CONFIGS = {
         "wait_for": "div.s-result-list",
         "wait_for_backup": "div[data-asin]",
         "max_wait": 15000,
-        "retry_delay": 10,  # Longer delay for Amazon rate limiting
         "use_asin": True  # Special flag to extract ASIN and build URLs
     },
     "myntra.com": {
@@ -36,44 +42,39 @@ SITE_CONFIGS = {
         "product_selector": "a[href*='/product/']",
         "wait_for": "div.search-searchProductsContainer",
         "wait_for_backup": "li.product-base",
-        "max_wait": 20000,
-        "retry_delay": 2
+        "max_wait": 20000
     },
     "snapdeal.com": {
         "search_url": "https://www.snapdeal.com/search?keyword={query}",
         "product_selector": "div.product-tuple-listing a.dp-widget-link",
         "wait_for": "div.product-tuple-listing",
         "wait_for_backup": "section.js-products",
-        "max_wait": 15000,
-        "retry_delay": 2
+        "max_wait": 15000
     },
     "bajajelectricals.com": {
         "search_url": "https://www.bajajelectricals.com/search?q={query}",
         "product_selector": "a[href*='/products/']",
         "wait_for": "div.grid-product",
         "wait_for_backup": "a[href*='/products/']",
-        "max_wait": 10000,
-        "retry_delay": 2
+        "max_wait": 10000
     },
     "clovia.com": {
         "search_url": "https://www.clovia.com/search?q={query}",
         "product_selector": "a[href*='/product/']",
         "wait_for": "div.product-card",
         "wait_for_backup": "a[href*='/product/']",
-        "max_wait": 10000,
-        "retry_delay": 2
+        "max_wait": 10000
     },
     "campusshoes.com": {
         "search_url": "https://www.campusshoes.com/search?q={query}",
         "product_selector": "a[href*='/products/']",
         "wait_for": "div.product-item",
         "wait_for_backup": "a[href*='/products/']",
-        "max_wait": 10000,
-        "retry_delay": 2
+        "max_wait": 10000
     }
 }
 
-def fetch_with_playwright(domain, query, max_results=3, retry=True):
+def fetch_with_playwright(domain, query, max_results=3, retry=True, deadline=None):
     """
     Fetch search results using Playwright with enhanced reliability
     
@@ -82,6 +83,7 @@ def fetch_with_playwright(domain, query, max_results=3, retry=True):
         query: Search query (will be properly URL-encoded)
         max_results: Maximum number of product URLs to return
         retry: Whether to retry on failure
+        deadline: Deadline capping every page wait (and skipping the retry once passed)
     
     Returns:
         List of product URLs
@@ -91,6 +93,7 @@ def fetch_with_playwright(domain, query, max_results=3, retry=True):
         return []
     
     config = SITE_CONFIGS[domain]
+    deadline = deadline or Deadline()
     
     # Properly URL-encode the query
     encoded_query = quote_plus(query)
@@ -100,6 +103,10 @@ def fetch_with_playwright(domain, query, max_results=3, retry=True):
     print(f"URL: {search_url}", file=sys.stderr)
     
     try:
+        # Wait for this domain's token (and any backoff from an earlier 429/503) before starting a browser;
+        # a wait that would outlast the deadline fails now instead
+        LIMITER.wait(domain, deadline)
+        
         with sync_playwright() as p:
             # Launch with stealth args
             browser = p.chromium.launch(
@@ -127,11 +134,10 @@ def fetch_with_playwright(domain, query, max_results=3, retry=True):
             stealth_config = Stealth()
             stealth_config.apply_stealth_sync(page)
             
-            # Add extra delay before navigation (helps with rate limiting)
-            time.sleep(config.get('retry_delay', 2))
-            
             print(f"Navigating to {search_url}...", file=sys.stderr)
-            page.goto(search_url, wait_until='domcontentloaded', timeout=30000)
+            response = page.goto(search_url, wait_until='domcontentloaded', timeout=deadline.cap_ms(30000))
+            if response is not None and LIMITER.feedback(domain, response.status, response.headers.get("retry-after")) is not None:
+                raise Throttled(f"HTTP {response.status}")
             
             # Simulate human behavior
             page.wait_for_timeout(2000)
@@ -141,13 +147,13 @@ def fetch_with_playwright(domain, query, max_results=3, retry=True):
             
             # Wait for product results - try primary selector first
             try:
-                page.wait_for_selector(config["wait_for"], timeout=config["max_wait"])
+                page.wait_for_selector(config["wait_for"], timeout=deadline.cap_ms(config["max_wait"]))
                 print(f"✓ Found primary selector: {config['wait_for']}", file=sys.stderr)
             except PlaywrightTimeout:
                 # Try backup selector
                 if config.get("wait_for_backup"):
                     try:
-                        page.wait_for_selector(config["wait_for_backup"], timeout=5000)
+                        page.wait_for_selector(config["wait_for_backup"], timeout=deadline.cap_ms(5000))
                         print(f"✓ Found backup selector: {config['wait_for_backup']}", file=sys.stderr)
                     except:
                         print(f"Warning: Neither selector found, continuing anyway...", file=sys.stderr)
@@ -218,11 +224,13 @@ def fetch_with_playwright(domain, query, max_results=3, retry=True):
     except Exception as e:
         print(f"Error fetching {domain}: {e}", file=sys.stderr)
         
-        # Retry once if enabled and this is first attempt
-        if retry:
-            print(f"Retrying {domain} after {config.get('retry_delay', 3)} seconds...", file=sys.stderr)
-            time.sleep(config.get('retry_delay', 3))
-            return fetch_with_playwright(domain, query, max_results, retry=False)
+        # Retry once if enabled, this is the first attempt and the deadline allows
+        # (a TimeoutError is the rate limit wait not fitting in it)
+        if retry and not deadline.expired and not isinstance(e, TimeoutError):
+            if not isinstance(e, Throttled):
+                LIMITER.penalize(domain)
+            print(f"Retrying {domain} after backoff...", file=sys.stderr)
+            return fetch_with_playwright(domain, query, max_results, retry=False, deadline=deadline)
         
         return []
 
@@ -233,10 +241,24 @@ def main():
     parser.add_argument('--domain', required=True, help='Site domain (e.g., flipkart.com)')
     parser.add_argument('--query', required=True, help='Search query')
     parser.add_argument('--max-results', type=int, default=3, help='Max results to return')
+    parser.add_argument('--search-cache', help='Store the URLs in this search cache (SQLite file)')
+    parser.add_argument('--archive', metavar='DIR', help='Record the URLs into this page archive')
+    parser.add_argument('--replay', metavar='DIR', help='Answer from the page archive in DIR instead of opening a browser')
+    parser.add_argument('--timeout', type=float, help='Seconds this search may take in total (caps page waits and retries)')
     
     args = parser.parse_args()
     
-    urls = fetch_with_playwright(args.domain, args.query, args.max_results)
+    if args.replay:
+        from page_archive import PageArchive
+        urls = PageArchive(args.replay).get_urls(args.domain, args.query, args.max_results) or []
+    else:
+        urls = fetch_with_playwright(args.domain, args.query, args.max_results, deadline=Deadline(args.timeout))
+    if args.archive and urls and not args.replay:
+        from page_archive import PageArchive
+        PageArchive(args.archive).put_urls(args.domain, args.query, args.max_results, urls)
+    if args.search_cache and urls:
+        from search_cache import SearchCache
+        SearchCache(args.search_cache).put(args.domain, args.query, args.max_results, urls)
     
     # Output as JSON
     print(json.dumps({
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Vectorized bulk scoring with NumPy
+Turns each page into a fixed-width feature vector and scores thousands of pages at once from a weights table
+"""
+
+import sys
+import json
+import argparse
+from urllib.parse import urlparse
+
+from analyze_from_html import (
+    REFUND_KEYWORDS, REPLACEMENT_KEYWORDS, NON_RETURNABLE_KEYWORDS, FREE_PICKUP_KEYWORDS,
+    PICKUP_KEYWORDS, DROP_OFF_KEYWORDS, FREE_KEYWORDS, HASSLE_FREE_KEYWORDS, RETURN_CONDITION_KEYWORDS,
+    BRAND_WARRANTY_KEYWORDS, SELLER_WARRANTY_KEYWORDS, SERVICE_CENTER_KEYWORDS, NATIONWIDE_KEYWORDS,
+    INSTALLATION_KEYWORDS, OFFICIAL_STORE_KEYWORDS, EXTENDED_WARRANTY_KEYWORDS, FREE_DELIVERY_KEYWORDS,
+    DELIVERY_KEYWORDS, FREE_INSTALLATION_KEYWORDS, GST_INCLUDED_KEYWORDS, GST_EXCLUDED_KEYWORDS,
+    COD_KEYWORDS, DISCOUNT_KEYWORDS, REFERENCE_PRICE_KEYWORDS, REVIEW_KEYWORDS, RECENT_REVIEW_KEYWORDS,
+    AUTHENTIC_REVIEW_KEYWORDS, PHOTO_REVIEW_KEYWORDS, GENERIC_PRAISE_KEYWORDS, HYPE_KEYWORDS,
+    URGENCY_KEYWORDS, DELIVERY_PATTERNS, INSTALLATION_PATTERNS, CONVENIENCE_PATTERNS, PACKAGING_PATTERNS,
+    COD_PATTERN, RISKY_TLDS, SCORE_WEIGHTS, GST_RATE,
+    Document, HtmlAnalyzer, parse_html, parse_amount, find_fee, find_return_window, find_warranty_months,
+    read_html_file, iter_batch_records, iter_html_dir, open_batch_source, check_batch_record, batch_error,
+)
+
+# Column order of the feature matrix. Flags are 0/1, counts and amounts are raw values.
+FEATURES = [
+    # deal / review / safety
+    "price_present", "base_price", "discount", "reference_price",
+    "review", "recent_review", "authentic_mentions", "photo_review",
+    "generic_praise", "hype", "urgency", "risky_tld",
+    # returns
+    "return_days", "refund", "replacement", "non_returnable", "free_pickup", "pickup",
+    "drop_off", "free_mention", "hassle_free", "return_conditions",
+    # warranty / support
+    "warranty_found", "warranty_months", "brand_warranty", "seller_warranty", "service_center",
+    "nationwide", "installation_support", "official_store", "extended_warranty",
+    # hidden costs
+    "free_delivery", "delivery_fee_found", "delivery_fee", "delivery_mention",
+    "free_installation", "installation_fee_found", "installation_fee",
+    "convenience_fee_found", "convenience_fee", "gst_included", "gst_excluded",
+    "packaging_fees", "packaging_total", "cod", "cod_fee_found",
+]
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURES)}
+
+# Output columns, named as in the scalar analyzer results
+SCORES = ["deal_truth", "review_integrity", "store_safety",
+          "flexibility_score", "support_score", "transparency_score"]
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("bulk scoring needs NumPy: pip3 install numpy")
+    return numpy
+
+def page_features(doc: Document, domain: str) -> list:
+    """Fixed-width feature vector (ordered as FEATURES) for one page."""
+    lower, hits = doc.lower, doc.hits
+    return_days = find_return_window(lower)
+    warranty_months = find_warranty_months(lower)
+    delivery_fee = find_fee(DELIVERY_PATTERNS, lower)
+    installation_fee = find_fee(INSTALLATION_PATTERNS, lower)
+    convenience_fee = find_fee(CONVENIENCE_PATTERNS, lower)
+    packaging = [float(m.group(1).replace(",", "")) for m in
+                 (p.search(lower) for p in PACKAGING_PATTERNS) if m]
+
+    row = {
+        "price_present": doc.price is not None,
+        "base_price": parse_amount(doc.price),
+        "discount": hits.any(DISCOUNT_KEYWORDS),
+        "reference_price": hits.any(REFERENCE_PRICE_KEYWORDS),
+        "review": hits.any(REVIEW_KEYWORDS),
+        "recent_review": hits.any(RECENT_REVIEW_KEYWORDS),
+        "authentic_mentions": hits.distinct(AUTHENTIC_REVIEW_KEYWORDS),
+        "photo_review": hits.any(PHOTO_REVIEW_KEYWORDS),
+        "generic_praise": hits.distinct(GENERIC_PRAISE_KEYWORDS),
+        "hype": hits.distinct(HYPE_KEYWORDS),
+        "urgency": hits.distinct(URGENCY_KEYWORDS),
+        "risky_tld": domain.endswith(RISKY_TLDS),
+        "return_days": return_days or 0,
+        "refund": hits.any(REFUND_KEYWORDS),
+        "replacement": hits.any(REPLACEMENT_KEYWORDS),
+        "non_returnable": hits.any(NON_RETURNABLE_KEYWORDS),
+        "free_pickup": hits.any(FREE_PICKUP_KEYWORDS),
+        "pickup": hits.any(PICKUP_KEYWORDS),
+        "drop_off": hits.any(DROP_OFF_KEYWORDS),
+        "free_mention": hits.any(FREE_KEYWORDS),
+        "hassle_free": hits.any(HASSLE_FREE_KEYWORDS),
+        "return_conditions": hits.any(RETURN_CONDITION_KEYWORDS),
+        "warranty_found": warranty_months is not None,
+        "warranty_months": warranty_months or 0,
+        "brand_warranty": hits.any(BRAND_WARRANTY_KEYWORDS),
+        "seller_warranty": hits.any(SELLER_WARRANTY_KEYWORDS),
+        "service_center": hits.any(SERVICE_CENTER_KEYWORDS),
+        "nationwide": hits.any(NATIONWIDE_KEYWORDS),
+        "installation_support": hits.any(INSTALLATION_KEYWORDS),
+        "official_store": hits.any(OFFICIAL_STORE_KEYWORDS),
+        "extended_warranty": hits.any(EXTENDED_WARRANTY_KEYWORDS),
+        "free_delivery": hits.any(FREE_DELIVERY_KEYWORDS),
+        "delivery_fee_found": delivery_fee is not None,
+        "delivery_fee": delivery_fee or 0,
+        "delivery_mention": hits.any(DELIVERY_KEYWORDS),
+        "free_installation": hits.any(FREE_INSTALLATION_KEYWORDS),
+        "installation_fee_found": installation_fee is not None,
+        "installation_fee": installation_fee or 0,
+        "convenience_fee_found": convenience_fee is not None,
+        "convenience_fee": convenience_fee or 0,
+        "gst_included": hits.any(GST_INCLUDED_KEYWORDS),
+        "gst_excluded": hits.any(GST_EXCLUDED_KEYWORDS),
+        "packaging_fees": len(packaging),
+        "packaging_total": sum(packaging),
+        "cod": hits.any(COD_KEYWORDS),
+        "cod_fee_found": COD_PATTERN.search(lower) is not None,
+    }
+    return [float(row[name]) for name in FEATURES]
+
+def design_columns(X):
+    """Feature columns plus the derived indicators the weights table refers to."""
+    np = _numpy()
+    col = {name: X[:, i] for name, i in FEATURE_INDEX.items()}
+    on = {name: c > 0 for name, c in col.items()}
+
+    days, months = col["return_days"], col["warranty_months"]
+    base = col["base_price"]
+    delivery_charged = ~on["free_delivery"] & on["delivery_fee_found"]
+    installation_charged = ~on["free_installation"] & on["installation_fee_found"]
+    gst_extra = ~on["gst_included"] & on["gst_excluded"]
+
+    # Same accumulation order as analyze_hidden_costs()
+    hidden = np.where(delivery_charged, col["delivery_fee"], 0.0)
+    hidden = hidden + np.where(installation_charged, col["installation_fee"], 0.0)
+    hidden = hidden + np.where(on["convenience_fee_found"], col["convenience_fee"], 0.0)
+    hidden = hidden + np.where(gst_extra & (base > 0), base * GST_RATE, 0.0)
+    hidden = hidden + col["packaging_total"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hidden_pct = np.where((base > 0) & (hidden > 0), hidden / np.where(base > 0, base, 1.0) * 100, 0.0)
+
+    derived = {
+        "no_price": ~on["price_present"],
+        "discount_without_reference": on["discount"] & ~on["reference_price"],
+        "no_reviews": ~on["review"],
+        "no_recent_review": ~on["recent_review"],
+        "authentic_3plus": col["authentic_mentions"] >= 3,
+        "authentic_1to2": (col["authentic_mentions"] >= 1) & (col["authentic_mentions"] < 3),
+        "no_authentic": col["authentic_mentions"] < 1,
+        "no_photo_review": ~on["photo_review"],
+        "generic_4plus": col["generic_praise"] >= 4,
+        "hype_2plus": col["hype"] >= 2,
+        "urgency_3plus": col["urgency"] >= 3,
+        "paid_pickup": ~on["free_pickup"] & on["pickup"],
+        "drop_off_not_free": on["drop_off"] & ~on["free_mention"],
+        "window_30plus": days >= 30,
+        "window_15to29": (days >= 15) & (days < 30),
+        "window_10to14": (days >= 10) & (days < 15),
+        "window_7to9": (days >= 7) & (days < 10),
+        "warranty_24plus": on["warranty_found"] & (months >= 24),
+        "warranty_12to23": on["warranty_found"] & (months >= 12) & (months < 24),
+        "warranty_6to11": on["warranty_found"] & (months >= 6) & (months < 12),
+        "warranty_short": on["warranty_found"] & (months < 6),
+        "no_warranty_type": ~on["brand_warranty"] & ~on["seller_warranty"],
+        "nationwide_service": on["service_center"] & on["nationwide"],
+        "delivery_charged": delivery_charged,
+        "delivery_unclear": ~on["free_delivery"] & ~on["delivery_fee_found"] & on["delivery_mention"],
+        "installation_charged": installation_charged,
+        "gst_extra": gst_extra,
+        "cod_fee_found": on["cod"] & on["cod_fee_found"],
+        "cod_unclear": on["cod"] & ~on["cod_fee_found"],
+        "hidden_over_20pct": hidden_pct > 20,
+        "hidden_10to20pct": (hidden_pct > 10) & (hidden_pct <= 20),
+    }
+    columns = dict(col)
+    columns.update({name: c.astype(float) for name, c in derived.items()})
+    return columns
+
+def _term_matrix(np, columns, terms, n):
+    if not terms:
+        return np.zeros(n)
+    D = np.column_stack([columns[name] for name in terms])
+    return D @ np.array(list(terms.values()), dtype=float)
+
+def score_matrix(X, weights=None):
+    """
+    Score every row of feature matrix X (pages x FEATURES) at once.
+    Returns a (pages x SCORES) array.
+    """
+    np = _numpy()
+    weights = weights or SCORE_WEIGHTS
+    X = np.asarray(X, dtype=float).reshape(-1, len(FEATURES))
+    columns = design_columns(X)
+    n = X.shape[0]
+
+    out = np.empty((n, len(SCORES)))
+    for j, name in enumerate(SCORES):
+        spec = weights[name]
+        s = spec["base"] + _term_matrix(np, columns, spec.get("pre"), n)
+        if spec.get("reset"):
+            flag, value = spec["reset"]
+            s = np.where(columns[flag] > 0, value, s)
+        s = s + _term_matrix(np, columns, spec.get("terms"), n)
+        out[:, j] = np.clip(s, 0, 100)
+    return out
+
+def extract_features(records):
+    """Parse (url, html_path) records into (urls, feature matrix, failures)."""
+    np = _numpy()
+    urls, rows, failures = [], [], []
+    for url, path in records:
+        try:
+            check_batch_record(url, path)
+            text, lower, structured = parse_html(read_html_file(path))
+            doc = Document(text, lower, structured=structured)
+            rows.append(page_features(doc, urlparse(url).netloc))
+            urls.append(url)
+        except Exception as e:
+            failures.append(batch_error(url, path, e))
+    return urls, np.array(rows, dtype=float).reshape(-1, len(FEATURES)), failures
+
+def save_features(path, urls, X):
+    np = _numpy()
+    np.savez_compressed(path, features=X, urls=np.array(urls, dtype=str), feature_names=np.array(FEATURES))
+
+def load_features(path):
+    np = _numpy()
+    data = np.load(path)
+    names = [str(n) for n in data["feature_names"]]
+    if names != FEATURES:
+        raise ValueError(f"{path} was saved with a different feature layout; re-extract it")
+    return [str(u) for u in data["urls"]], data["features"]
+
+def check_against_scalar(records, urls, S):
+    """Compare vectorized scores with the scalar analyzer; returns mismatching urls."""
+    analyzer = HtmlAnalyzer()
+    by_url = dict(zip(urls, S))
+    mismatches = []
+    for url, path in records:
+        if url not in by_url:
+            continue
+        result = analyzer.analyze(url, read_html_file(path))
+        scalar = [result["scores"]["deal_truth"], result["scores"]["review_integrity"],
+                  result["scores"]["store_safety"],
+                  result["return_policy_analysis"]["flexibility_score"],
+                  result["warranty_support_analysis"]["support_score"],
+                  result["hidden_costs_analysis"]["transparency_score"]]
+        if any(abs(a - b) > 1e-9 for a, b in zip(scalar, by_url[url])):
+            mismatches.append(url)
+    return mismatches
+
+def _scores_dict(row):
+    return {name: int(v) if float(v).is_integer() else round(float(v), 3) for name, v in zip(SCORES, row)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Score many pages at once from a feature matrix")
+    parser.add_argument("--batch", metavar="MANIFEST",
+                        help="NDJSON {url, html_path} records or '<url> <html_path>' lines; '-' reads stdin")
+    parser.add_argument("--html_dir", help="Score every .html file in this directory")
+    parser.add_argument("--features", metavar="ARCHIVE", help="Re-score a saved feature archive (.npz)")
+    parser.add_argument("--save-features", metavar="ARCHIVE", help="Save the extracted feature matrix (.npz)")
+    parser.add_argument("--weights", metavar="JSON", help="Weights table overriding SCORE_WEIGHTS from analyze_from_html.py")
+    parser.add_argument("--check", action="store_true", help="Verify against the scalar analyzer")
+    args = parser.parse_args()
+
+    if sum(bool(x) for x in (args.batch, args.html_dir, args.features)) != 1:
+        parser.error("exactly one of --batch, --html_dir or --features is required")
+
+    try:
+        _numpy()
+    except ImportError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    weights = None
+    if args.weights:
+        with open(args.weights, "r", encoding="utf-8") as f:
+            weights = {**SCORE_WEIGHTS, **json.load(f)}
+
+    records, failures = [], []
+    if args.features:
+        urls, X = load_features(args.features)
+    else:
+        if args.html_dir:
+            records = list(iter_html_dir(args.html_dir))
+        else:
+            lines, base_dir = open_batch_source(args.batch)
+            with lines:
+                records = list(iter_batch_records(lines, base_dir))
+        urls, X, failures = extract_features(records)
+        if args.save_features:
+            save_features(args.save_features, urls, X)
+
+    S = score_matrix(X, weights)
+    for url, row in zip(urls, S):
+        sys.stdout.write(json.dumps({"url": url, "scores": _scores_dict(row)},
+                                    ensure_ascii=False, separators=(",", ":")) + "\n")
+    for failure in failures:
+        sys.stdout.write(json.dumps(failure, ensure_ascii=False, separators=(",", ":")) + "\n")
+    print(f"✨ Scored {len(urls)} pages ({len(failures)} failed)", file=sys.stderr)
+
+    if args.check:
+        if not records:
+            parser.error("--check needs --batch or --html_dir")
+        if weights:
+            print("⚠️ --check compares against the built-in weights", file=sys.stderr)
+        mismatches = check_against_scalar(records, urls, S)
+        if mismatches:
+            print(f"❌ {len(mismatches)} pages differ from the scalar analyzer, e.g. {mismatches[0]}", file=sys.stderr)
+            sys.exit(1)
+        print("✅ Vectorized scores match the scalar analyzer", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
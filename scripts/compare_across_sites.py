@@ -7,14 +7,65 @@ Searches across bot-friendly e-commerce sites and returns comparison data
 import json
 import sys
 import argparse
-import subprocess
-import tempfile
+import asyncio
+import copy
+import functools
 import os
 import re
-from urllib.parse import quote_plus
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote_plus, urlparse
+from concurrent.futures import ThreadPoolExecutor
 import time
 
+import profiling
+from analysis_cache import AnalysisCache
+from analyze_from_html import (
+    HtmlAnalyzer, HtmlTextExtractor, StageBudget, StageOverrun, STAGE_BUDGETS_MS, stage_cpu_limit,
+)
+from deadline import Deadline, parse_budget
+from http_cache import HttpCache
+from http_client import HttpClient, make_client
+from page_archive import PageArchive, ReplayClient
+from rate_limiter import RateLimiter, DEFAULT_RATE, DEFAULT_BURST, parse_rate
+from search_cache import SearchCache
+from site_stats import SiteStats, DEFAULT_MAX_SITES, DEFAULT_STATS_PATH
+from profiling import stage
+
+# Shared in-process analyzer; main() attaches a result cache when requested
+ANALYZER = HtmlAnalyzer()
+
+# Recent browser searches (domain, query, max results) -> product URLs; main() opens it when requested
+SEARCH_CACHE = None
+
+# Per-site latency/success history that picks the sites to query; main() opens it unless disabled
+SITE_STATS = None
+
+# Page archive that records every fetched page (or, with REPLAY, serves them); main() opens it when requested
+ARCHIVE = None
+REPLAY = False
+
+# One politeness schedule per domain for every fetch path (HTTP, Playwright search, Flipkart)
+LIMITER = RateLimiter()
+
+# Shared keep-alive client for search and product pages; main() may swap in HTTP/2
+HTTP = HttpClient(limiter=LIMITER)
+
+# Concurrency limits for the asyncio pipeline
+MAX_CONCURRENT_FETCHES = 16  # HTTP fetches in flight across all sites
+MAX_PER_DOMAIN = 4           # HTTP fetches in flight to one site (matches the client's per-host pool)
+MAX_BROWSERS = 2             # Playwright / Flipkart subprocesses at once
+FETCH_TIMEOUT = 10           # seconds per HTTP page fetch in total (curl --max-time 10 before the pooled client)
+BROWSER_TIMEOUT = 90         # seconds per browser search
+FLIPKART_TIMEOUT = 60        # seconds per Flipkart product analysis
+BACKGROUND_GRACE = 5         # seconds search refreshes may run on once the results are out
+
+# Streaming downloads
+SEARCH_MAX_BYTES = 4 * 1024 * 1024   # stop reading a search page here even if links are missing
+PAGE_MAX_BYTES = 32 * 1024 * 1024    # decoded bytes of a product page read at most (max_input_chars caps the text)
+LINK_HOLD = 2048                     # chars held back between chunks so a link split across them still matches
+
+# Cold-start site order, used until SITE_STATS has enough history (and always without it)
+PRIORITY_SITES = ["Amazon.in", "Flipkart", "Vijay Sales"]
+
 # Bot-friendly and browser-automation sites
 SEARCH_SITES = [
     {
@@ -99,261 +150,688 @@ SEARCH_SITES = [
     },
 ]
 
-def fetch_with_browser(domain, query, max_results=3):
-    """Fetch product URLs using Playwright (for anti-bot sites)"""
+class Limits:
+    """
+    Concurrency limits for one comparison run.
+
+    `fetch` caps HTTP fetches in flight across all sites, `domain()` caps
+    them per site, and `browser` caps concurrent Playwright/Flipkart
+    subprocesses (this replaces the old staggered starts). `deadline` is the
+    run's budget; every stage caps its own timeout by what is left of it.
+    Work started with background() (search cache refreshes) shares these
+    limits; finish_background() gives it a short grace period once the
+    results are out and cancels the rest.
+    """
+
+    def __init__(self, max_fetches=MAX_CONCURRENT_FETCHES, per_domain=MAX_PER_DOMAIN, max_browsers=MAX_BROWSERS,
+                 deadline=None):
+        # Created inside the running loop (asyncio primitives bind to it on 3.8/3.9)
+        self.fetch = asyncio.Semaphore(max_fetches)
+        self.browser = asyncio.Semaphore(max_browsers)
+        self.per_domain = per_domain
+        self.deadline = deadline or Deadline()
+        self.run_deadline = self.deadline  # for_site() narrows `deadline`; background work keeps the run's
+        self._domains = {}
+        self._background = []
+
+    def for_site(self, deadline):
+        """The same limits with a site's own deadline (shares every semaphore)."""
+        limits = copy.copy(self)
+        limits.deadline = deadline
+        return limits
+
+    def background(self, coro):
+        """Run coro alongside the comparison (shared by every for_site() copy)."""
+        self._background.append(asyncio.ensure_future(coro))
+
+    async def finish_background(self):
+        """
+        Wait up to BACKGROUND_GRACE (and never past the run's deadline) for
+        background work; whatever is still running then is cancelled.
+        """
+        if not self._background:
+            return
+        pending = [task for task in self._background if not task.done()]
+        if pending:
+            grace = self.run_deadline.cap(BACKGROUND_GRACE)
+            print(f"⏳ Giving {len(pending)} background search refresh(es) {grace:.0f}s to finish",
+                  file=sys.stderr, flush=True)
+            _, pending = await asyncio.wait(pending, timeout=grace)
+            for task in pending:
+                task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        self._background = []
+
+    def domain(self, url_or_domain):
+        host = urlparse(url_or_domain).hostname if "://" in url_or_domain else url_or_domain
+        host = (host or "").lower()
+        if host.startswith("www."):
+            host = host[4:]
+        sem = self._domains.get(host)
+        if sem is None:
+            sem = self._domains[host] = asyncio.Semaphore(self.per_domain)
+        return sem
+
+async def run_in_thread(fn, *args):
+    """Run blocking work (HTTP fetch, analysis) on the default executor."""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, functools.partial(profiling.profiled, fn, *args))
+
+async def run_subprocess(cmd, timeout):
+    """
+    Run cmd without blocking the loop; returns (returncode, stdout, stderr).
+
+    On timeout or cancellation the child is killed before the error
+    propagates, so a cancelled comparison leaves no browsers behind.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
     try:
-        # Call the browser_fetch.py script with extended 90s timeout
-        import subprocess
-        script_path = os.path.join(os.path.dirname(__file__), "browser_fetch.py")
-        
-        result = subprocess.run(
-            ["python3", script_path, "--domain", domain, "--query", query, "--max-results", str(max_results)],
-            capture_output=True,
-            text=True,
-            timeout=90  # Increased from 60s to 90s to reduce timeouts
-        )
+        out, err = await asyncio.wait_for(proc.communicate(), timeout)
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+    return proc.returncode, out.decode("utf-8", "replace"), err.decode("utf-8", "replace")
+
+def browser_fetch_command(domain, query, max_results, child_timeout=None):
+    script_path = os.path.join(os.path.dirname(__file__), "browser_fetch.py")
+    cmd = ["python3", script_path, "--domain", domain, "--query", query, "--max-results", str(max_results)]
+    if SEARCH_CACHE is not None:
+        cmd += ["--search-cache", SEARCH_CACHE.path]
+    if child_timeout is not None:
+        cmd += ["--timeout", str(child_timeout)]
+    return cmd
+
+async def refresh_search(domain, query, max_results, limits):
+    """
+    Re-run a stale browser search; browser_fetch.py writes the result to the
+    search cache. It runs inside this comparison, alongside the site
+    searches: it waits for the site's rate limit and a browser slot like a
+    foreground search, so a burst of stale hits cannot launch more than
+    MAX_BROWSERS browsers, and it ends with the run (the deadline, or
+    BACKGROUND_GRACE after the results are printed). However it ends, the
+    entry's refresh lease is released so a later run can try again.
+    """
+    deadline = limits.run_deadline
+    timeout = BROWSER_TIMEOUT
+    try:
+        await asyncio.sleep(deadline.cap(LIMITER.reserve(domain)))
+        async with limits.browser:
+            timeout = deadline.cap(BROWSER_TIMEOUT)
+            if timeout <= 0:
+                return
+            child_timeout = deadline.child_budget(BROWSER_TIMEOUT) if deadline.bounded else None
+            with stage("browser_refresh"):
+                returncode, _, stderr = await run_subprocess(
+                    browser_fetch_command(domain, query, max_results, child_timeout), timeout=timeout)
+        if returncode != 0:
+            LIMITER.penalize(domain)
+            print(f"Background search refresh failed for {domain}: {stderr}", file=sys.stderr)
+    except asyncio.TimeoutError:
+        print(f"Background search refresh for {domain}: timed out after {timeout:.0f}s", file=sys.stderr)
+    except Exception as e:
+        print(f"Background search refresh failed for {domain}: {e}", file=sys.stderr)
+    finally:
+        # A successful refresh already cleared the lease by storing its result
+        SEARCH_CACHE.release_refresh(domain, query, max_results)
+
+async def fetch_with_browser(domain, query, max_results, limits):
+    """Fetch product URLs using Playwright (for anti-bot sites), via the search cache when enabled"""
+    if REPLAY:
+        urls = ARCHIVE.get_urls(domain, query, max_results)
+        if urls is None:
+            print(f"Browser search for {domain} is not in archive {ARCHIVE.root}", file=sys.stderr)
+        return urls or []
+    if SEARCH_CACHE is not None:
+        urls, state = SEARCH_CACHE.get(domain, query, max_results)
+        if urls:
+            # Stale-while-revalidate: answer now, refresh once (leased across runs) alongside this run
+            if state == "stale" and SEARCH_CACHE.claim_refresh(domain, query, max_results):
+                limits.background(refresh_search(domain, query, max_results, limits))
+            archive_urls(domain, query, max_results, urls)
+            return urls
+    
+    deadline = limits.deadline
+    timeout = BROWSER_TIMEOUT
+    try:
+        # Call the browser_fetch.py script with extended 90s timeout (or what is left of the budget)
+        await asyncio.sleep(deadline.cap(LIMITER.reserve(domain)))
+        async with limits.browser:
+            timeout = deadline.cap(BROWSER_TIMEOUT)
+            if timeout <= 0:
+                return []
+            child_timeout = deadline.child_budget(BROWSER_TIMEOUT) if deadline.bounded else None
+            with stage("browser_fetch"):
+                returncode, stdout, stderr = await run_subprocess(
+                    browser_fetch_command(domain, query, max_results, child_timeout),
+                    timeout=timeout
+                )
         
-        if result.returncode == 0:
-            data = json.loads(result.stdout)
+        if returncode == 0:
+            data = json.loads(stdout)
+            archive_urls(domain, query, max_results, data.get("urls", []))
             return data.get("urls", [])
         else:
-            print(f"Browser fetch error for {domain}: {result.stderr}", file=sys.stderr)
+            LIMITER.penalize(domain)
+            print(f"Browser fetch error for {domain}: {stderr}", file=sys.stderr)
             return []
+    except asyncio.TimeoutError:
+        print(f"Browser fetch exception for {domain}: timed out after {timeout:.0f}s", file=sys.stderr)
+        return []
     except Exception as e:
         print(f"Browser fetch exception for {domain}: {e}", file=sys.stderr)
         return []
 
-def fetch_url(url):
-    """Fetch URL using curl with user agent and gzip support"""
+def archive_urls(domain, query, max_results, urls):
+    """Record a browser search's URLs so a --replay run gets the same product list"""
+    if ARCHIVE is not None and urls:
+        try:
+            ARCHIVE.put_urls(domain, query, max_results, urls)
+        except Exception as e:
+            print(f"⚠️ Could not archive {domain} search: {e}", file=sys.stderr)
+
+async def fetch_page(url, limits, stage_name="product_fetch", fetch=None):
+    """fetch_url (or `fetch`) under the global and per-domain limits, with FETCH_TIMEOUT capped by the deadline"""
+    async with limits.fetch, limits.domain(url):
+        timeout = limits.deadline.cap(FETCH_TIMEOUT)
+        if timeout == 0:
+            return None
+        return await run_in_thread(_timed_fetch, stage_name, fetch or fetch_url, url, timeout)
+
+def _timed_fetch(stage_name, fetch, url, timeout):
+    with stage(stage_name):
+        return fetch(url, timeout=timeout)
+
+def fetch_url(url, timeout=None):
+    """Fetch URL through the shared pooled client (keep-alive, gzip, redirects)"""
+    return HTTP.get_text(url, timeout=timeout)
+
+def fetch_parsed(url, timeout=None):
+    """
+    Stream a product page straight into the analyzer's tokenizer, so the page
+    is parsed while it downloads and never held whole. Returns
+    (text, lower, structured, cut_at_bytes) or None on failure; a download
+    cut short by max_input_chars, PAGE_MAX_BYTES, the timeout or the
+    strip_html CPU budget is analyzed as far as it got.
+    """
+    extractor = HtmlTextExtractor()
+    left = {"chars": ANALYZER.max_input_chars or None}
+
+    def feed(chunk):
+        full = False
+        if left["chars"] is not None:
+            chunk = chunk[:left["chars"]]
+            left["chars"] -= len(chunk)
+            full = left["chars"] == 0  # the analyzer ignores input beyond max_input_chars
+        try:
+            extractor.feed(chunk)
+        except StageOverrun:
+            return True  # tokenizing ran out of budget: stop the download here
+        return full
+
     try:
-        result = subprocess.run(
-            ["curl", "-A", "Mozilla/5.0 (Windows NT 10.0; Win64; x64)", "-s", "-L", "--compressed", "--max-time", "10", url],
-            capture_output=True,
-            text=True,
-            timeout=15,
-            errors='replace'  # Handle encoding issues gracefully
-        )
-        return result.stdout if result.returncode == 0 else None
+        with stage_cpu_limit((ANALYZER.stage_budgets_ms or STAGE_BUDGETS_MS).get("strip_html")):
+            resp = HTTP.stream(url, feed, PAGE_MAX_BYTES, timeout=timeout)
     except Exception as e:
         print(f"Error fetching {url}: {e}", file=sys.stderr)
         return None
+    if resp.status >= 400:
+        print(f"Error fetching {url}: HTTP {resp.status}", file=sys.stderr)
+        return None
+    text, lower = extractor.close()
+    return text, lower, extractor.structured_data(), None if resp.complete else resp.received
+
+def stream_product_urls(url, domain, pattern, max_results, on_url=None, timeout=None):
+    """
+    Stream a search page through a SearchLinkExtractor; the download stops as
+    soon as max_results product links are found (or at the timeout). Returns
+    the URLs, or None if the page could not be fetched.
+    """
+    extractor = SearchLinkExtractor(domain, pattern, max_results, on_url)
+    try:
+        resp = HTTP.stream(url, extractor.feed, SEARCH_MAX_BYTES, timeout=timeout)
+    except Exception as e:
+        print(f"Error fetching {url}: {e}", file=sys.stderr)
+        return None
+    if resp.status >= 400:
+        print(f"Error fetching {url}: HTTP {resp.status}", file=sys.stderr)
+        return None
+    extractor.close()
+    return extractor.urls
+
+class SearchLinkExtractor:
+    """
+    Incremental product-link scanner for search pages.
+
+    feed() takes text chunks and returns True once max_results unique product
+    URLs are found (so a streamed download can stop); each new URL is also
+    passed to on_url. The last LINK_HOLD characters are held back between
+    chunks, so a link split across two chunks is still matched whole.
+    """
+
+    def __init__(self, domain, pattern, max_results=3, on_url=None):
+        self.domain = domain
+        self.regex = re.compile(pattern, re.DOTALL)
+        self.max_results = max_results
+        self.on_url = on_url
+        self.urls = []
+        self._seen = set()
+        self._buf = ""
+
+    @property
+    def done(self):
+        return len(self.urls) >= self.max_results
+
+    def _scan(self, final):
+        buf = self._buf
+        limit = len(buf) if final else len(buf) - LINK_HOLD
+        keep = max(0, limit)
+        for m in self.regex.finditer(buf):
+            if m.end() > limit:
+                keep = min(keep, m.start())  # may still grow with the next chunk
+                break
+            keep = m.end()
+            url = product_url(self.domain, m.group(1) if m.re.groups else m.group(0))
+            if url and url not in self._seen:
+                self._seen.add(url)
+                self.urls.append(url)
+                if self.on_url is not None:
+                    self.on_url(url)
+                if self.done:
+                    break
+        self._buf = buf[keep:]
+        return self.done
+
+    def feed(self, chunk):
+        if self.done:
+            return True
+        self._buf += chunk
+        return self._scan(final=False)
+
+    def close(self):
+        if not self.done:
+            self._scan(final=True)
+        self._buf = ""
+        return self.urls
 
 def extract_product_urls(html, domain, pattern, max_results=3):
     """Extract multiple product URLs from search results"""
-    import re
-    
-    matches = re.findall(pattern, html, re.DOTALL)
-    
-    # Build full URLs and deduplicate
-    urls = []
+    return list(iter_product_urls(html, domain, pattern, max_results))
+
+def iter_product_urls(html, domain, pattern, max_results=3):
+    """Yield product URLs from search results as they are found (deduplicated)"""
     seen = set()
     
-    for match in matches:
-        # Clean up URL based on domain
-        if domain == "amazon.in":
-            url = f"https://www.amazon.in{match.split('?')[0]}"
-        elif domain == "ebay.in":
-            url = match.split('?')[0] if match.startswith('http') else f"https://www.ebay.in{match}"
-        elif domain == "shopclues.com":
-            # ShopClues uses seoname from JSON
-            url = f"https://www.shopclues.com/{match}.html"
-        elif domain == "firstcry.com":
-            url = f"https://www.firstcry.com{match}"
-        elif domain == "bewakoof.com":
-            url = f"https://www.bewakoof.com{match}"
-        elif domain == "chumbak.com":
-            url = f"https://www.chumbak.com{match}"
-        elif domain == "croma.com":
-            url = f"https://www.croma.com{match}"
-        elif domain == "vijaysales.com":
-            url = f"https://www.vijaysales.com{match}"
-        elif domain == "poorvika.com":
-            url = f"https://www.poorvika.com{match}"
-        else:
-            continue
-        
-        # Remove query params for cleaner URLs
-        clean_url = url.split('?')[0] if '?' in url else url
-        
-        if clean_url not in seen:
-            urls.append(clean_url)
+    for m in re.finditer(pattern, html, re.DOTALL):
+        clean_url = product_url(domain, m.group(1) if m.re.groups else m.group(0))
+        if clean_url and clean_url not in seen:
             seen.add(clean_url)
-            if len(urls) >= max_results:
+            yield clean_url
+            if len(seen) >= max_results:
                 break
+
+def product_url(domain, match):
+    """Absolute, query-free product URL for a search-page match, or None for an unsupported domain"""
+    # Clean up URL based on domain
+    if domain == "amazon.in":
+        url = f"https://www.amazon.in{match.split('?')[0]}"
+    elif domain == "ebay.in":
+        url = match.split('?')[0] if match.startswith('http') else f"https://www.ebay.in{match}"
+    elif domain == "shopclues.com":
+        # ShopClues uses seoname from JSON
+        url = f"https://www.shopclues.com/{match}.html"
+    elif domain == "firstcry.com":
+        url = f"https://www.firstcry.com{match}"
+    elif domain == "bewakoof.com":
+        url = f"https://www.bewakoof.com{match}"
+    elif domain == "chumbak.com":
+        url = f"https://www.chumbak.com{match}"
+    elif domain == "croma.com":
+        url = f"https://www.croma.com{match}"
+    elif domain == "vijaysales.com":
+        url = f"https://www.vijaysales.com{match}"
+    elif domain == "poorvika.com":
+        url = f"https://www.poorvika.com{match}"
+    else:
+        return None
     
-    return urls
+    # Remove query params for cleaner URLs
+    return url.split('?')[0] if '?' in url else url
 
-def analyze_product_page(url, tmp_dir):
+async def analyze_product_page(url, limits):
     """Fetch and analyze a single product page"""
     
     # Special handling for Flipkart product pages
     if 'flipkart.com' in url and '/p/' in url:
-        return analyze_flipkart_product_page(url, tmp_dir)
+        return await analyze_flipkart_product_page(url, limits)
     
-    # Standard fetch for other sites
-    html = fetch_url(url)
-    if not html:
+    # Standard fetch for other sites: tokenized while it streams in
+    page = await fetch_page(url, limits, fetch=fetch_parsed)
+    if not page:
         return None
+    text, lower, structured, cut_at = page
     
-    # Save to temp file
-    tmp_file = os.path.join(tmp_dir, f"page_{hash(url)}.html")
-    with open(tmp_file, "w", encoding="utf-8", errors="ignore") as f:
-        f.write(html)
-    
-    # Run analyzer
+    # Run analyzer in-process on the parsed page (no temp file, no interpreter spawn)
     try:
-        analyzer_path = os.path.join(
-            os.path.dirname(__file__),
-            "analyze_from_html.py"
-        )
-        result = subprocess.run(
-            ["python3", analyzer_path, "--url", url, "--html_file", tmp_file],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            return json.loads(result.stdout)
+        return await run_in_thread(ANALYZER.analyze_parsed, url, text, lower, structured,
+                                   analysis_budget(limits.deadline), cut_at)
     except Exception as e:
         print(f"Error analyzing {url}: {e}", file=sys.stderr)
     
     return None
 
-def analyze_flipkart_product_page(url, tmp_dir):
+def analysis_budget(deadline):
+    """Per-stage CPU budgets capped by the time left, so a late page degrades instead of running past the deadline"""
+    left = deadline.remaining()
+    if left is None:
+        return None
+    budgets = ANALYZER.stage_budgets_ms or STAGE_BUDGETS_MS
+    return StageBudget({name: min(ms, left * 1000) for name, ms in budgets.items()})
+
+async def analyze_flipkart_product_page(url, limits):
     """Special handler for Flipkart product pages with enhanced stealth"""
+    if REPLAY:
+        return await run_in_thread(analyze_archived_page, url)
+    deadline = limits.deadline
+    timeout = FLIPKART_TIMEOUT
     try:
         # Call the specialized Flipkart analyzer
         analyzer_script = os.path.join(os.path.dirname(__file__), "analyze_flipkart.py")
-        result = subprocess.run(
-            ["python3", analyzer_script, "--url", url],
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
+        cmd = ["python3", analyzer_script, "--url", url]
+        if ANALYZER.cache is not None:
+            cmd += ["--analysis-cache", ANALYZER.cache.path]
+        if ARCHIVE is not None:
+            cmd += ["--archive", ARCHIVE.root]
+        await asyncio.sleep(deadline.cap(LIMITER.reserve(url)))
+        async with limits.browser:
+            timeout = deadline.cap(FLIPKART_TIMEOUT)
+            if timeout <= 0:
+                return None
+            if deadline.bounded:
+                cmd += ["--timeout", str(deadline.child_budget(FLIPKART_TIMEOUT))]
+            with stage("flipkart_analyzer_spawn"):
+                returncode, stdout, stderr = await run_subprocess(cmd, timeout=timeout)
         
-        if result.returncode == 0:
-            return json.loads(result.stdout)
+        if returncode == 0:
+            return json.loads(stdout)
         else:
-            print(f"Flipkart analyzer error: {result.stderr}", file=sys.stderr)
+            LIMITER.penalize(url)
+            print(f"Flipkart analyzer error: {stderr}", file=sys.stderr)
             return None
             
+    except asyncio.TimeoutError:
+        print(f"Error analyzing Flipkart product {url}: timed out after {timeout:.0f}s", file=sys.stderr)
+        return None
     except Exception as e:
         print(f"Error analyzing Flipkart product {url}: {e}", file=sys.stderr)
         return None
 
-def search_site(site, product_name, max_products, tmp_dir):
-    """Search a single site and return results - designed for parallel execution"""
-    query = quote_plus(product_name)
-    search_url = site["search_url"].format(query=query)
+def analyze_archived_page(url):
+    """Analyze a browser-rendered page recorded by analyze_flipkart.py --archive"""
+    hit = ARCHIVE.get(url)
+    if hit is None:
+        print(f"Error analyzing Flipkart product {url}: not in archive {ARCHIVE.root}", file=sys.stderr)
+        return None
+    try:
+        return ANALYZER.analyze(url, hit[0])
+    except Exception as e:
+        print(f"Error analyzing {url}: {e}", file=sys.stderr)
+        return None
+
+def site_result(site, url, analysis):
+    """Compact per-product record for the comparison output"""
+    return_policy = analysis.get("return_policy_analysis", {})
+    warranty = analysis.get("warranty_support_analysis", {})
+    hidden_costs = analysis.get("hidden_costs_analysis", {})
+    
+    return {
+        "site": site["name"],
+        "url": url,
+        "price": analysis.get("price_guess"),
+        "scores": analysis.get("scores", {}),
+        "title": analysis.get("title_guess", "")[:80],
+        "return_policy": {
+            "window_days": return_policy.get("return_window_days"),
+            "type": return_policy.get("type", []),
+            "method": return_policy.get("method", []),
+            "flexibility_score": return_policy.get("flexibility_score", 50),
+            "highlights": return_policy.get("highlights", [])[:2]
+        },
+        "warranty": {
+            "duration_months": warranty.get("warranty_duration"),
+            "type": warranty.get("warranty_type", []),
+            "service_centers": warranty.get("service_centers"),
+            "installation": warranty.get("installation", False),
+            "support_score": warranty.get("support_score", 50),
+            "highlights": warranty.get("highlights", [])[:2]
+        },
+        "hidden_costs": {
+            "delivery": hidden_costs.get("delivery_charge"),
+            "installation": hidden_costs.get("installation_fee"),
+            "total_extra": hidden_costs.get("total_hidden_cost", 0),
+            "transparency_score": hidden_costs.get("transparency_score", 100),
+            "warnings": hidden_costs.get("warnings", [])[:3]
+        }
+    }
+
+async def search_site(site, product_name, max_products, limits, on_event=None):
+    """Search a single site and return results - runs as one task per site"""
+    with stage("search_url_build"):
+        query = quote_plus(product_name)
+        search_url = site["search_url"].format(query=query)
     site_results = []
+    tasks = []
+    notify = on_event or (lambda event: None)
+    status = "ok"
+    site_start = time.time()
+    
+    async def analyze_one(idx, url):
+        try:
+            analysis = await analyze_product_page(url, limits)
+            return site_result(site, url, analysis) if analysis else None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️  {site['name']}: Error analyzing product {idx} - {e}", file=sys.stderr, flush=True)
+            return None
+    
+    def start(url):
+        # Product work starts as soon as its URL is known; limits.domain() caps it per site
+        tasks.append(asyncio.ensure_future(analyze_one(len(tasks) + 1, url)))
     
     print(f"⏳ Searching {site['name']}...", file=sys.stderr, flush=True)
+    notify({"event": "site_started", "site": site["name"]})
     
     try:
         # Fetch product URLs with timeout handling
         if site.get('method') == 'browser':
-            product_urls = fetch_with_browser(site["domain"], product_name, max_products)
+            for url in await fetch_with_browser(site["domain"], product_name, max_products, limits):
+                start(url)
         else:
-            html = fetch_url(search_url)
-            if not html:
+            # Links arrive from the streaming download thread; product work starts on each one
+            loop = asyncio.get_event_loop()
+            found = asyncio.Queue()
+            fetch = functools.partial(stream_product_urls, domain=site["domain"], pattern=site["pattern"],
+                                      max_results=max_products,
+                                      on_url=lambda url: loop.call_soon_threadsafe(found.put_nowait, url))
+            search = asyncio.ensure_future(fetch_page(search_url, limits, "search_fetch", fetch=fetch))
+            try:
+                while not search.done():
+                    getter = asyncio.ensure_future(found.get())
+                    await asyncio.wait({getter, search}, return_when=asyncio.FIRST_COMPLETED)
+                    if getter.done():
+                        start(getter.result())
+                    else:
+                        getter.cancel()
+                while not found.empty():
+                    start(found.get_nowait())
+            finally:
+                search.cancel()
+            if search.result() is None:
                 print(f"⚠️  {site['name']}: Failed to fetch", file=sys.stderr, flush=True)
+                status = "failed"
                 return site_results
-            product_urls = extract_product_urls(html, site["domain"], site["pattern"], max_products)
         
-        if not product_urls:
+        if not tasks:
             print(f"⚠️  {site['name']}: No products found", file=sys.stderr, flush=True)
+            status = "no_products"
             return site_results
             
-        print(f"✅ {site['name']}: Found {len(product_urls)} products", file=sys.stderr, flush=True)
+        print(f"✅ {site['name']}: Found {len(tasks)} products", file=sys.stderr, flush=True)
         
-        # Analyze each product
-        for idx, url in enumerate(product_urls, 1):
-            try:
-                analysis = analyze_product_page(url, tmp_dir)
-                if analysis:
-                    return_policy = analysis.get("return_policy_analysis", {})
-                    warranty = analysis.get("warranty_support_analysis", {})
-                    hidden_costs = analysis.get("hidden_costs_analysis", {})
-                    
-                    site_results.append({
-                        "site": site["name"],
-                        "url": url,
-                        "price": analysis.get("price_guess"),
-                        "scores": analysis.get("scores", {}),
-                        "title": analysis.get("title_guess", "")[:80],
-                        "return_policy": {
-                            "window_days": return_policy.get("return_window_days"),
-                            "type": return_policy.get("type", []),
-                            "method": return_policy.get("method", []),
-                            "flexibility_score": return_policy.get("flexibility_score", 50),
-                            "highlights": return_policy.get("highlights", [])[:2]
-                        },
-                        "warranty": {
-                            "duration_months": warranty.get("warranty_duration"),
-                            "type": warranty.get("warranty_type", []),
-                            "service_centers": warranty.get("service_centers"),
-                            "installation": warranty.get("installation", False),
-                            "support_score": warranty.get("support_score", 50),
-                            "highlights": warranty.get("highlights", [])[:2]
-                        },
-                        "hidden_costs": {
-                            "delivery": hidden_costs.get("delivery_charge"),
-                            "installation": hidden_costs.get("installation_fee"),
-                            "total_extra": hidden_costs.get("total_hidden_cost", 0),
-                            "transparency_score": hidden_costs.get("transparency_score", 100),
-                            "warnings": hidden_costs.get("warnings", [])[:3]
-                        }
-                    })
-            except Exception as e:
-                print(f"⚠️  {site['name']}: Error analyzing product {idx} - {e}", file=sys.stderr, flush=True)
-                continue
+        # Merge product results as they finish
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            if result:
+                site_results.append(result)
+                notify({"event": "product", "site": site["name"], "result": result})
                 
+    except asyncio.CancelledError:
+        status = "cut_off" if limits.deadline.expired else "cancelled"
+        cut_by_budget = limits.run_deadline.expired
+        raise
     except Exception as e:
         print(f"❌ {site['name']}: Site error - {e}", file=sys.stderr, flush=True)
+        status = "error"
+    finally:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        event = {"event": "site_finished", "site": site["name"], "status": status,
+                 "products": len(site_results), "elapsed_time": round(time.time() - site_start, 1)}
+        if status == "cut_off":
+            # The run's --budget ending says nothing about the site; its own timeout running out does
+            event["cut_by_budget"] = cut_by_budget
+        notify(event)
     
     return site_results
 
-def search_and_analyze(product_name, max_products=2):
-    """Search across all sites IN PARALLEL and analyze top results - OPTIMIZED FOR SPEED"""
+def select_sites(max_sites=DEFAULT_MAX_SITES, budget=None):
+    """
+    [(site, timeout or None, reason)] for the enabled sites to query: ranked
+    by SITE_STATS history when available, else PRIORITY_SITES in order
+    """
+    enabled = {s["name"]: s for s in SEARCH_SITES if s.get("enabled", True)}
+    if SITE_STATS is None:
+        plan = [(name, None, "default") for name in PRIORITY_SITES if name in enabled][:max_sites]
+    else:
+        plan = SITE_STATS.plan(list(enabled), max_sites, PRIORITY_SITES, budget)
+    return [(enabled[name], timeout, reason) for name, timeout, reason in plan]
+
+async def search_and_analyze_async(product_name, max_products=2, per_domain=MAX_PER_DOMAIN, on_event=None,
+                                   budget=None, sites=None, on_results=None):
+    """
+    Search all sites concurrently on one event loop and analyze top results.
+
+    sites is a select_sites() plan (chosen here when omitted); a site with a
+    timeout is cut off after it. on_event, if given, is called on the loop
+    with each progress event as it happens. With a budget (seconds), sites
+    still running when it is used up are cancelled and whatever they
+    finished is kept. Each site's outcome is recorded in SITE_STATS.
+    on_results, if given, gets (results, statuses) as soon as the sites are
+    done, before background search refreshes get their grace period. Returns
+    (results, {site name: status}).
+    """
     results = []
+    deadline = Deadline(budget)
     
-    # Prioritize fast, reliable sites
-    enabled_sites = [s for s in SEARCH_SITES if s.get("enabled", True)]
-    priority_sites = ["Amazon.in", "Flipkart", "Vijay Sales"]
-    fast_sites = [s for s in enabled_sites if s["name"] in priority_sites][:3]
+    # Fast, reliable sites first, as measured by past runs
+    if sites is None:
+        sites = select_sites(budget=budget)
     
-    total_sites = len(fast_sites)
+    total_sites = len(sites)
     
     print(f"🔍 Searching {total_sites} sites in parallel for '{product_name}'...", file=sys.stderr, flush=True)
     start_time = time.time()
+    limits = Limits(per_domain=per_domain, deadline=deadline)
+    # Blocking fetches run on executor threads; size the pool to the fetch limit, not the CPU count
+    asyncio.get_event_loop().set_default_executor(ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FETCHES))
+    statuses = {site["name"]: "pending" for site, _, _ in sites}
+    finished = []
     
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        # Search all sites in parallel with STAGGERED STARTS to avoid resource contention
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            # Submit all site searches with 4-second delays between starts
-            future_to_site = {}
-            for i, site in enumerate(fast_sites):
-                # Stagger: 0s, 4s, 8s delays
-                delay = i * 4
-                if delay > 0:
-                    print(f"⏱️  Staggering {site['name']} start by {delay}s to reduce load...", file=sys.stderr, flush=True)
-                    time.sleep(delay)
-                
-                future = executor.submit(search_site, site, product_name, max_products, tmp_dir)
-                future_to_site[future] = site
-            
-            # Collect results as they complete
-            for future in as_completed(future_to_site):
-                site = future_to_site[future]
-                try:
-                    site_results = future.result()
-                    results.extend(site_results)
-                except Exception as e:
-                    print(f"❌ {site['name']}: Error - {e}", file=sys.stderr, flush=True)
+    def collect(event):
+        # Products are kept as they finish, so a site cut off by the deadline still contributes
+        if event["event"] == "product":
+            results.append(event["result"])
+        elif event["event"] == "site_finished":
+            statuses[event["site"]] = event["status"]
+            finished.append(event)
+        if on_event is not None:
+            on_event(event)
+    
+    async def run_site(site, timeout):
+        # A site's own deadline (from its latency history) ends with the run's budget too
+        site_deadline = deadline.sub(timeout)
+        task = asyncio.ensure_future(search_site(site, product_name, max_products,
+                                                 limits.for_site(site_deadline), collect))
+        try:
+            done, _ = await asyncio.wait({task}, timeout=site_deadline.remaining())
+            if done:
+                task.result()
+            else:
+                print(f"⏱️  {site['name']}: cut off after {time.time() - start_time:.0f}s", file=sys.stderr, flush=True)
+                site_deadline.expire()
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        except asyncio.CancelledError:
+            # The whole run is being cancelled (Ctrl-C or the budget)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            raise
+        except Exception as e:
+            print(f"❌ {site['name']}: Error - {e}", file=sys.stderr, flush=True)
+            statuses[site["name"]] = "error"
+    
+    # All sites start at once; Limits keeps browsers and per-site load in check
+    tasks = [asyncio.ensure_future(run_site(site, timeout)) for site, timeout, _ in sites]
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=deadline.remaining())
+        if pending:
+            print(f"⏱️  Budget of {budget:g}s used up; returning what finished", file=sys.stderr, flush=True)
+            deadline.expire()
+    finally:
+        # On cancellation (Ctrl-C, deadline) stop every remaining site task
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    if SITE_STATS is not None:
+        # Interrupted runs (Ctrl-C) say nothing about the site, so they are not recorded
+        for event in finished:
+            if event["status"] != "cancelled":
+                status = "budget_cut" if event.get("cut_by_budget") else event["status"]
+                SITE_STATS.record(event["site"], status, event["elapsed_time"], event["products"])
     
     elapsed = time.time() - start_time
     print(f"✨ Analysis complete in {elapsed:.1f}s! Found {len(results)} products total.", file=sys.stderr, flush=True)
-    return results
+    if on_results is not None:
+        on_results(results, statuses)
+    # Stale search cache entries being refreshed in the background get a short grace period, not the whole run
+    await limits.finish_background()
+    return results, statuses
+
+def search_and_analyze(product_name, max_products=2, per_domain=MAX_PER_DOMAIN, on_event=None, budget=None,
+                       sites=None, on_results=None):
+    """Blocking entry point: run the asyncio comparison pipeline to completion (or to the budget)"""
+    return profiling.profiled(asyncio.run, search_and_analyze_async(product_name, max_products, per_domain,
+                                                                     on_event, budget, sites, on_results))
+
+def site_status_summary(statuses, budget):
+    """search_status fields describing how each site ended and which were cut off (budget or site timeout)"""
+    summary = {"sites": statuses}
+    if budget is not None:
+        summary["budget_seconds"] = budget
+    summary["cut_off_sites"] = [name for name, status in statuses.items() if status == "cut_off"]
+    summary["partial"] = bool(summary["cut_off_sites"])
+    return summary
+
+def print_event(event):
+    """Write one NDJSON event to stdout immediately (--stream)"""
+    print(json.dumps(event, ensure_ascii=False), flush=True)
+
 
 def extract_price_numeric(price_str):
     """Extract numeric value from price string"""
@@ -413,26 +891,43 @@ def pick_best_deal(results):
     scored.sort(key=lambda x: x["combined_score"], reverse=True)
     return scored[0] if scored else None
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--product", required=True, help="Product name to search")
-    parser.add_argument("--max-results", type=int, default=3, help="Max products per site")
-    args = parser.parse_args()
-    
-    start_time = time.time()
-    results = search_and_analyze(args.product, args.max_results)
-    elapsed_time = time.time() - start_time
-    
+def _dump_profile(path):
+    if path and profiling.dump(path):
+        print(f"cProfile stats written to {path} (python3 -m pstats {path})", file=sys.stderr)
+
+def site_selection_summary(sites):
+    """sites_checked, probed_sites and site_selection (plus site_stats when kept) for a select_sites() plan"""
+    summary = {
+        "sites_checked": len(sites),
+        "probed_sites": [site["name"] for site, _, reason in sites if reason == "probe"],
+        "site_selection": [{"site": site["name"], "reason": reason, "timeout_s": timeout}
+                           for site, timeout, reason in sites],
+    }
+    if SITE_STATS is not None:
+        summary["site_stats"] = {site["name"]: SITE_STATS.summary(site["name"]) for site, _, _ in sites}
+    return summary
+
+def print_report(args, sites, results, statuses, elapsed_time):
+    """Print the comparison's JSON output (or its --stream summary event)"""
     if not results:
-        print(json.dumps({
+        output = {
             "error": "No results found across any sites",
             "results": [],
             "product": args.product,
-            "elapsed_time": round(elapsed_time, 1)
-        }))
+            "elapsed_time": round(elapsed_time, 1),
+            "search_status": site_status_summary(statuses, args.budget),
+            **site_selection_summary(sites)
+        }
+        if profiling.enabled():
+            output["timings"] = profiling.timings()
+        if args.stream:
+            print_event({"event": "summary", **output})
+        else:
+            print(json.dumps(output), flush=True)
         return
     
-    best = pick_best_deal(results)
+    with stage("pick_best_deal"):
+        best = pick_best_deal(results)
     
     # Sort results by price
     sorted_results = sorted(
@@ -444,19 +939,107 @@ def main():
         "product": args.product,
         "results": sorted_results,
         "best_deal": best,
-        "sites_checked": len([s for s in SEARCH_SITES if s.get("enabled", True)]),
+        "sites_checked": len(sites),
         "sites_found": len(set(r["site"] for r in results)),
         "total_products": len(results),
         "elapsed_time": round(elapsed_time, 1),
         "search_status": {
-            "total_sites": 3,
+            "total_sites": len(statuses),
             "successful_sites": len(set(r["site"] for r in results)),
             "products_found": len(results),
-            "duration_seconds": round(elapsed_time, 1)
+            "duration_seconds": round(elapsed_time, 1),
+            **site_status_summary(statuses, args.budget)
         }
     }
+    if ANALYZER.cache is not None:
+        output["analysis_cache"] = ANALYZER.cache.stats()
+    output["http_client"] = HTTP.stats()
+    if HTTP.cache is not None:
+        output["http_cache"] = HTTP.cache.stats()
+    if SEARCH_CACHE is not None:
+        output["search_cache"] = SEARCH_CACHE.stats()
+    output.update(site_selection_summary(sites))
+    if ARCHIVE is not None:
+        output["archive"] = ARCHIVE.stats()
+    output["rate_limiter"] = LIMITER.stats()
+    if profiling.enabled():
+        output["timings"] = profiling.timings()
+    
+    if args.stream:
+        # Products were already streamed; the summary carries the verdict and run stats
+        print_event({"event": "summary", **{k: v for k, v in output.items() if k != "results"}})
+    else:
+        print(json.dumps(output, ensure_ascii=False, indent=2), flush=True)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--product", required=True, help="Product name to search")
+    parser.add_argument("--max-results", type=int, default=3, help="Max products per site")
+    parser.add_argument("--max-per-domain", type=int, default=MAX_PER_DOMAIN,
+                        help="Product pages fetched concurrently from one site")
+    parser.add_argument("--rate", type=parse_rate, default=DEFAULT_RATE,
+                        help="Requests per second per site (sites with stricter limits keep theirs)")
+    parser.add_argument("--burst", type=int, default=DEFAULT_BURST, help="Requests a site may receive back-to-back")
+    parser.add_argument("--analysis-cache", metavar="PATH", help="Reuse analyzer results from this cache (SQLite file)")
+    parser.add_argument("--http-cache", metavar="PATH",
+                        help="Reuse downloaded pages from this HTTP cache (SQLite file; honours Cache-Control/ETag)")
+    parser.add_argument("--search-cache", metavar="PATH",
+                        help="Reuse browser search results from this cache (SQLite file; 1 h fresh, then refreshed in the background)")
+    parser.add_argument("--http2", action="store_true", help="Fetch pages over HTTP/2 (needs httpx[http2])")
+    parser.add_argument("--archive", metavar="DIR",
+                        help="Record every fetched search and product page into this compressed page archive")
+    parser.add_argument("--replay", metavar="DIR",
+                        help="Serve every page from this page archive instead of the network (no browsers, no caches)")
+    parser.add_argument("--max-sites", type=int, default=DEFAULT_MAX_SITES,
+                        help="Sites to query (best by past latency/success first, plus an occasional probe)")
+    parser.add_argument("--site-stats", metavar="PATH", default=DEFAULT_STATS_PATH,
+                        help="Per-site latency/success history used to pick sites and timeouts (SQLite file)")
+    parser.add_argument("--no-site-stats", action="store_true",
+                        help="Query the default sites in the default order and record nothing")
+    parser.add_argument("--budget", type=parse_budget, metavar="DURATION",
+                        help="Total time for the comparison, e.g. 20s; sites still running then are cut off")
+    parser.add_argument("--stream", action="store_true",
+                        help="Print NDJSON events (site_started, product, site_finished, then summary) as they happen")
+    parser.add_argument("--profile", action="store_true", help="Record per-stage wall/CPU time under a `timings` key")
+    parser.add_argument("--profile-dump", metavar="PATH", help="Also write merged cProfile stats (pstats format) to PATH")
+    args = parser.parse_args()
+    
+    if args.profile or args.profile_dump:
+        profiling.enable(cprofile=bool(args.profile_dump))
+    
+    if args.analysis_cache:
+        ANALYZER.cache = AnalysisCache(args.analysis_cache)
+    
+    global HTTP, SEARCH_CACHE, ARCHIVE, REPLAY, SITE_STATS
+    LIMITER.rate, LIMITER.burst = args.rate, args.burst
+    if args.replay:
+        # Replays must not depend on (or refresh) anything outside the archive
+        ARCHIVE, REPLAY = PageArchive(args.replay), True
+        HTTP = ReplayClient(ARCHIVE)
+    else:
+        if args.search_cache:
+            SEARCH_CACHE = SearchCache(args.search_cache)
+        if args.http2 or args.max_per_domain != MAX_PER_DOMAIN:
+            HTTP = make_client(http2=args.http2, max_per_host=max(args.max_per_domain, MAX_PER_DOMAIN), limiter=LIMITER)
+        if args.http_cache:
+            HTTP.cache = HttpCache(args.http_cache)
+        if args.archive:
+            ARCHIVE = HTTP.archive = PageArchive(args.archive)
+        if not args.no_site_stats:
+            SITE_STATS = SiteStats(args.site_stats)
+    sites = select_sites(args.max_sites, args.budget)
+    
+    start_time = time.time()
+    
+    def report(results, statuses):
+        # Printed before background search refreshes are wound down, so they never delay the answer
+        print_report(args, sites, results, statuses, time.time() - start_time)
     
-    print(json.dumps(output, ensure_ascii=False, indent=2))
+    search_and_analyze(args.product, args.max_results, args.max_per_domain,
+                       on_event=print_event if args.stream else None, budget=args.budget, sites=sites,
+                       on_results=report)
+    # The cProfile data is complete only once the event loop has stopped
+    _dump_profile(args.profile_dump)
 
 if __name__ == "__main__":
     main()
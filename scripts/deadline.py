@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Request deadline for Trusted Shopper
+One wall-clock budget per comparison; every fetch, browser and analysis timeout is capped by what is left
+"""
+
+import re
+import sys
+import time
+
+# Seconds kept back when handing a budget to a child process (interpreter start-up, JSON on stdout)
+CHILD_MARGIN = 2.0
+
+def parse_budget(value):
+    """Seconds from "20", "20s", "1.5m" or "250ms"; raises ValueError otherwise."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*(ms|s|m)?\s*", str(value))
+    if not match:
+        raise ValueError(f"not a duration: {value!r}")
+    seconds = float(match.group(1)) * {"ms": 0.001, "s": 1, "m": 60, None: 1}[match.group(2)]
+    if seconds <= 0:
+        raise ValueError(f"budget must be positive: {value!r}")
+    return seconds
+
+class Deadline:
+    """
+    A point in time shared by every stage of one request.
+
+    With no budget it never expires and cap() leaves timeouts unchanged, so
+    callers thread it through unconditionally. sub() makes a shorter deadline
+    inside this one (a per-site timeout within the request budget); it
+    expires with its parent.
+    """
+
+    def __init__(self, budget=None, clock=time.monotonic, parent=None):
+        self.budget = budget
+        self._clock = clock
+        self.parent = parent
+        self.expires = clock() + budget if budget is not None else None
+
+    @property
+    def bounded(self):
+        return self.expires is not None or (self.parent is not None and self.parent.bounded)
+
+    def remaining(self):
+        """Seconds left (never negative), or None when unbounded."""
+        left = self.parent.remaining() if self.parent is not None else None
+        if self.expires is not None:
+            own = max(0.0, self.expires - self._clock())
+            left = own if left is None else min(left, own)
+        return left
+
+    @property
+    def expired(self):
+        return self.remaining() == 0
+
+    def expire(self):
+        """End the deadline now (the caller is about to cancel the work it covers)."""
+        self.expires = self._clock()
+
+    def sub(self, timeout):
+        """A deadline timeout seconds from now (None: no extra limit) that also ends with this one."""
+        return Deadline(timeout, self._clock, parent=self)
+
+    def cap(self, timeout):
+        """timeout, shortened to the time left."""
+        left = self.remaining()
+        return timeout if left is None else min(timeout, left)
+
+    def cap_ms(self, timeout_ms):
+        """A Playwright timeout (ms) shortened to the time left; never 0, which Playwright reads as "no timeout"."""
+        return max(1, int(self.cap(timeout_ms / 1000) * 1000))
+
+    def child_budget(self, timeout):
+        """--timeout for a child process run with `timeout`: what is left, less CHILD_MARGIN."""
+        return max(1.0, round(self.cap(timeout) - CHILD_MARGIN, 1))
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show how a budget caps a set of stage timeouts")
+    parser.add_argument("budget", type=parse_budget, help="Request budget, e.g. 20s")
+    parser.add_argument("timeouts", nargs="*", type=float, default=[10, 60, 90], help="Stage timeouts in seconds")
+    args = parser.parse_args()
+
+    deadline = Deadline(args.budget)
+    for timeout in args.timeouts:
+        print(f"{timeout:g}s -> {deadline.cap(timeout):.1f}s (child --timeout {deadline.child_budget(timeout):g})",
+              file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
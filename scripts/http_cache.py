@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Disk-backed HTTP response cache for Trusted Shopper
+Stores compressed page bodies with Cache-Control/ETag/Last-Modified freshness so repeat searches skip re-downloads
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from email.utils import parsedate_to_datetime
+
+from rate_limiter import domain_of
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "trusted-shopper", "http.sqlite")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # compressed bodies
+DEFAULT_TTL = 3600                      # used when the response sets no max-age/Expires
+PRICE_TTL = 600                         # product pages carry live prices, so they go stale sooner
+CACHEABLE_STATUSES = (200, 203)
+COMPRESS_LEVEL = 6
+
+# Per-site default TTL in seconds (search and listing pages); product pages are capped at PRICE_TTL
+SITE_TTLS = {
+    "amazon.in": 1800,
+    "flipkart.com": 1800,
+}
+PRODUCT_URL_MARKERS = ("/dp/", "/p/", "/product", "/products/")
+
+# Headers worth keeping with a cached body (encoding/length no longer apply once decoded)
+KEPT_HEADERS = ("content-type", "cache-control", "etag", "last-modified", "expires", "date")
+# Stored with a body that is only the first part of the page (a stream() consumer stopped early)
+PARTIAL_HEADER = "x-cache-partial"
+
+def default_ttl(url):
+    """Fallback freshness lifetime for url: its site's TTL, capped at PRICE_TTL for product pages."""
+    ttl = SITE_TTLS.get(domain_of(url), DEFAULT_TTL)
+    if any(marker in url for marker in PRODUCT_URL_MARKERS):
+        ttl = min(ttl, PRICE_TTL)
+    return ttl
+
+def parse_cache_control(value):
+    """Cache-Control directives as a dict (valueless directives map to True)."""
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else True
+    return directives
+
+def freshness_lifetime(url, headers, now=None):
+    """
+    Seconds this response may be served without revalidation, or None when
+    it must not be stored (no-store). no-cache and must-revalidate with no
+    max-age give 0: store it, but always revalidate.
+    """
+    cc = parse_cache_control(headers.get("cache-control"))
+    if "no-store" in cc:
+        return None
+    for name in ("s-maxage", "max-age"):
+        if name in cc:
+            try:
+                return max(0, int(cc[name]))
+            except (TypeError, ValueError):
+                pass
+    if "no-cache" in cc:
+        return 0
+    if headers.get("expires"):
+        try:
+            expires = parsedate_to_datetime(headers["expires"]).timestamp()
+            return max(0, int(expires - (now or time.time())))
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return 0  # an invalid Expires means "already expired"
+    return default_ttl(url)
+
+class CachedResponse:
+    """A stored response: body (decoded), headers, validators and freshness."""
+
+    __slots__ = ("url", "status", "headers", "body", "wire_size", "expires")
+
+    def __init__(self, url, status, headers, body, wire_size, expires):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.wire_size = wire_size
+        self.expires = expires
+
+    @property
+    def fresh(self):
+        return time.time() < self.expires
+
+    @property
+    def partial(self):
+        """True when body is only a prefix of the page (see HttpCache.store)."""
+        return PARTIAL_HEADER in self.headers
+
+    def validators(self):
+        """Conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.headers.get("etag"):
+            headers["If-None-Match"] = self.headers["etag"]
+        if self.headers.get("last-modified"):
+            headers["If-Modified-Since"] = self.headers["last-modified"]
+        return headers
+
+class HttpCache:
+    """
+    SQLite-backed response cache with size-bounded LRU eviction.
+
+    Bodies are zlib-compressed. Safe to share between threads, and between
+    processes that open the same file (WAL mode, busy timeout). Counters for
+    hits, revalidations and bytes saved are kept per session and per file.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.counters = {"hits": 0, "revalidated": 0, "misses": 0, "stores": 0, "bytes_saved": 0}
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY, final_url TEXT, status INTEGER, headers TEXT, body BLOB,"
+            " size INTEGER, wire_size INTEGER, expires REAL, last_access REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_access)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+
+    def lookup(self, url):
+        """The stored response for url (fresh or stale), or None."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT final_url, status, headers, body, wire_size, expires FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+        final_url, status, headers, body, wire_size, expires = row
+        try:
+            body = zlib.decompress(body)
+        except zlib.error:
+            return None
+        return CachedResponse(final_url, status, json.loads(headers), body, wire_size, expires)
+
+    def store(self, url, response, wire_size=None, partial=False):
+        """
+        Store a response (anything with url/status/headers/body) if its status
+        and headers allow. partial marks a body that is only the start of the
+        page; such entries serve stream() consumers, never a full get().
+        """
+        if response.status not in CACHEABLE_STATUSES:
+            return False
+        lifetime = freshness_lifetime(url, response.headers)
+        if lifetime is None:
+            return False
+        headers = {k: v for k, v in response.headers.items() if k in KEPT_HEADERS}
+        if partial:
+            headers[PARTIAL_HEADER] = "1"
+        body = zlib.compress(response.body, COMPRESS_LEVEL)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (url, final_url, status, headers, body, size, wire_size, expires, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, response.url, response.status, json.dumps(headers), body, len(body),
+                 wire_size if wire_size is not None else len(response.body), now + lifetime, now),
+            )
+            self._count("stores")
+            self._evict()
+        return True
+
+    def refresh(self, url, entry, headers):
+        """Extend a stale entry after a 304 Not Modified, taking updated headers from it."""
+        merged = dict(entry.headers)
+        merged.update({k: v for k, v in headers.items() if k in KEPT_HEADERS})
+        lifetime = freshness_lifetime(url, merged)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE responses SET headers = ?, expires = ?, last_access = ? WHERE url = ?",
+                (json.dumps(merged), now + (lifetime or 0), now, url),
+            )
+        entry.headers = merged
+
+    def record(self, outcome, bytes_saved=0):
+        """Count a lookup outcome: hits, revalidated or misses."""
+        with self._lock, self._conn:
+            self._count(outcome)
+            if bytes_saved:
+                self._count("bytes_saved", bytes_saved)
+
+    def _count(self, name, value=1):
+        self.counters[name] += value
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, value),
+        )
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        while total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT url, size FROM responses ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for url, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def stats(self):
+        """Hit rate and bytes saved for this session, plus lifetime counters for the file."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            lifetime = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            c = dict(self.counters)
+        lookups = c["hits"] + c["revalidated"] + c["misses"]
+        return {
+            **c,
+            "hit_rate": round((c["hits"] + c["revalidated"]) / lookups, 3) if lookups else None,
+            "lifetime_hits": lifetime.get("hits", 0) + lifetime.get("revalidated", 0),
+            "lifetime_misses": lifetime.get("misses", 0),
+            "lifetime_bytes_saved": lifetime.get("bytes_saved", 0),
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the HTTP response cache")
+    parser.add_argument("--path", default=DEFAULT_CACHE_PATH, help="Cache file")
+    parser.add_argument("--clear", action="store_true", help="Delete all cached responses")
+    args = parser.parse_args()
+
+    cache = HttpCache(args.path)
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {args.path}", file=sys.stderr)
+    print(json.dumps({"path": args.path, **cache.stats()}, indent=2))
+    cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,668 @@
+#!/usr/bin/env python3
+"""
+Pooled keep-alive HTTP client for Trusted Shopper
+Reuses connections per host, decodes gzip/deflate (and br when available) and counts bytes and latency
+"""
+
+import ssl
+import sys
+import json
+import time
+import zlib
+import codecs
+import threading
+import http.client
+from collections import deque
+from urllib.parse import urlsplit, urljoin
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+DEFAULT_TIMEOUT = 10
+DEFAULT_MAX_PER_HOST = 4
+MAX_REDIRECTS = 5
+STREAM_CHUNK = 64 * 1024
+DEFAULT_STREAM_MAX_BYTES = 8 * 1024 * 1024  # decoded bytes; stream() stops reading beyond this
+BROTLI_SLICE = 1024  # wire bytes handed to the brotli decoder at a time, so a capped read stops near the cap
+MAX_THROTTLE_RETRIES = 2  # re-send after a 429/503 once the rate limiter's backoff has passed
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+# Errors meaning a kept-alive connection was closed by the server while idle
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                           ConnectionResetError, BrokenPipeError)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli else "gzip, deflate"
+# stream() caps what each chunk decodes to, which zlib supports directly and brotli does not
+STREAM_ACCEPT_ENCODING = "gzip, deflate"
+
+def content_charset(headers):
+    """Charset named in a Content-Type header, defaulting to utf-8."""
+    content_type = headers.get("content-type", "")
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "charset" and value:
+            return value.strip("\"'")
+    return "utf-8"
+
+def read_body(resp, give_up):
+    """
+    The whole body of an http.client response, read in chunks so a server
+    that trickles data cannot outlast give_up (a time.monotonic() value):
+    the socket timeout alone only bounds each read.
+    """
+    parts = []
+    while True:
+        chunk = resp.read1(STREAM_CHUNK)
+        if not chunk:
+            resp.read()  # marks the response finished so the connection can be reused
+            return b"".join(parts)
+        parts.append(chunk)
+        if time.monotonic() >= give_up:
+            raise TimeoutError("response body still arriving at the deadline")
+
+class Response:
+    """
+    A fully read HTTP response. For stream() the body was handed to the
+    consumer instead (body is empty) and complete is False if the download
+    was cut short.
+    """
+
+    __slots__ = ("url", "status", "headers", "body", "elapsed", "received", "from_cache", "complete")
+
+    def __init__(self, url, status, headers, body, elapsed, received=None, from_cache=False, complete=True):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.elapsed = elapsed
+        self.received = len(body) if received is None else received  # bytes on the wire, all hops
+        self.from_cache = from_cache
+        self.complete = complete
+
+    @property
+    def charset(self):
+        return content_charset(self.headers)
+
+    def text(self):
+        try:
+            return self.body.decode(self.charset, errors="replace")
+        except LookupError:
+            return self.body.decode("utf-8", errors="replace")
+
+def decode_body(body, encoding):
+    """Undo Content-Encoding (gzip, deflate, br); unknown encodings pass through."""
+    encoding = (encoding or "").strip().lower()
+    if not body or encoding in ("", "identity"):
+        return body
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)  # raw deflate, as some servers send
+    if encoding == "br" and brotli is not None:
+        return brotli.decompress(body)
+    return body
+
+class StreamDecoder:
+    """
+    Incremental Content-Encoding + charset decoder: wire bytes in, text out.
+    text_decoder continues the charset state of an earlier decoder (a body
+    picked up where a cached prefix ended).
+    """
+
+    def __init__(self, encoding, charset, text_decoder=None):
+        encoding = (encoding or "").strip().lower()
+        self._deflate = encoding == "deflate"
+        self._zlib = self._brotli = None
+        if encoding in ("gzip", "x-gzip"):
+            self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "br" and brotli is not None:
+            self._brotli = brotli.Decompressor()
+        # otherwise identity, deflate (chosen on the first chunk) or unknown
+        if text_decoder is not None:
+            self._text = text_decoder
+            return
+        try:
+            self._text = codecs.getincrementaldecoder(charset)(errors="replace")
+        except LookupError:
+            self._text = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def decompress(self, chunk, limit=None):
+        """
+        Decoded bytes of one wire chunk, at most limit of them. Input past the
+        limit is dropped undecoded, so the caller must stop reading there.
+        """
+        if self._deflate:
+            # zlib-wrapped deflate starts with a valid zlib header; some servers send raw deflate
+            wbits = zlib.MAX_WBITS if len(chunk) >= 2 and (chunk[0] * 256 + chunk[1]) % 31 == 0 else -zlib.MAX_WBITS
+            self._zlib = zlib.decompressobj(wbits)
+            self._deflate = False
+        if self._zlib is not None:
+            return self._zlib.decompress(chunk, 0 if limit is None else max(1, limit))
+        if self._brotli is not None:
+            out, size = [], 0
+            for i in range(0, len(chunk), BROTLI_SLICE):
+                out.append(self._brotli.process(chunk[i:i + BROTLI_SLICE]))
+                size += len(out[-1])
+                if limit is not None and size >= limit:
+                    break
+            return b"".join(out)[:limit]
+        return chunk[:limit]
+
+    def text(self, data, final=False):
+        return self._text.decode(data, final)
+
+def latency_summary(latencies):
+    """p50/p95/max in ms of a sorted, non-empty list of seconds."""
+    return {
+        "p50": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+        "max": round(latencies[-1] * 1000, 1),
+    }
+
+def cached_get(client, url, headers=None, timeout=None):
+    """
+    GET through client.cache (an http_cache.HttpCache): fresh entries are
+    served from disk, stale ones with validators are revalidated with a
+    conditional GET (a 304 reuses the stored body), everything else is
+    fetched with client._fetch and stored when cacheable.
+    """
+    cache = client.cache
+    entry = cache.lookup(url)
+    if entry is not None and entry.partial:
+        entry = None  # only the start of the page was stored; a full body has to be fetched
+    if entry is not None and entry.fresh:
+        cache.record("hits", entry.wire_size)
+        return Response(entry.url, entry.status, entry.headers, entry.body, 0.0, 0, from_cache=True)
+    conditional = entry.validators() if entry is not None else {}
+    if conditional:
+        conditional.update(headers or {})
+    resp = client._fetch(url, conditional or headers, timeout=timeout)
+    if resp.status == 304 and entry is not None:
+        cache.refresh(url, entry, resp.headers)
+        cache.record("revalidated", max(0, entry.wire_size - resp.received))
+        return Response(entry.url, entry.status, entry.headers, entry.body, resp.elapsed, resp.received,
+                        from_cache=True)
+    cache.record("misses")
+    cache.store(url, resp, resp.received)
+    return resp
+
+def _archive(archive, url, resp, body):
+    if 200 <= resp.status < 300 and body:
+        try:
+            archive.put(url, body, "page", resp.status, resp.headers.get("content-type", "text/html"))
+        except Exception as e:
+            print(f"⚠️ Could not archive {url}: {e}", file=sys.stderr)
+
+class _HostPool:
+    """Idle connections to one (scheme, host, port) plus its concurrency limit."""
+
+    def __init__(self, limit):
+        self.idle = []
+        self.slots = threading.BoundedSemaphore(limit)
+        self.lock = threading.Lock()
+
+class HttpClient:
+    """
+    Thread-safe HTTP/1.1 client with per-host keep-alive pools.
+
+    At most max_per_host requests (overridable per host via host_limits) are
+    in flight to one host; idle connections are reused by later requests.
+    Redirects are followed, and bodies are decoded from gzip/deflate/br.
+    With a limiter (rate_limiter.RateLimiter), every request waits for its
+    domain's token and 429/503 responses are retried after the backoff.
+    A request, redirects and retries included, gets at most `timeout`
+    seconds in total (the client's timeout unless the caller passes one),
+    like curl --max-time. With a cache (http_cache.HttpCache), see cached_get(). With an archive
+    (page_archive.PageArchive), every successful body is also recorded.
+    Counters for requests, bytes and latency are available from stats().
+    """
+
+    def __init__(self, max_per_host=DEFAULT_MAX_PER_HOST, host_limits=None, timeout=DEFAULT_TIMEOUT,
+                 user_agent=DEFAULT_USER_AGENT, ssl_context=None, limiter=None, cache=None, archive=None):
+        self.max_per_host = max_per_host
+        self.host_limits = host_limits or {}
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.limiter = limiter
+        self.cache = cache
+        self.archive = archive
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "errors": 0, "connections_opened": 0, "connections_reused": 0,
+                          "bytes_received": 0, "bytes_decoded": 0, "throttled": 0}
+        self._per_host = {}
+        self._latencies = deque(maxlen=2048)
+
+    def _pool(self, key):
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = _HostPool(self.host_limits.get(key[1], self.max_per_host))
+            return pool
+
+    def _connect(self, scheme, host, port, timeout):
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self.ssl_context)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _count(self, host, **deltas):
+        with self._lock:
+            for name, value in deltas.items():
+                self._counters[name] += value
+            h = self._per_host.setdefault(host, {"requests": 0, "bytes_received": 0})
+            h["requests"] += deltas.get("requests", 0)
+            h["bytes_received"] += deltas.get("bytes_received", 0)
+
+    def _request_once(self, url, headers, sink=None, timeout=None):
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise ValueError(f"unsupported URL scheme: {url}")
+        host = parts.hostname
+        port = parts.port or (443 if scheme == "https" else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        request_headers = {
+            "User-Agent": self.user_agent,
+            "Accept": "text/html,application/xhtml+xml,*/*;q=0.8",
+            "Accept-Encoding": ACCEPT_ENCODING,
+            "Connection": "keep-alive",
+        }
+        request_headers.update(headers or {})
+
+        timeout = self.timeout if timeout is None else timeout
+        give_up = time.monotonic() + timeout
+        pool = self._pool((scheme, host, port))
+        if not pool.slots.acquire(timeout=min(self.timeout * 3, timeout)):
+            raise TimeoutError(f"no free connection slot for {host}")
+        try:
+            for attempt in range(2):
+                with pool.lock:
+                    conn = pool.idle.pop() if pool.idle else None
+                reused = conn is not None
+                if conn is None:
+                    conn = self._connect(scheme, host, port, timeout)
+                    self._count(host, connections_opened=1)
+                else:
+                    conn.timeout = timeout
+                    if conn.sock is not None:
+                        conn.sock.settimeout(timeout)  # a pooled socket keeps the last caller's timeout
+                    self._count(host, connections_reused=1)
+                streamed = False
+                try:
+                    conn.request("GET", path, headers=request_headers)
+                    resp = conn.getresponse()
+                    resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+                    if sink is not None and 200 <= resp.status < 300:
+                        streamed = True
+                        raw, (received, finished) = b"", sink(resp, resp_headers)
+                    else:
+                        raw = read_body(resp, give_up)
+                        received, finished = len(raw), True
+                except STALE_CONNECTION_ERRORS:
+                    conn.close()
+                    if reused and attempt == 0 and not streamed:
+                        continue  # the server dropped an idle connection; retry on a fresh one
+                    raise
+                except Exception:
+                    conn.close()
+                    raise
+                if resp.will_close or not finished:
+                    conn.close()  # an abandoned body leaves the connection unusable
+                else:
+                    with pool.lock:
+                        pool.idle.append(conn)
+                return resp.status, resp_headers, raw, received
+        finally:
+            pool.slots.release()
+
+    def get(self, url, headers=None, timeout=None):
+        """
+        GET url (through the cache if set), following redirects. Returns a
+        Response; raises on network errors. timeout caps the whole call
+        (rate-limit waits, retries, redirects); each socket operation gets
+        what is left of it.
+        """
+        if self.cache is not None:
+            resp = cached_get(self, url, headers, timeout)
+        else:
+            resp = self._fetch(url, headers, timeout=timeout)
+        if self.archive is not None:
+            _archive(self.archive, url, resp, resp.body)
+        return resp
+
+    def _fetch(self, url, headers=None, sink=None, timeout=None):
+        start = time.perf_counter()
+        give_up = time.monotonic() + (self.timeout if timeout is None else timeout)
+        host = urlsplit(url).hostname or ""
+        redirects = retries = received = 0
+        try:
+            while redirects <= MAX_REDIRECTS:
+                if self.limiter is not None:
+                    delay = self.limiter.reserve(url)
+                    if time.monotonic() + delay >= give_up:
+                        raise TimeoutError(f"rate limit wait for {host} would pass the deadline")
+                    if delay > 0:
+                        time.sleep(delay)
+                left = give_up - time.monotonic()
+                if left <= 0:
+                    raise TimeoutError(f"deadline passed fetching {url}")
+                status, resp_headers, raw, wire = self._request_once(url, headers, sink, left)
+                received += wire
+                self._count(urlsplit(url).hostname or "", requests=1, bytes_received=wire)
+                if self.limiter is not None:
+                    throttled = self.limiter.feedback(url, status, resp_headers.get("retry-after"))
+                    if throttled is not None and retries < MAX_THROTTLE_RETRIES:
+                        retries += 1
+                        self._count(host, throttled=1)
+                        continue
+                if status in REDIRECT_CODES and resp_headers.get("location"):
+                    redirects += 1
+                    url = urljoin(url, resp_headers["location"])
+                    continue
+                body = decode_body(raw, resp_headers.get("content-encoding"))
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self._counters["bytes_decoded"] += len(body)
+                    self._latencies.append(elapsed)
+                return Response(url, status, resp_headers, body, elapsed, received)
+            raise http.client.HTTPException(f"too many redirects for {url}")
+        except Exception:
+            self._count(host, errors=1)
+            raise
+
+    def stream(self, url, on_text, max_bytes=DEFAULT_STREAM_MAX_BYTES, headers=None, timeout=None):
+        """
+        GET url and feed the decoded body to on_text(str) as it arrives.
+
+        on_text returns True to stop early; the download is also cut off after
+        max_bytes of decoded body (however small the compressed chunks) or
+        once timeout seconds (default: the client's) have passed. Either way
+        the rest of the body is never read (the connection is closed instead
+        of pooled) and the returned Response has complete=False. Only 2xx
+        bodies are streamed; for other statuses nothing is fed.
+
+        With a cache, a fresh entry is fed in one piece and a stale one is
+        revalidated first (a 304 reuses it). Whatever was read is stored,
+        marked partial if the download stopped early; when a partial entry
+        runs out before on_text is satisfied, the page is downloaded again
+        and fed on from where the entry ended.
+        """
+        cache = self.cache
+        kept = [] if cache is not None or self.archive is not None else None
+        state = {"complete": True, "skip": 0, "text_decoder": None}
+        give_up = time.monotonic() + (self.timeout if timeout is None else timeout)
+        headers = {"Accept-Encoding": STREAM_ACCEPT_ENCODING, **(headers or {})}
+
+        def sink(resp, resp_headers):
+            decoder = StreamDecoder(resp_headers.get("content-encoding"), content_charset(resp_headers),
+                                    state["text_decoder"])
+            skip, received, decoded = state["skip"], 0, 0
+            while True:
+                chunk = resp.read1(STREAM_CHUNK)
+                if not chunk:
+                    resp.read()  # marks the response finished so the connection can be reused
+                    tail = decoder.text(b"", final=True)
+                    if tail:
+                        on_text(tail)
+                    return received, True
+                received += len(chunk)
+                data = decoder.decompress(chunk, max_bytes - decoded)
+                decoded += len(data)
+                if skip:
+                    # Already fed from the cached prefix
+                    cut = min(skip, len(data))
+                    data, skip = data[cut:], skip - cut
+                if kept is not None:
+                    kept.append(data)
+                if on_text(decoder.text(data)) or decoded >= max_bytes or time.monotonic() >= give_up:
+                    state["complete"] = False
+                    return received, False
+
+        entry = cache.lookup(url) if cache is not None else None
+        resp, outcome, saved = None, "hits", entry.wire_size if entry is not None else 0
+        if entry is not None and not entry.fresh:
+            conditional = entry.validators()
+            if conditional:
+                resp = self._fetch(url, {**headers, **conditional}, sink, timeout)
+                outcome, saved = "revalidated", max(0, entry.wire_size - resp.received)
+            if resp is None or resp.status != 304:
+                entry = None
+            else:
+                cache.refresh(url, entry, resp.headers)
+
+        if entry is not None:
+            prefix = entry.body[:max_bytes]
+            decoder = StreamDecoder(None, content_charset(entry.headers))
+            if kept is not None:
+                kept.append(prefix)
+            stopped = on_text(decoder.text(prefix)) or len(prefix) >= max_bytes
+            left = give_up - time.monotonic()
+            if stopped or not entry.partial or left <= 0:
+                if not stopped and not entry.partial:
+                    tail = decoder.text(b"", final=True)
+                    if tail:
+                        on_text(tail)
+                cache.record(outcome, saved)
+                elapsed, received = (resp.elapsed, resp.received) if resp is not None else (0.0, 0)
+                served = Response(entry.url, entry.status, entry.headers, b"", elapsed, received, from_cache=True,
+                                  complete=not stopped and not entry.partial)
+                if self.archive is not None:
+                    _archive(self.archive, url, served, b"".join(kept))
+                return served
+            # The stored prefix ran out before on_text was satisfied: read on past it
+            state["skip"], state["text_decoder"] = len(prefix), decoder._text
+            resp = self._fetch(url, headers, sink, left)
+        elif resp is None:
+            resp = self._fetch(url, headers, sink, timeout)
+
+        resp.complete = state["complete"]
+        body = b"".join(kept) if kept else b""
+        if cache is not None:
+            cache.record("misses")
+            if 200 <= resp.status < 300 and body:
+                cache.store(url, Response(resp.url, resp.status, resp.headers, body, 0.0), resp.received,
+                            partial=not resp.complete)
+        if self.archive is not None:
+            # What the consumer saw, even if it stopped early, so a replay stops in the same place
+            _archive(self.archive, url, resp, body)
+        return resp
+
+    def get_ok(self, url, headers=None, timeout=None):
+        """A successful (status < 400) Response, or None (the error goes to stderr)."""
+        try:
+            resp = self.get(url, headers, timeout)
+        except Exception as e:
+            print(f"Error fetching {url}: {e}", file=sys.stderr)
+            return None
+        if resp.status >= 400:
+            print(f"Error fetching {url}: HTTP {resp.status}", file=sys.stderr)
+            return None
+        return resp
+
+    def get_text(self, url, headers=None, timeout=None):
+        """Body of a successful (status < 400) GET as text, or None."""
+        resp = self.get_ok(url, headers, timeout)
+        return resp.text() if resp is not None else None
+
+    def stats(self):
+        """Request, connection, byte and latency counters (latency over the last 2048 requests)."""
+        with self._lock:
+            stats = dict(self._counters)
+            latencies = sorted(self._latencies)
+            stats["per_host"] = {h: dict(v) for h, v in self._per_host.items()}
+        if latencies:
+            stats["latency_ms"] = latency_summary(latencies)
+        return stats
+
+    def close(self):
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools = {}
+        for pool in pools:
+            with pool.lock:
+                for conn in pool.idle:
+                    conn.close()
+                pool.idle = []
+
+class _RawReader:
+    """read1()/read() over an httpx response's undecoded bytes, so HttpClient.stream's sink can read it."""
+
+    def __init__(self, response):
+        self._chunks = response.iter_raw(STREAM_CHUNK)
+
+    def read1(self, size=-1):
+        return next(self._chunks, b"")
+
+    def read(self):
+        for _ in self._chunks:
+            pass
+        return b""
+
+class Http2Client:
+    """
+    HTTP/2 variant backed by httpx (pip3 install 'httpx[http2]').
+
+    Same get/get_text/stats/close surface as HttpClient; one multiplexed
+    connection per host replaces the per-host pool. As in HttpClient, at
+    most max_per_host requests (or the host's entry in host_limits) are in
+    flight to one host, so the whole client is bounded by the sum of the
+    host limits rather than by one shared connection cap. Rate-limit waits,
+    the total timeout per request and stream() (early stop, decoded-size
+    cap, cache) work as in HttpClient.
+    """
+
+    def __init__(self, max_per_host=DEFAULT_MAX_PER_HOST, host_limits=None, timeout=DEFAULT_TIMEOUT,
+                 user_agent=DEFAULT_USER_AGENT, limiter=None, cache=None, archive=None, **_):
+        import httpx
+
+        self._client = httpx.Client(
+            http2=True, timeout=timeout, follow_redirects=True,
+            headers={"User-Agent": user_agent},
+            # No pool-wide cap: the per-host slots below bound every host (httpx's limit spans all hosts)
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=None),
+        )
+        self.max_per_host = max_per_host
+        self.host_limits = host_limits or {}
+        self._slots = {}
+        self.timeout = timeout
+        self.limiter = limiter
+        self.cache = cache
+        self.archive = archive
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "errors": 0, "bytes_received": 0, "bytes_decoded": 0, "throttled": 0}
+        self._latencies = deque(maxlen=2048)
+
+    get = HttpClient.get
+
+    def _slot(self, host):
+        with self._lock:
+            slot = self._slots.get(host)
+            if slot is None:
+                slot = self._slots[host] = threading.BoundedSemaphore(self.host_limits.get(host, self.max_per_host))
+            return slot
+
+    def _fetch(self, url, headers=None, sink=None, timeout=None):
+        start = time.perf_counter()
+        give_up = time.monotonic() + (self.timeout if timeout is None else timeout)
+        host = urlsplit(url).hostname or ""
+        try:
+            for attempt in range(MAX_THROTTLE_RETRIES + 1):
+                if self.limiter is not None:
+                    delay = self.limiter.reserve(url)
+                    if time.monotonic() + delay >= give_up:
+                        raise TimeoutError(f"rate limit wait for {host} would pass the deadline")
+                    if delay > 0:
+                        time.sleep(delay)
+                slot = self._slot(host)
+                if not slot.acquire(timeout=max(0.0, give_up - time.monotonic())):
+                    raise TimeoutError(f"no free request slot for {host}")
+                try:
+                    left = give_up - time.monotonic()
+                    if left <= 0:
+                        raise TimeoutError(f"deadline passed fetching {url}")
+                    # httpx timeouts bound each read; the loop bounds the whole body
+                    with self._client.stream("GET", url, headers=headers, timeout=left) as r:
+                        chunks = []
+                        if sink is not None and 200 <= r.status_code < 300:
+                            # Leaving the block unread resets the stream if the sink stopped early
+                            sink(_RawReader(r), {k.lower(): v for k, v in r.headers.items()})
+                        else:
+                            for chunk in r.iter_bytes():
+                                chunks.append(chunk)
+                                if time.monotonic() >= give_up:
+                                    raise TimeoutError(f"response body still arriving at the deadline: {url}")
+                        content = b"".join(chunks)
+                finally:
+                    slot.release()
+                if self.limiter is None or attempt == MAX_THROTTLE_RETRIES:
+                    break
+                if self.limiter.feedback(url, r.status_code, r.headers.get("retry-after")) is None:
+                    break
+                with self._lock:
+                    self._counters["throttled"] += 1
+        except Exception:
+            with self._lock:
+                self._counters["errors"] += 1
+            raise
+        elapsed = time.perf_counter() - start
+        received = r.num_bytes_downloaded
+        with self._lock:
+            self._counters["requests"] += 1
+            self._counters["bytes_received"] += received
+            self._counters["bytes_decoded"] += len(content)
+            self._latencies.append(elapsed)
+        return Response(str(r.url), r.status_code, {k.lower(): v for k, v in r.headers.items()},
+                        content, elapsed, received)
+
+    get_ok = HttpClient.get_ok
+
+    stream = HttpClient.stream
+    get_text = HttpClient.get_text
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters, http2=True)
+            latencies = sorted(self._latencies)
+        if latencies:
+            stats["latency_ms"] = latency_summary(latencies)
+        return stats
+
+    def close(self):
+        self._client.close()
+
+def make_client(http2=False, **kwargs):
+    """HttpClient, or Http2Client when http2 is requested and httpx/h2 are installed."""
+    if http2:
+        try:
+            import h2  # noqa: F401  (httpx needs it for HTTP/2)
+            return Http2Client(**kwargs)
+        except ImportError:
+            print("⚠️ HTTP/2 needs: pip3 install 'httpx[http2]' (falling back to HTTP/1.1)", file=sys.stderr)
+    return HttpClient(**kwargs)
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fetch URLs through the pooled client and print counters")
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("--http2", action="store_true", help="Use HTTP/2 (needs httpx[http2])")
+    args = parser.parse_args()
+
+    client = make_client(http2=args.http2)
+    for url in args.urls:
+        text = client.get_text(url)
+        print(f"{url}: {len(text) if text is not None else 'failed'} chars", file=sys.stderr)
+    print(json.dumps(client.stats(), indent=2))
+    client.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Content-addressed page archive for Trusted Shopper
+Records fetched pages (zstd or gzip, deduplicated) with a URL/time index, and replays them with no network
+"""
+
+import os
+import sys
+import json
+import time
+import gzip
+import sqlite3
+import hashlib
+import tempfile
+import threading
+
+from http_client import Response
+from search_cache import normalize_query
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC = "zst" if zstandard else "gz"
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+def browser_search_key(domain, query, max_results):
+    """Archive URL under which a browser search's product URL list is stored."""
+    return f"search://{domain}?q={normalize_query(query)}&n={max_results}"
+
+def _compress(data, codec):
+    if codec == "zst":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, GZIP_LEVEL, mtime=0)
+
+def _decompress(data, codec):
+    if codec == "zst":
+        if zstandard is None:
+            raise RuntimeError("archive object is zstd-compressed: pip3 install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+class PageArchive:
+    """
+    Directory of compressed page bodies named by their SHA-256, plus an
+    SQLite index of (url, fetched_at, sha256, kind, content_type).
+
+    Identical bodies are stored once however many URLs or runs produced
+    them. Objects are written to a temp file and renamed into place, and
+    the index uses WAL mode, so several processes can record into one
+    archive at the same time.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.recorded = 0
+        self.new_objects = 0
+        self.replayed = 0
+        self.missing = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite"), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT, fetched_at REAL, sha256 TEXT, codec TEXT, kind TEXT,"
+            " status INTEGER, content_type TEXT, size INTEGER, stored_size INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_url ON pages(url, fetched_at)")
+
+    def _object_path(self, digest, codec):
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}.{codec}")
+
+    def put(self, url, body, kind="page", status=200, content_type="text/html; charset=utf-8"):
+        """Archive one fetched body (bytes) under url; returns its SHA-256."""
+        body = bytes(body)
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest, CODEC)
+        if os.path.exists(path):
+            stored_size = os.path.getsize(path)
+        else:
+            data = _compress(body, CODEC)
+            stored_size = len(data)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            with self._lock:
+                self.new_objects += 1
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO pages (url, fetched_at, sha256, codec, kind, status, content_type, size, stored_size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, time.time(), digest, CODEC, kind, status, content_type, len(body), stored_size),
+            )
+            self.recorded += 1
+        return digest
+
+    def put_urls(self, domain, query, max_results, urls):
+        """Archive the product URLs a browser search returned."""
+        return self.put(browser_search_key(domain, query, max_results), json.dumps(urls).encode("utf-8"),
+                        kind="browser_search", content_type="application/json")
+
+    def lookup(self, url, before=None):
+        """Index row (sha256, codec, status, content_type, fetched_at) of the latest capture of url, or None."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT sha256, codec, status, content_type, fetched_at FROM pages"
+                " WHERE url = ? AND fetched_at <= ? ORDER BY fetched_at DESC LIMIT 1",
+                (url, before if before is not None else float("inf")),
+            ).fetchone()
+
+    def get(self, url, before=None):
+        """(body, status, content_type) of the latest capture of url (at or before `before`), or None."""
+        row = self.lookup(url, before)
+        if row is None:
+            with self._lock:
+                self.missing += 1
+            return None
+        digest, codec, status, content_type, _ = row
+        with open(self._object_path(digest, codec), "rb") as f:
+            body = _decompress(f.read(), codec)
+        with self._lock:
+            self.replayed += 1
+        return body, status, content_type
+
+    def get_urls(self, domain, query, max_results, before=None):
+        """Archived browser-search URL list, or None."""
+        hit = self.get(browser_search_key(domain, query, max_results), before)
+        return json.loads(hit[0]) if hit else None
+
+    def stats(self):
+        with self._lock:
+            entries, urls, size = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT url), COALESCE(SUM(size), 0) FROM pages"
+            ).fetchone()
+            objects, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(s), 0) FROM (SELECT MAX(stored_size) AS s FROM pages GROUP BY sha256)"
+            ).fetchone()
+            return {
+                "root": self.root,
+                "codec": CODEC,
+                "captures": entries,
+                "urls": urls,
+                "objects": objects,
+                "bytes": size,
+                "stored_bytes": stored,
+                "recorded": self.recorded,
+                "new_objects": self.new_objects,
+                "replayed": self.replayed,
+                "missing": self.missing,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class ReplayClient:
+    """
+    Drop-in for HttpClient that serves pages from a PageArchive and never
+    touches the network. URLs that were not recorded answer 404.
+    """
+
+    cache = None
+
+    def __init__(self, archive, before=None):
+        self.archive = archive
+        self.before = before
+
+    def get(self, url, headers=None, timeout=None):
+        hit = self.archive.get(url, self.before)
+        if hit is None:
+            return Response(url, 404, {}, b"", 0.0, 0, from_cache=True)
+        body, status, content_type = hit
+        return Response(url, status, {"content-type": content_type}, body, 0.0, 0, from_cache=True)
+
+    def get_ok(self, url, headers=None, timeout=None):
+        resp = self.get(url, headers)
+        if resp.status >= 400:
+            print(f"Error fetching {url}: not in archive {self.archive.root}", file=sys.stderr)
+            return None
+        return resp
+
+    def get_text(self, url, headers=None, timeout=None):
+        resp = self.get_ok(url, headers)
+        return resp.text() if resp is not None else None
+
+    def stream(self, url, on_text, max_bytes=None, headers=None, timeout=None):
+        resp = self.get(url, headers)
+        if 200 <= resp.status < 300:
+            on_text(resp.text())
+        return resp
+
+    def stats(self):
+        return {"replay": True, **self.archive.stats()}
+
+    def close(self):
+        pass
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect a page archive or print an archived page")
+    parser.add_argument("root", help="Archive directory")
+    parser.add_argument("--list", action="store_true", help="Print the index (url, time, kind, sha256) as NDJSON")
+    parser.add_argument("--cat", metavar="URL", help="Write the latest capture of URL to stdout")
+    args = parser.parse_args()
+
+    archive = PageArchive(args.root)
+    if args.cat:
+        hit = archive.get(args.cat)
+        if hit is None:
+            print(f"❌ {args.cat} is not in {args.root}", file=sys.stderr)
+            sys.exit(1)
+        sys.stdout.buffer.write(hit[0])
+        return
+    if args.list:
+        for url, fetched_at, digest, kind in archive._conn.execute(
+                "SELECT url, fetched_at, sha256, kind FROM pages ORDER BY fetched_at"):
+            print(json.dumps({"url": url, "fetched_at": fetched_at, "kind": kind, "sha256": digest}))
+        return
+    print(json.dumps(archive.stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
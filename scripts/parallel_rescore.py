@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Parallel re-scoring engine for large HTML corpora
+Shards pages across a process pool and writes NDJSON results in input order
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from analysis_cache import AnalysisCache
+from analyze_from_html import (
+    HtmlAnalyzer,
+    batch_error,
+    check_batch_record,
+    read_html_file,
+    iter_batch_records,
+    iter_html_dir,
+    open_batch_source,
+)
+
+# Pages per task: large enough to amortize pickling/IPC, small enough to
+# keep all workers busy near the end of a batch
+DEFAULT_CHUNK_SIZE = 16
+
+_worker_analyzer = None
+
+def _init_worker(cache_path):
+    global _worker_analyzer
+    cache = AnalysisCache(cache_path) if cache_path else None
+    _worker_analyzer = HtmlAnalyzer(cache=cache)
+
+def _analyze_chunk(records):
+    """
+    Worker entry point: analyze a chunk of (url, html_path) records.
+
+    Workers read the HTML themselves so only paths cross the process
+    boundary, and return already-serialized NDJSON lines plus timing.
+    """
+    if _worker_analyzer is None:
+        _init_worker(None)
+
+    start = time.perf_counter()
+    lines = []
+    failed = 0
+    for url, path in records:
+        try:
+            check_batch_record(url, path)
+            result = _worker_analyzer.analyze(url, read_html_file(path))
+        except Exception as e:
+            result = batch_error(url, path, e)
+            failed += 1
+        lines.append(json.dumps(result, ensure_ascii=False, separators=(",", ":")))
+    return os.getpid(), time.perf_counter() - start, lines, failed
+
+def _chunked(records, size):
+    it = iter(records)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def rescore_parallel(records, out=sys.stdout, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, cache_path=None):
+    """
+    Analyze (url, html_path) records across a process pool.
+
+    Results are written to `out` as compact NDJSON in input order. At most
+    two chunks per worker are in flight, so memory stays bounded however
+    long the record stream is. With cache_path, every worker consults the
+    same analysis cache. Returns a stats dict with totals and per-worker
+    throughput.
+    """
+    workers = workers or os.cpu_count() or 1
+    per_worker = {}
+    totals = {"pages": 0, "failed": 0}
+    pending = deque()
+
+    def drain(future):
+        pid, busy, lines, failed = future.result()
+        for line in lines:
+            out.write(line + "\n")
+        out.flush()
+        w = per_worker.setdefault(pid, {"pages": 0, "busy_seconds": 0.0})
+        w["pages"] += len(lines)
+        w["busy_seconds"] += busy
+        totals["pages"] += len(lines)
+        totals["failed"] += failed
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_path,)) as pool:
+        for chunk in _chunked(records, chunk_size):
+            pending.append(pool.submit(_analyze_chunk, chunk))
+            if len(pending) >= workers * 2:
+                drain(pending.popleft())
+        while pending:
+            drain(pending.popleft())
+    elapsed = time.perf_counter() - start
+
+    for w in per_worker.values():
+        busy = w["busy_seconds"]
+        w["pages_per_second"] = round(w["pages"] / busy, 2) if busy > 0 else None
+        w["busy_seconds"] = round(busy, 3)
+
+    return {
+        "workers": workers,
+        "pages": totals["pages"],
+        "failed": totals["failed"],
+        "elapsed_seconds": round(elapsed, 3),
+        "pages_per_second": round(totals["pages"] / elapsed, 2) if elapsed > 0 else None,
+        "per_worker": per_worker,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score an HTML corpus in parallel")
+    parser.add_argument("--batch", metavar="MANIFEST",
+                        help="NDJSON {url, html_path} records or '<url> <html_path>' lines; '-' reads stdin")
+    parser.add_argument("--html_dir", help="Analyze every .html file in this directory")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Pages per worker task")
+    parser.add_argument("--cache", metavar="PATH", help="Share this analysis cache (SQLite file) across workers")
+    args = parser.parse_args()
+
+    if bool(args.batch) == bool(args.html_dir):
+        parser.error("exactly one of --batch or --html_dir is required")
+
+    if args.html_dir:
+        stats = rescore_parallel(iter_html_dir(args.html_dir), workers=args.workers,
+                                 chunk_size=args.chunk_size, cache_path=args.cache)
+    else:
+        lines, base_dir = open_batch_source(args.batch)
+        with lines:
+            stats = rescore_parallel(iter_batch_records(lines, base_dir), workers=args.workers,
+                                     chunk_size=args.chunk_size, cache_path=args.cache)
+
+    print(f"✨ Re-scored {stats['pages']} pages ({stats['failed']} failed) in {stats['elapsed_seconds']}s "
+          f"with {stats['workers']} workers ({stats['pages_per_second']} pages/s)", file=sys.stderr)
+    for pid, w in sorted(stats["per_worker"].items()):
+        print(f"   worker {pid}: {w['pages']} pages in {w['busy_seconds']}s ({w['pages_per_second']} pages/s)",
+              file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Opt-in per-stage profiling for the analyzer and comparison pipeline
+Records wall and CPU time per named stage, plus optional cProfile dumps
+"""
+
+import sys
+import time
+import threading
+
+class _NullStage:
+    """Shared no-op context manager returned while profiling is off."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_STAGE = _NullStage()
+
+class _Stage:
+    __slots__ = ("timer", "name", "wall", "cpu")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.record(self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu)
+        return False
+
+class StageTimer:
+    """
+    Accumulates calls, wall time and CPU time per stage name.
+
+    Safe to share between threads. CPU time is per thread, so a stage that
+    waits on the network shows high wall time and near-zero CPU time.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def record(self, name, wall, cpu):
+        with self._lock:
+            s = self.stages.get(name)
+            if s is None:
+                s = self.stages[name] = [0, 0.0, 0.0]
+            s[0] += 1
+            s[1] += wall
+            s[2] += cpu
+
+    def as_dict(self):
+        """The `timings` payload: per-stage calls, wall_ms and cpu_ms."""
+        with self._lock:
+            stages = {
+                name: {"calls": calls, "wall_ms": round(wall * 1000, 3), "cpu_ms": round(cpu * 1000, 3)}
+                for name, (calls, wall, cpu) in self.stages.items()
+            }
+        return {"total_wall_ms": round((time.perf_counter() - self.started) * 1000, 3), "stages": stages}
+
+_timer = None
+_profiles = None
+_profiles_lock = threading.Lock()
+_warned = False
+
+def enable(cprofile=False):
+    """Start recording stage timings (and per-thread cProfile data if asked)."""
+    global _timer, _profiles, _warned
+    _timer = StageTimer()
+    _profiles = [] if cprofile else None
+    _warned = False
+    return _timer
+
+def disable():
+    global _timer, _profiles
+    _timer = None
+    _profiles = None
+
+def enabled():
+    return _timer is not None
+
+def stage(name):
+    """Context manager timing one stage; a shared no-op while profiling is off."""
+    if _timer is None:
+        return NULL_STAGE
+    return _timer.stage(name)
+
+def timings():
+    """Current timings payload, or None when profiling is off."""
+    return _timer.as_dict() if _timer is not None else None
+
+def profiled(fn, *args, **kwargs):
+    """
+    Call fn under its own cProfile profiler when cProfile dumps are enabled.
+
+    Before Python 3.12 cProfile only sees the thread it runs in, so worker
+    threads wrap their entry point with this and the profiles are merged by
+    dump(). From 3.12 cProfile is built on sys.monitoring, which allows one
+    profiler per process: a call made while another profiler is active runs
+    unprofiled (stage timings still cover it) and a warning is printed once.
+    """
+    global _warned
+    if _profiles is None:
+        return fn(*args, **kwargs)
+    import cProfile
+
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError as e:
+        with _profiles_lock:
+            warn, _warned = not _warned, True
+        if warn:
+            print(f"⚠️ cProfile: {e}; other threads get stage timings only", file=sys.stderr)
+        return fn(*args, **kwargs)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profile.disable()
+        with _profiles_lock:
+            _profiles.append(profile)
+
+def dump(path):
+    """Merge the collected cProfile data into one pstats file. Returns False if there is none."""
+    if not _profiles:
+        return False
+    import pstats
+
+    with _profiles_lock:
+        stats = pstats.Stats(_profiles[0])
+        for profile in _profiles[1:]:
+            stats.add(profile)
+    stats.dump_stats(path)
+    return True
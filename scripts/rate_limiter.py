@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Per-domain token-bucket rate limiter for Trusted Shopper
+Spaces out requests to each site and backs off (with jitter) on 429/503 and Retry-After
+"""
+
+import sys
+import json
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+DEFAULT_RATE = 2.0      # requests per second per domain
+DEFAULT_BURST = 4       # requests allowed back-to-back before spacing kicks in
+BACKOFF_BASE = 1.0      # seconds; doubled per consecutive throttle
+MAX_BACKOFF = 60.0
+MAX_RETRY_AFTER = 120.0  # ignore absurd Retry-After values beyond this
+THROTTLE_STATUSES = (429, 503)
+
+# Sites known to rate-limit aggressively get a slower bucket: (rate, burst)
+SITE_LIMITS = {
+    "amazon.in": (0.5, 2),
+    "flipkart.com": (1.0, 2),
+}
+
+def domain_of(url_or_host):
+    """Bucket key for a URL or host: lower-case host without a leading www."""
+    host = urlsplit(url_or_host).hostname if "://" in url_or_host else url_or_host
+    host = (host or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+def parse_rate(value):
+    """Requests per second from a CLI value; raises ValueError unless it is a positive number."""
+    rate = float(value)
+    if not rate > 0:
+        raise ValueError(f"rate must be positive: {value!r}")
+    return rate
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+def backoff_delay(failures, base=BACKOFF_BASE, cap=MAX_BACKOFF, rng=random):
+    """Exponential backoff with jitter: base x 2^(failures-1), scaled by a random 0.5-1.5."""
+    delay = min(cap, base * (2 ** max(0, failures - 1)))
+    return delay * rng.uniform(0.5, 1.5)
+
+class _Bucket:
+    __slots__ = ("rate", "burst", "tokens", "updated", "blocked_until", "failures",
+                 "requests", "waited", "throttled")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+        self.blocked_until = 0.0
+        self.failures = 0
+        self.requests = 0
+        self.waited = 0.0
+        self.throttled = 0
+
+class RateLimiter:
+    """
+    Thread-safe token bucket per domain.
+
+    reserve() takes a token and returns how long the caller must wait before
+    using it (so threads call wait(), and asyncio code sleeps on the returned
+    delay without blocking the loop). A 429/503 reported through feedback()
+    or a failure reported through penalize() blocks the domain for the
+    Retry-After time, or for a jittered exponential backoff.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, site_limits=None, clock=time.monotonic):
+        if not rate > 0:
+            raise ValueError(f"rate must be positive, got {rate!r}")
+        self.rate = rate
+        self.burst = burst
+        self.site_limits = SITE_LIMITS if site_limits is None else site_limits
+        self._clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, domain, now):
+        b = self._buckets.get(domain)
+        if b is None:
+            rate, burst = self.site_limits.get(domain, (self.rate, self.burst))
+            # A global rate below a site's default tightens that site too
+            b = self._buckets[domain] = _Bucket(min(rate, self.rate), max(1, min(burst, self.burst)), now)
+        return b
+
+    def reserve(self, url_or_domain):
+        """Take a token for this domain; returns seconds to wait before sending."""
+        domain = domain_of(url_or_domain)
+        with self._lock:
+            now = self._clock()
+            b = self._bucket(domain, now)
+            b.tokens = min(b.burst, b.tokens + (now - b.updated) * b.rate)
+            b.updated = now
+            b.tokens -= 1
+            delay = max(0.0, -b.tokens / b.rate, b.blocked_until - now)
+            b.requests += 1
+            b.waited += delay
+            return delay
+
+    def wait(self, url_or_domain, deadline=None):
+        """
+        Blocking reserve(): sleep until this domain may be requested again.
+        With a deadline (deadline.Deadline) that ends sooner, raises
+        TimeoutError at once instead of sleeping past it.
+        """
+        delay = self.reserve(url_or_domain)
+        if deadline is not None and deadline.cap(delay) < delay:
+            raise TimeoutError(f"rate limit wait for {domain_of(url_or_domain)} ({delay:.1f}s) would pass the deadline")
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def penalize(self, url_or_domain, retry_after=None):
+        """Back off this domain after a throttle or failure; returns the delay applied."""
+        domain = domain_of(url_or_domain)
+        with self._lock:
+            now = self._clock()
+            b = self._bucket(domain, now)
+            b.failures += 1
+            b.throttled += 1
+            delay = parse_retry_after(retry_after)
+            if delay is None:
+                delay = backoff_delay(b.failures)
+            b.blocked_until = max(b.blocked_until, now + delay)
+            return delay
+
+    def feedback(self, url_or_domain, status, retry_after=None):
+        """
+        Report a response status. 429/503 back the domain off and return the
+        delay; any other status clears the failure streak and returns None.
+        """
+        if status in THROTTLE_STATUSES:
+            return self.penalize(url_or_domain, retry_after)
+        if status is not None and status < 500:
+            domain = domain_of(url_or_domain)
+            with self._lock:
+                b = self._buckets.get(domain)
+                if b is not None:
+                    b.failures = 0
+        return None
+
+    def stats(self):
+        """Per-domain requests, total wait and throttle counts."""
+        with self._lock:
+            return {
+                domain: {"requests": b.requests, "waited_s": round(b.waited, 2), "throttled": b.throttled}
+                for domain, b in self._buckets.items()
+            }
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show the request schedule the limiter would produce")
+    parser.add_argument("domains", nargs="+", help="Domains (or URLs) to request, in order")
+    parser.add_argument("--rate", type=parse_rate, default=DEFAULT_RATE, help="Requests per second per domain")
+    parser.add_argument("--burst", type=int, default=DEFAULT_BURST, help="Back-to-back requests allowed")
+    args = parser.parse_args()
+
+    limiter = RateLimiter(args.rate, args.burst)
+    for d in args.domains:
+        print(f"{domain_of(d)}: wait {limiter.reserve(d):.2f}s", file=sys.stderr)
+    print(json.dumps(limiter.stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Search-result URL cache for Trusted Shopper
+Maps (domain, normalized query, max results) to product URLs so recent queries skip the headless browser
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "trusted-shopper", "search.sqlite")
+DEFAULT_TTL = 3600           # serve without refreshing for an hour
+DEFAULT_STALE_TTL = 86400    # then serve stale (and refresh in the background) for a day
+REFRESH_LEASE = 300          # one background refresh per key at a time, across processes
+
+def normalize_query(query):
+    """Canonical form of a search query: lower case, single spaces, tokens sorted."""
+    return " ".join(sorted(query.lower().split()))
+
+class SearchCache:
+    """
+    SQLite-backed (domain, query, max_results) -> product URL cache.
+
+    get() reports whether a hit is "fresh" or "stale"; stale entries are
+    still returned so the caller can answer immediately and refresh in the
+    background. claim_refresh() hands out a short lease so concurrent runs
+    (threads or processes sharing the file) do not refresh the same key
+    twice; put() or release_refresh() ends it.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.counters = {"fresh": 0, "stale": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS searches ("
+            " domain TEXT, query TEXT, max_results INTEGER, urls TEXT,"
+            " stored REAL, refreshing_until REAL DEFAULT 0,"
+            " PRIMARY KEY (domain, query, max_results))"
+        )
+
+    def get(self, domain, query, max_results):
+        """(urls, "fresh" | "stale") for a cached search, or (None, None)."""
+        key = (domain, normalize_query(query), max_results)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT urls, stored FROM searches WHERE domain = ? AND query = ? AND max_results = ?", key
+            ).fetchone()
+            age = time.time() - row[1] if row else None
+            if row is None or age > self.ttl + self.stale_ttl:
+                self.counters["misses"] += 1
+                return None, None
+            state = "fresh" if age <= self.ttl else "stale"
+            self.counters[state] += 1
+        return json.loads(row[0]), state
+
+    def put(self, domain, query, max_results, urls):
+        """Store a non-empty URL list (empty results are failures, not answers)."""
+        if not urls:
+            return False
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO searches (domain, query, max_results, urls, stored, refreshing_until)"
+                " VALUES (?, ?, ?, ?, ?, 0)",
+                (domain, normalize_query(query), max_results, json.dumps(urls), time.time()),
+            )
+        return True
+
+    def claim_refresh(self, domain, query, max_results):
+        """True if the caller should refresh this key (no other refresh holds the lease)."""
+        now = time.time()
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE searches SET refreshing_until = ?"
+                " WHERE domain = ? AND query = ? AND max_results = ? AND refreshing_until < ?",
+                (now + REFRESH_LEASE, domain, normalize_query(query), max_results, now),
+            )
+            return cur.rowcount == 1
+
+    def release_refresh(self, domain, query, max_results):
+        """Give up a lease from claim_refresh() (the refresh ended without storing anything)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE searches SET refreshing_until = 0 WHERE domain = ? AND query = ? AND max_results = ?",
+                (domain, normalize_query(query), max_results),
+            )
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+            c = dict(self.counters)
+        lookups = sum(c.values())
+        return {
+            **c,
+            "hit_rate": round((c["fresh"] + c["stale"]) / lookups, 3) if lookups else None,
+            "entries": entries,
+        }
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM searches")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the search-result URL cache")
+    parser.add_argument("--path", default=DEFAULT_CACHE_PATH, help="Cache file")
+    parser.add_argument("--clear", action="store_true", help="Delete all cached searches")
+    args = parser.parse_args()
+
+    cache = SearchCache(args.path)
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {args.path}", file=sys.stderr)
+    print(json.dumps({"path": args.path, **cache.stats()}, indent=2))
+    cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Per-site latency and success stats for Trusted Shopper
+Records how each site's search went and decides which sites to query next, and how long to give each
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import sqlite3
+import threading
+
+DEFAULT_STATS_PATH = os.path.join(os.path.expanduser("~"), ".cache", "trusted-shopper", "sites.sqlite")
+DEFAULT_MAX_SITES = 3
+WINDOW = 30                 # recent runs per site that the stats cover
+MIN_RUNS = 3                # runs before a site's stats outrank the cold-start order
+DEMOTE_SUCCESS_RATE = 0.34  # sites that succeed less often than this are demoted
+SLOW_P50 = 60.0             # sites with a median run slower than this (seconds) are demoted
+PROBE_INTERVAL = 86400      # one left-out site is tried (as one extra site) at most once a day
+TIMEOUT_HEADROOM = 1.5      # per-site timeout = p95 x this, clamped to the range below
+MIN_SITE_TIMEOUT = 10.0
+MAX_SITE_TIMEOUT = 120.0
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile (0 < q <= 1) of an ascending list."""
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+class SiteStats:
+    """
+    SQLite-backed log of how each site did per comparison: outcome
+    ("ok", "failed", "no_products", "error", "cut_off" by the site's own
+    timeout or "budget_cut" when the run's budget ended it), seconds taken
+    and products yielded, trimmed to the last WINDOW runs per site.
+
+    summary() turns the log into p50/p95 latency, success rate and mean
+    products; plan() uses that to pick the sites for the next run, and logs
+    when it last added a probe site. Safe to
+    share between threads and processes (WAL mode, busy timeout).
+    """
+
+    def __init__(self, path=DEFAULT_STATS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " site TEXT, finished_at REAL, status TEXT, seconds REAL, products INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS runs_site ON runs(site, finished_at)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS probes (site TEXT PRIMARY KEY, probed_at REAL)")
+
+    def record(self, site, status, seconds, products):
+        """Log one site's outcome for one comparison."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO runs (site, finished_at, status, seconds, products) VALUES (?, ?, ?, ?, ?)",
+                (site, time.time(), status, seconds, products),
+            )
+            self._conn.execute(
+                "DELETE FROM runs WHERE site = ? AND rowid NOT IN"
+                " (SELECT rowid FROM runs WHERE site = ? ORDER BY finished_at DESC LIMIT ?)",
+                (site, site, WINDOW),
+            )
+
+    def summary(self, site):
+        """
+        p50/p95 seconds, success rate and mean products over the site's
+        recent runs, or None. Budget cut-offs are counted but left out of
+        the samples: their times are truncated and say nothing about the site.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, seconds, products, finished_at FROM runs WHERE site = ?"
+                " ORDER BY finished_at DESC LIMIT ?",
+                (site, WINDOW),
+            ).fetchall()
+        measured = [r for r in rows if r[0] != "budget_cut"]
+        if not measured:
+            return None
+        seconds = sorted(r[1] for r in measured)
+        return {
+            "runs": len(measured),
+            "budget_cuts": len(rows) - len(measured),
+            "p50_s": round(percentile(seconds, 0.5), 2),
+            "p95_s": round(percentile(seconds, 0.95), 2),
+            "success_rate": round(sum(r[0] == "ok" for r in measured) / len(measured), 3),
+            "mean_products": round(sum(r[2] for r in measured) / len(measured), 2),
+            "last_run": rows[0][3],
+        }
+
+    def summaries(self):
+        with self._lock:
+            sites = [r[0] for r in self._conn.execute("SELECT DISTINCT site FROM runs ORDER BY site")]
+        return {site: self.summary(site) for site in sites}
+
+    def plan(self, names, max_sites=DEFAULT_MAX_SITES, priority=(), budget=None, now=None):
+        """
+        Sites to query next, as [(name, timeout seconds or None, reason)].
+
+        Sites named in `priority` keep that cold-start order ("default") until
+        they have MIN_RUNS runs. Every other site with history is ranked by
+        products per run (success rate x mean products), then by p50 latency
+        ("history"); sites with no runs yet ("untried") come after those. A
+        site with MIN_RUNS runs whose success rate is under
+        DEMOTE_SUCCESS_RATE, or whose p50 exceeds SLOW_P50 or the budget, is
+        demoted to the end ("demoted"), so max_sites are always filled while
+        enough sites exist. At most once per PROBE_INTERVAL one "probe" is
+        added: the left-out site that has gone longest without a run or a
+        probe, so untried and demoted sites can earn a place. The probe is
+        logged when it is planned; the first plan() on a new store only
+        starts the log, so the first probe comes PROBE_INTERVAL later.
+        Timeouts come from p95 latency once a site has MIN_RUNS runs.
+        """
+        now = time.time() if now is None else now
+        stats = {name: self.summary(name) for name in names}
+        slow = min(SLOW_P50, budget) if budget is not None else SLOW_P50
+
+        def trusted(name):
+            return stats[name] is not None and stats[name]["runs"] >= MIN_RUNS
+
+        def demoted(name):
+            s = stats[name]
+            return trusted(name) and (s["success_rate"] < DEMOTE_SUCCESS_RATE or s["p50_s"] > slow)
+
+        def timeout(name):
+            if not trusted(name):
+                return None
+            return round(min(MAX_SITE_TIMEOUT, max(MIN_SITE_TIMEOUT, stats[name]["p95_s"] * TIMEOUT_HEADROOM)), 1)
+
+        def rank(name):
+            s = stats[name]
+            if s is None:
+                return (1, 0.0, 0.0)
+            return (2 if demoted(name) else 0, -s["success_rate"] * s["mean_products"], s["p50_s"])
+
+        def reason(name):
+            if name in cold:
+                return "default"
+            if stats[name] is None:
+                return "untried"
+            return "demoted" if demoted(name) else "history"
+
+        cold = [n for n in priority if n in stats and not trusted(n)]
+        order = cold + sorted((n for n in names if n not in cold), key=rank)
+        plan = [(n, timeout(n), reason(n)) for n in order[:max_sites]]
+
+        left_out = order[max_sites:]
+        with self._lock:
+            probed = dict(self._conn.execute("SELECT site, probed_at FROM probes").fetchall())
+        if not probed:
+            # Seed the log: a fresh store queries max_sites sites, not max_sites + 1
+            with self._lock, self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO probes (site, probed_at) VALUES ('', ?)", (now,))
+        elif left_out and now - max(probed.values()) >= PROBE_INTERVAL:
+            last_tried = {n: max(stats[n]["last_run"] if stats[n] else 0.0, probed.get(n, 0.0)) for n in left_out}
+            probe = min(left_out, key=lambda n: last_tried[n])
+            plan.append((probe, timeout(probe), "probe"))
+            with self._lock, self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO probes (site, probed_at) VALUES (?, ?)", (probe, now))
+        return plan
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM runs")
+            self._conn.execute("DELETE FROM probes")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show or clear per-site latency and success stats")
+    parser.add_argument("--path", default=DEFAULT_STATS_PATH, help="Stats file")
+    parser.add_argument("--clear", action="store_true", help="Forget all recorded runs")
+    args = parser.parse_args()
+
+    stats = SiteStats(args.path)
+    if args.clear:
+        stats.clear()
+        print(f"Cleared {args.path}", file=sys.stderr)
+    print(json.dumps({"path": args.path, "sites": stats.summaries()}, indent=2))
+    stats.close()
+
+if __name__ == "__main__":
+    main()
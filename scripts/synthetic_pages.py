@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Synthetic product page generator
+Builds realistic, deterministic e-commerce pages (50 KB to 10 MB) for offline benchmarks
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+
+PRODUCT_NAMES = ["Aero Wireless Earbuds", "Nimbus 1.5 Ton Split AC", "Orbit Smart Watch",
+                 "Terra Cotton Bedsheet Set", "Volt 20000mAh Power Bank", "Kite Running Shoes"]
+
+POLICY_TEXT = [
+    "30 days return policy. Free pickup from your doorstep.",
+    "10 day replacement only. Items must be returned in original packaging with tags.",
+    "Refund within 7 days of pickup. Hassle free returns.",
+    "This item is non-returnable.",
+    "1 year brand warranty. Authorized service centers nationwide.",
+    "2 years manufacturer warranty plus extended warranty available.",
+    "6 months seller warranty.",
+    "Free installation by brand technician. Official store.",
+    "Delivery charge: ₹99. Inclusive of all taxes.",
+    "Free delivery on this order.",
+    "Convenience fee ₹29 applies. Packaging fee ₹15.",
+    "COD charge ₹49. Prices exclusive of GST.",
+    "Installation charges ₹499 payable to technician.",
+]
+
+REVIEW_TEXT = [
+    "Verified purchase. Customer photo attached. Packaging was good, delivery on time.",
+    "Reviewed 3 days ago. Sound is clear but one earbud had a defect; customer care replaced it.",
+    "Great product! Highly recommend. Excellent product. Best ever. Must buy.",
+    "Worked for two weeks then stopped charging. Service center visit took a month.",
+    "Reviewed in March 2025. Build quality is solid, battery lasts two days.",
+    "Amazing!!! Life changing! Perfect! Flawless!",
+]
+
+PROMO_TEXT = ["Limited time deal: 40% off, MRP ₹4,999.", "Hurry, only 2 left! Sale ends today.",
+              "Bank offer: 10% instant discount.", "Act now, last chance at this price."]
+
+FILLER = ("Crafted for everyday use with a lightweight body and durable finish. "
+          "Specifications may vary by region and batch. ")
+
+def _script_blob(rng, size):
+    """Inline script holding a JSON state blob, like hydrated storefront pages."""
+    items = []
+    while sum(len(i) for i in items) < size:
+        items.append(json.dumps({"id": rng.randint(1, 10 ** 9), "label": "<b>variant</b>",
+                                 "price": rng.randint(99, 99999), "note": "x" * rng.randint(10, 200)}))
+    return "<script>window.__STATE__={\"items\":[" + ",".join(items) + "]};</script>\n"
+
+def synthetic_page(size, seed=0):
+    """
+    A product page of roughly `size` characters: head styles and scripts,
+    JSON-LD, a title and price block, policy sections, and repeated
+    review/promo blocks interleaved with inline JSON scripts.
+    """
+    rng = random.Random(seed)
+    name = rng.choice(PRODUCT_NAMES)
+    price = rng.randint(299, 49999)
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>" + name + "</title>",
+        "<style>" + ".c{margin:0;padding:2px}" * 40 + "</style>",
+        '<script type="application/ld+json">' + json.dumps({
+            "@context": "https://schema.org", "@type": "Product", "name": name,
+            "offers": {"@type": "Offer", "price": str(price), "priceCurrency": "INR",
+                       "availability": "https://schema.org/InStock"},
+            "aggregateRating": {"ratingValue": "4.2", "reviewCount": str(rng.randint(10, 5000))},
+        }) + "</script>",
+        f'<meta property="og:title" content="{name}"></head><body>',
+        f"<header><nav>Home &rsaquo; Electronics &rsaquo; {name}</nav></header>",
+        f"<h1>{name}</h1><div class='price'>Price <span>₹{price:,}</span> <s>MRP ₹{price * 2:,}</s></div>",
+        "<section id='policy'>" + " ".join(f"<p>{t}</p>" for t in rng.sample(POLICY_TEXT, 4)) + "</section>",
+    ]
+    length = sum(len(p) for p in parts)
+    i = 0
+    while length < size:
+        if i % 10 == 0:
+            block = _script_blob(rng, min(20000, max(500, size // 50)))
+        elif i % 4 == 0:
+            block = f"<div class='promo'>{rng.choice(PROMO_TEXT)}</div>\n"
+        else:
+            block = ("<div class='review'><span class='stars'>" + "★" * rng.randint(1, 5) + "</span><p>"
+                     + rng.choice(REVIEW_TEXT) + " " + FILLER * rng.randint(1, 3) + "</p></div>\n")
+        parts.append(block)
+        length += len(block)
+        i += 1
+    parts.append("<footer>&copy; Example Retail</footer></body></html>")
+    return "".join(parts)
+
+def _repeat(unit, size):
+    return (unit * (size // len(unit) + 1))[:size]
+
+# Hostile inputs aimed at each part of the analyzer: backtracking-prone
+# runs, markup that never closes, and pathological structured data.
+ADVERSARIAL_PAGES = {
+    "digit_run": lambda size: "<p>" + "9" * size + "</p>",
+    "digit_days": lambda size: _repeat("1 ", size) + "days return",
+    "digit_durations": lambda size: "9" * (size // 2) + " days return, " + "9" * (size // 2) + " year warranty",
+    "rupee_commas": lambda size: "₹" + _repeat("1,", size) + " delivery",
+    "attribute_name": lambda size: "<meta " + "a" * size + ">",
+    "attribute_flood": lambda size: "<meta " + _repeat('content="x" ', size) + ">",
+    "unterminated_tag": lambda size: "<div title='" + _repeat("x ", size),
+    "open_angle_flood": lambda size: _repeat("<a", size),
+    "unclosed_comment": lambda size: "<!--" + _repeat("-- ->", size),
+    "unclosed_script": lambda size: "<script>" + _repeat("var a=1;</scrip", size),
+    "nested_json_ld": lambda size: '<script type="application/ld+json">' + "[" * size + "</script>",
+    "keyword_flood": lambda size: _repeat("delivery charge warranty guarantee refund within ", size),
+    "price_flood": lambda size: _repeat("₹1 $2 €3 ", size),
+    "entity_flood": lambda size: _repeat("&amp;&#8377;&bogus;", size),
+}
+
+def adversarial_page(kind, size):
+    """A hostile page of about `size` characters (see ADVERSARIAL_PAGES)."""
+    return ADVERSARIAL_PAGES[kind](size)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic product page corpus")
+    parser.add_argument("--out_dir", required=True, help="Directory for the .html files and manifest.ndjson")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50_000, 500_000, 2_000_000, 10_000_000],
+                        help="Page sizes in characters")
+    parser.add_argument("--count", type=int, default=1, help="Pages per size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    manifest = os.path.join(args.out_dir, "manifest.ndjson")
+    with open(manifest, "w", encoding="utf-8") as m:
+        for size in args.sizes:
+            for k in range(args.count):
+                name = f"page_{size}_{k}.html"
+                with open(os.path.join(args.out_dir, name), "w", encoding="utf-8") as f:
+                    f.write(synthetic_page(size, seed=args.seed + k))
+                m.write(json.dumps({"url": f"https://shop.example.com/p/{size}-{k}", "html_path": name}) + "\n")
+    print(f"✅ Wrote {len(args.sizes) * args.count} pages and {manifest}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for the analyzer result cache
+Run with: python3 -m pytest tests/ (or python3 -m unittest discover tests)
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import analyze_from_html  # noqa: E402
+from analysis_cache import AnalysisCache, rules_fingerprint  # noqa: E402
+from analyze_from_html import HtmlAnalyzer, parse_html  # noqa: E402
+
+URL = "https://shop.example/p/1"
+HTML = ("<html><body><h1>Test phone</h1><p>Rs. 9,999. 7 days return. 1 year warranty."
+        " Free delivery.</p></body></html>")
+
+class AnalysisCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = AnalysisCache(os.path.join(self.dir, "analysis.sqlite"))
+        self.analyzer = HtmlAnalyzer(cache=self.cache)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.dir)
+
+    def test_hit_returns_the_same_result(self):
+        first = self.analyzer.analyze(URL, HTML)
+        second = self.analyzer.analyze(URL.replace("/1", "/2"), HTML)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual({**first, "url": None}, {**second, "url": None})
+
+    def test_hit_reports_this_fetch_download_cut(self):
+        text, lower, structured = parse_html(HTML)
+        cut = self.analyzer.analyze_parsed(URL, text, lower, structured, download_cut_at=4096)
+        self.assertEqual(cut["degraded"], {"download_cut_at_bytes": 4096})
+        whole = self.analyzer.analyze_parsed(URL, text, lower, structured)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertNotIn("degraded", whole)
+        cut = self.analyzer.analyze_parsed(URL, text, lower, structured, download_cut_at=8192)
+        self.assertEqual(cut["degraded"], {"download_cut_at_bytes": 8192})
+
+    def test_fingerprint_follows_the_live_weights(self):
+        before = rules_fingerprint()
+        weights = dict(analyze_from_html.SCORE_WEIGHTS)
+        try:
+            analyze_from_html.SCORE_WEIGHTS["extra_term"] = 1
+            self.assertNotEqual(rules_fingerprint(), before)
+        finally:
+            analyze_from_html.SCORE_WEIGHTS.clear()
+            analyze_from_html.SCORE_WEIGHTS.update(weights)
+        self.assertEqual(rules_fingerprint(), before)
+
+if __name__ == "__main__":
+    unittest.main()
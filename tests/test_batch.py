@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for the batch NDJSON mode of analyze_from_html
+Run with: python3 -m pytest tests/ (or python3 -m unittest discover tests)
+"""
+
+import io
+import os
+import sys
+import json
+import pickle
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from analyze_from_html import BadBatchLine, analyze_batch, iter_batch_records  # noqa: E402
+
+HTML = "<html><body><h1>Test phone</h1><p>Rs. 9,999. 7 days return.</p></body></html>"
+
+MANIFEST = [
+    '{"url": "https://shop.example/p/1", "html_path": "page.html"}',
+    "",
+    "# comment",
+    "https://shop.example/p/2 page.html",
+    '{"url": "https://shop.example/p/3", "html_path": ',
+    '["https://shop.example/p/4", "page.html"]',
+    '"page.html"',
+    '{"url": 5, "html_path": "page.html"}',
+    '{"url": "https://shop.example/p/6", "html_path": "missing.html"}',
+    "https://shop.example/p/7",
+]
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        with open(os.path.join(self.dir, "page.html"), "w", encoding="utf-8") as f:
+            f.write(HTML)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_malformed_lines_are_yielded_with_their_line_numbers(self):
+        records = list(iter_batch_records(MANIFEST, self.dir))
+        page = os.path.join(self.dir, "page.html")
+        self.assertEqual(records[0], ("https://shop.example/p/1", page))
+        self.assertEqual(records[1], ("https://shop.example/p/2", page))
+        bad = [(path.line, path.message.split(":")[0]) for url, path in records[2:6]]
+        self.assertEqual(bad, [(5, "invalid JSON"), (6, "expected a JSON object, got list"),
+                               (7, "expected a JSON object, got str"), (8, "url and html_path must be strings")])
+        self.assertTrue(all(url is None for url, _ in records[2:6]))
+        self.assertEqual(records[7], ("https://shop.example/p/7", None))
+
+    def test_bad_lines_become_error_records_and_the_batch_carries_on(self):
+        out = io.StringIO()
+        ok, failed = analyze_batch(iter_batch_records(MANIFEST, self.dir), out=out)
+        self.assertEqual((ok, failed), (2, 6))
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([line["url"] for line in lines[:2]], ["https://shop.example/p/1", "https://shop.example/p/2"])
+        self.assertIn("scores", lines[0])
+        self.assertEqual(sorted(lines[2]), ["error", "line", "url"])
+        self.assertTrue(lines[2]["error"].startswith("line 5: invalid JSON"), lines[2]["error"])
+        self.assertEqual([line.get("line") for line in lines[2:6]], [5, 6, 7, 8])
+        self.assertEqual(lines[6]["url"], "https://shop.example/p/6")
+        self.assertEqual(lines[7]["error"], "record needs both url and html_path")
+
+    def test_bad_line_survives_a_process_boundary(self):
+        error = pickle.loads(pickle.dumps(BadBatchLine(12, "invalid JSON")))
+        self.assertEqual((error.line, error.message, str(error)), (12, "invalid JSON", "line 12: invalid JSON"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for the analyzer guardrails on hostile and oversized pages
+Run with: python3 -m pytest tests/ (or python3 -m unittest discover tests)
+"""
+
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import analyze_from_html  # noqa: E402
+from analyze_from_html import (  # noqa: E402
+    DELIVERY_PATTERNS, MAX_COMMENT_CHARS, HtmlAnalyzer, find_fee, find_return_window,
+    find_warranty_months, html_to_text,
+)
+from synthetic_pages import ADVERSARIAL_PAGES, adversarial_page, synthetic_page  # noqa: E402
+
+URL = "https://shop.example/p/1"
+
+def seconds(fn, *args):
+    """Best of two runs, to keep scheduler noise out of the ratios."""
+    best = None
+    for _ in range(2):
+        start = time.perf_counter()
+        fn(*args)
+        spent = time.perf_counter() - start
+        best = spent if best is None else min(best, spent)
+    return best
+
+class LinearTimeTest(unittest.TestCase):
+    # Three times the input may cost at most about six times the time: linear
+    # code stays near x3, a backtracking or re-scanning loop goes to x9
+    def assertLinear(self, fn, small, large, label):
+        t_small, t_large = seconds(fn, small), seconds(fn, large)
+        self.assertLess(t_large, 6 * t_small + 0.1, f"{label}: {t_small:.3f}s -> {t_large:.3f}s")
+
+    def test_digit_led_patterns(self):
+        # Runs that never complete a match: without the (?<!\d) anchors every
+        # digit restarted the match, and 20 KB of digits took over 30 s
+        for unit in ("9", "1 ", "1,"):
+            small, large = unit * 5_000, unit * 15_000
+            self.assertLinear(find_return_window, small, large, repr(unit))
+            self.assertLinear(find_warranty_months, small, large, repr(unit))
+            self.assertLinear(lambda s: find_fee(DELIVERY_PATTERNS, s), "₹" + small, "₹" + large, repr(unit))
+
+    # Small tag/comment caps, so both sizes are well past them (as with the bench's MB pages)
+    @mock.patch.object(analyze_from_html, "MAX_TAG_CHARS", 4096)
+    @mock.patch.object(analyze_from_html, "MAX_COMMENT_CHARS", 4096)
+    def test_hostile_pages(self):
+        analyzer = HtmlAnalyzer(stage_budgets_ms={})  # no budgets: every stage runs to the end
+        for kind in ADVERSARIAL_PAGES:
+            with self.subTest(kind):
+                self.assertLinear(lambda html: analyzer.analyze(URL, html), adversarial_page(kind, 100_000),
+                                  adversarial_page(kind, 300_000), kind)
+
+class GuardrailTest(unittest.TestCase):
+    def test_absurd_durations_are_ignored(self):
+        self.assertEqual(find_return_window("9" * 5_000 + " days return, 30 days return"), 30)
+        self.assertEqual(find_warranty_months("9" * 5_000 + " year warranty, 1 year warranty"), 12)
+        result = HtmlAnalyzer().analyze(URL, adversarial_page("digit_durations", 20_000))
+        self.assertIsNone(result["return_policy_analysis"]["return_window_days"])
+
+    def test_runaway_tag_and_comment_are_cut(self):
+        text, _ = html_to_text(adversarial_page("unterminated_tag", 300_000))
+        self.assertTrue(text.startswith("<div title='x x"))
+        text, _ = html_to_text("<!--" + "x" * (MAX_COMMENT_CHARS - 4) + " visible")
+        self.assertEqual(text, "visible")
+
+    def test_oversized_input_is_truncated(self):
+        html = synthetic_page(50_000)
+        result = HtmlAnalyzer(max_input_chars=5_000).analyze(URL, html)
+        self.assertEqual(result["degraded"], {"input_chars": len(html), "analyzed_chars": 5_000})
+
+    def test_stage_over_budget_is_interrupted_and_later_stages_skipped(self):
+        result = HtmlAnalyzer(stage_budgets_ms={"strip_html": 1}).analyze(URL, synthetic_page(2_000_000))
+        overrun, = result["degraded"]["budget_overruns"]
+        self.assertEqual((overrun["stage"], overrun.get("interrupted")), ("strip_html", True))
+        self.assertEqual(result["degraded"]["skipped_stages"][0], "keyword_index")
+        self.assertTrue(result["evidence_sample"])  # the text parsed before the cut is kept
+
+if __name__ == "__main__":
+    unittest.main()
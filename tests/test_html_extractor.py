@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-pass HTML-to-text extractor: chunked feeding vs whole pages
+Run with: python3 -m pytest tests/ (or python3 -m unittest discover tests)
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from analyze_from_html import FEED_SLICE, HtmlTextExtractor  # noqa: E402
+from synthetic_pages import ADVERSARIAL_PAGES, adversarial_page, synthetic_page  # noqa: E402
+
+# Boundaries that have to survive a split: closing tags of skipped elements,
+# comments, entities, a "<" that is text, and JSON-LD/meta data
+EDGE_PAGE = ("<html><head><title>T</title><script>var a = '</scr' + 'ipt>';</script>"
+             "<script type='application/ld+json'>{\"@type\": \"Product\", \"name\": \"Orbit\","
+             " \"offers\": {\"price\": \"1299\", \"priceCurrency\": \"INR\"}}</script>"
+             "<meta property='og:title' content='Orbit &amp; Co'></head><body>"
+             "<!-- a -- comment --><p>Price &#8377;1,299 &amp; 2 &lt; 3</p> 1 < 2 <br/>"
+             "<style>p{}</style><noscript>hidden</noscript><svg><text>x</text></svg>"
+             "<span itemprop='brand' content='Orbit'>7 days return</span></body></html>")
+
+def extract(html, sizes=None):
+    """(text, lower, structured) for html fed whole, or in chunks cycling through sizes."""
+    extractor = HtmlTextExtractor()
+    if sizes is None:
+        extractor.feed(html)
+    else:
+        pos = i = 0
+        while pos < len(html):
+            n = sizes[i % len(sizes)]
+            extractor.feed(html[pos:pos + n])
+            pos += n
+            i += 1
+    text, lower = extractor.close()
+    return text, lower, extractor.structured_data()
+
+class HtmlTextExtractorTest(unittest.TestCase):
+    def assertChunkedMatchesWhole(self, html, chunkings):
+        whole = extract(html)
+        for sizes in chunkings:
+            self.assertEqual(extract(html, sizes), whole, sizes)
+        return whole
+
+    def test_edge_cases_at_every_split(self):
+        text, _, structured = self.assertChunkedMatchesWhole(EDGE_PAGE, [[1], [2], [3], [5], [7], [11]])
+        self.assertEqual(text, "T Price ₹1,299 & 2 < 3 1 < 2 7 days return")
+        self.assertEqual(structured["name"], "Orbit")
+        for split in range(1, len(EDGE_PAGE)):
+            self.assertEqual(extract(EDGE_PAGE, [split, len(EDGE_PAGE)])[0], text, split)
+
+    def test_synthetic_pages(self):
+        for seed in range(3):
+            text, _, _ = self.assertChunkedMatchesWhole(synthetic_page(40_000, seed=seed), [[7], [4093], [3, 1, 250, 17]])
+            self.assertNotIn("<", text.replace(" < ", ""))
+
+    def test_large_chunks_are_fed_in_slices(self):
+        html = synthetic_page(3 * FEED_SLICE, seed=1)
+        self.assertChunkedMatchesWhole(html, [[FEED_SLICE + 1], [65_536]])
+
+    def test_hostile_pages(self):
+        # Above MAX_TAG_CHARS, so the runaway-tag path is split across chunks too
+        for kind in ADVERSARIAL_PAGES:
+            with self.subTest(kind):
+                self.assertChunkedMatchesWhole(adversarial_page(kind, 300_000), [[10_007], [65_536, 1]])
+
+if __name__ == "__main__":
+    unittest.main()
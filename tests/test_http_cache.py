@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests for the HTTP response cache: freshness, revalidation and eviction
+Run with: python3 -m pytest tests/ (or python3 -m unittest discover tests)
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from email.utils import formatdate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from http_cache import DEFAULT_TTL, PRICE_TTL, HttpCache, freshness_lifetime  # noqa: E402
+from http_client import Response, cached_get  # noqa: E402
+
+PAGE = b"<html><body>Rs. 9,999</body></html>" * 20
+URL = "https://shop.example/search?q=earbuds"
+
+class ScriptedClient:
+    """Stands in for HttpClient: answers _fetch() from a list and records the request headers."""
+
+    def __init__(self, cache, *responses):
+        self.cache = cache
+        self.responses = list(responses)
+        self.requests = []
+
+    def _fetch(self, url, headers=None, timeout=None):
+        self.requests.append(dict(headers or {}))
+        status, headers, body = self.responses.pop(0)
+        return Response(url, status, headers, body, 0.01, len(body) + 200)
+
+class FreshnessTest(unittest.TestCase):
+    def test_freshness_lifetime(self):
+        now = float(int(time.time()))  # Expires has whole seconds
+        cases = [
+            ({"cache-control": "max-age=60"}, 60),
+            ({"cache-control": "public, s-maxage=30, max-age=60"}, 30),
+            ({"cache-control": "max-age=-5"}, 0),
+            ({"cache-control": "no-cache"}, 0),
+            ({"cache-control": "no-store, max-age=60"}, None),
+            ({"expires": formatdate(now + 120, usegmt=True)}, 120),
+            ({"expires": formatdate(now - 120, usegmt=True)}, 0),
+            ({"expires": "0"}, 0),
+            ({}, DEFAULT_TTL),
+        ]
+        for headers, expected in cases:
+            self.assertEqual(freshness_lifetime(URL, headers, now=now), expected, headers)
+
+    def test_fallback_ttls_by_site_and_page_kind(self):
+        self.assertEqual(freshness_lifetime("https://www.amazon.in/s?k=earbuds", {}), 1800)
+        self.assertEqual(freshness_lifetime("https://www.amazon.in/dp/B0TEST", {}), PRICE_TTL)
+        self.assertEqual(freshness_lifetime("https://shop.example/product/1", {}), PRICE_TTL)
+
+class CachedGetTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = HttpCache(os.path.join(self.dir, "http.sqlite"))
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.dir)
+
+    def get(self, client, at=0):
+        with mock.patch("time.time", return_value=self.start + at):
+            return cached_get(client, URL)
+
+    def test_fresh_entry_is_served_without_a_request(self):
+        self.start = time.time()
+        client = ScriptedClient(self.cache, (200, {"cache-control": "max-age=60"}, PAGE))
+        self.assertFalse(self.get(client).from_cache)
+        resp = self.get(client, at=30)
+        self.assertTrue(resp.from_cache)
+        self.assertEqual(resp.body, PAGE)
+        self.assertEqual(len(client.requests), 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_rate"]), (1, 1, 0.5))
+        self.assertEqual(stats["bytes_saved"], len(PAGE) + 200)
+
+    def test_stale_entry_is_revalidated_and_a_304_reuses_the_body(self):
+        self.start = time.time()
+        client = ScriptedClient(
+            self.cache,
+            (200, {"cache-control": "max-age=60", "etag": '"v1"', "last-modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+             PAGE),
+            (304, {"cache-control": "max-age=120"}, b""),
+        )
+        self.get(client)
+        resp = self.get(client, at=90)
+        self.assertEqual(client.requests[1], {"If-None-Match": '"v1"',
+                                              "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"})
+        self.assertEqual((resp.status, resp.body, resp.from_cache), (200, PAGE, True))
+        # The 304's max-age extends the entry from the time of revalidation
+        self.assertTrue(self.get(client, at=200).from_cache)
+        self.assertEqual(len(client.requests), 2)
+        self.assertEqual(self.cache.counters["revalidated"], 1)
+        # Revalidating saves the stored download less the 304; the later hit saves all of it
+        wire = len(PAGE) + 200
+        self.assertEqual(self.cache.counters["bytes_saved"], (wire - 200) + wire)
+
+    def test_changed_page_replaces_the_entry(self):
+        self.start = time.time()
+        client = ScriptedClient(self.cache, (200, {"cache-control": "max-age=0", "etag": '"v1"'}, PAGE),
+                                (200, {"cache-control": "max-age=0", "etag": '"v2"'}, PAGE + b"new"))
+        self.get(client)
+        self.assertEqual(self.get(client, at=1).body, PAGE + b"new")
+        self.assertEqual(self.cache.lookup(URL).headers["etag"], '"v2"')
+
+    def test_uncacheable_responses_are_not_stored(self):
+        self.start = time.time()
+        client = ScriptedClient(self.cache, (200, {"cache-control": "no-store"}, PAGE), (404, {}, b"not found"),
+                                (200, {}, PAGE))
+        self.get(client)
+        self.assertIsNone(self.cache.lookup(URL))
+        self.get(client)
+        self.assertIsNone(self.cache.lookup(URL))
+        self.get(client)
+        self.assertIsNotNone(self.cache.lookup(URL))
+
+    def test_partial_entries_are_not_served_to_get(self):
+        self.start = time.time()
+        self.cache.store(URL, Response(URL, 200, {"cache-control": "max-age=60"}, PAGE[:100], 0.01), partial=True)
+        client = ScriptedClient(self.cache, (200, {"cache-control": "max-age=60"}, PAGE))
+        self.assertEqual(self.get(client).body, PAGE)
+        self.assertEqual(client.requests, [{}])
+
+class EvictionTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_least_recently_used_entries_go_first(self):
+        pages = {f"https://shop.example/s{i}": os.urandom(1000) for i in range(4)}  # incompressible
+        cache = HttpCache(os.path.join(self.dir, "http.sqlite"), max_bytes=3500)
+        for i, (url, body) in enumerate(pages.items()):
+            with mock.patch("time.time", return_value=1000.0 + i):
+                cache.store(url, Response(url, 200, {}, body, 0.01))
+                if i == 2:
+                    cache.lookup("https://shop.example/s0")  # s0 is now used more recently than s1
+        self.assertIsNotNone(cache.lookup("https://shop.example/s0"))
+        self.assertIsNone(cache.lookup("https://shop.example/s1"))
+        self.assertEqual(cache.stats()["entries"], 3)
+        cache.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled HTTP client against a local http.server stand-in
+Run with: python3 -m pytest tests/ (or python3 -m unittest discover tests)
+"""
+
+import os
+import sys
+import gzip
+import time
+import zlib
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from http_client import HttpClient, Http2Client  # noqa: E402
+from http_cache import HttpCache  # noqa: E402
+
+PAGE = ("<html><body><h1>Test phone</h1><p>Rs. 9,999 with free delivery</p></body></html>" * 50).encode()
+BOMB = gzip.compress(b" " * (64 * 1024 * 1024))  # ~64 KB on the wire, 64 MB decoded
+
+try:
+    import httpx  # noqa: F401
+    import h2  # noqa: F401
+    HAVE_HTTP2 = True
+except ImportError:
+    HAVE_HTTP2 = False
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves fixed pages, compressed variants, error statuses and slow responses."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so the client can reuse connections
+    connections = set()
+    in_flight = peak_in_flight = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, encoding=None, extra=()):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        for name, value in extra:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        StandInHandler.connections.add(self.client_address)
+        if self.path == "/page":
+            self._send(200, PAGE)
+        elif self.path == "/gzip":
+            self._send(200, gzip.compress(PAGE), "gzip")
+        elif self.path == "/deflate":
+            self._send(200, zlib.compress(PAGE), "deflate")
+        elif self.path == "/busy":
+            cls = StandInHandler
+            with cls.lock:
+                cls.in_flight += 1
+                cls.peak_in_flight = max(cls.peak_in_flight, cls.in_flight)
+            time.sleep(0.1)
+            with cls.lock:
+                cls.in_flight -= 1
+            self._send(200, PAGE)
+        elif self.path == "/bomb":
+            self._send(200, BOMB, "gzip")
+        elif self.path == "/cached":
+            self._send(200, PAGE, extra=[("Cache-Control", "max-age=60")])
+        elif self.path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._send(304, b"", extra=[("ETag", '"v1"')])
+            else:
+                self._send(200, PAGE, extra=[("Cache-Control", "max-age=0"), ("ETag", '"v1"')])
+        elif self.path == "/missing":
+            self._send(404, b"not found")
+        elif self.path == "/error":
+            self._send(500, b"server error")
+        elif self.path == "/slow":
+            time.sleep(1.5)  # no response within the client's socket timeout
+            self._send(200, PAGE)
+        elif self.path == "/trickle":
+            # Every read finishes well within the socket timeout, but the body never ends in time
+            self.send_response(200)
+            self.send_header("Content-Length", "1000")
+            self.end_headers()
+            for _ in range(1000):
+                self.wfile.write(b"x")
+                self.wfile.flush()
+                time.sleep(0.05)
+        else:
+            self._send(404, b"")
+
+class StandInServerTest(unittest.TestCase):
+    """Starts the stand-in server once per class and gives each test a fresh client."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StandInHandler.connections.clear()
+        self.client = HttpClient(timeout=0.5)
+
+    def tearDown(self):
+        self.client.close()
+
+class HttpClientTest(StandInServerTest):
+    def test_keep_alive_reuses_one_connection(self):
+        for _ in range(5):
+            self.assertEqual(self.client.get(self.base + "/page").body, PAGE)
+        stats = self.client.stats()
+        self.assertEqual(stats["connections_opened"], 1)
+        self.assertEqual(stats["connections_reused"], 4)
+        self.assertEqual(len(StandInHandler.connections), 1)
+
+    def test_gzip_and_deflate_are_decoded(self):
+        for path in ("/gzip", "/deflate"):
+            resp = self.client.get(self.base + path)
+            self.assertEqual(resp.body, PAGE, path)
+            self.assertLess(resp.received, len(PAGE), path)
+
+    def test_stream_decodes_gzip(self):
+        chunks = []
+        resp = self.client.stream(self.base + "/gzip", chunks.append)
+        self.assertTrue(resp.complete)
+        self.assertEqual("".join(chunks), PAGE.decode())
+
+    def test_error_statuses_return_none(self):
+        for path in ("/missing", "/error"):
+            self.assertIsNone(self.client.get_text(self.base + path), path)
+            self.assertIsNone(self.client.get_ok(self.base + path), path)
+        self.assertEqual(self.client.get_text(self.base + "/page"), PAGE.decode())
+
+    def test_unresponsive_server_times_out(self):
+        start = time.monotonic()
+        self.assertIsNone(self.client.get_text(self.base + "/slow"))
+        self.assertLess(time.monotonic() - start, 1.4)
+        self.assertEqual(self.client.stats()["errors"], 1)
+
+    def test_trickling_body_hits_the_total_timeout(self):
+        start = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            self.client.get(self.base + "/trickle", timeout=0.5)
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_trickling_stream_is_cut_at_the_default_timeout(self):
+        start = time.monotonic()
+        resp = self.client.stream(self.base + "/trickle", lambda text: None)
+        self.assertFalse(resp.complete)
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_stream_caps_decoded_bytes(self):
+        fed = []
+        resp = self.client.stream(self.base + "/bomb", lambda text: fed.append(len(text)), max_bytes=64 * 1024)
+        self.assertFalse(resp.complete)
+        self.assertLessEqual(sum(fed), 64 * 1024)
+
+@unittest.skipUnless(HAVE_HTTP2, "needs pip3 install 'httpx[http2]'")
+class Http2ClientTest(StandInServerTest):
+    # Against a plain-HTTP server httpx speaks HTTP/1.1, which still exercises the slot logic
+    def setUp(self):
+        StandInHandler.peak_in_flight = 0
+        self.client = Http2Client(max_per_host=2, timeout=2)
+
+    def _fetch_in_parallel(self, n=8):
+        bodies = []
+        threads = [threading.Thread(target=lambda: bodies.append(self.client.get(self.base + "/busy").body))
+                   for _ in range(n)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return bodies
+
+    def test_requests_per_host_are_capped(self):
+        self.assertEqual(self._fetch_in_parallel(), [PAGE] * 8)
+        self.assertEqual(StandInHandler.peak_in_flight, 2)
+
+    def test_host_limits_override_the_default(self):
+        self.client.close()
+        self.client = Http2Client(max_per_host=2, host_limits={"127.0.0.1": 1}, timeout=2)
+        self.assertEqual(self._fetch_in_parallel(4), [PAGE] * 4)
+        self.assertEqual(StandInHandler.peak_in_flight, 1)
+
+    def test_gzip_and_errors(self):
+        self.assertEqual(self.client.get(self.base + "/gzip").body, PAGE)
+        self.assertIsNone(self.client.get_text(self.base + "/missing"))
+        self.assertEqual(self.client.stats()["requests"], 2)
+
+    def test_stream_decodes_stops_early_and_caps_decoded_bytes(self):
+        chunks = []
+        self.assertTrue(self.client.stream(self.base + "/gzip", chunks.append).complete)
+        self.assertEqual("".join(chunks), PAGE.decode())
+        self.assertFalse(self.client.stream(self.base + "/page", lambda text: True).complete)
+        fed = []
+        resp = self.client.stream(self.base + "/bomb", lambda text: fed.append(len(text)), max_bytes=64 * 1024)
+        self.assertFalse(resp.complete)
+        self.assertLessEqual(sum(fed), 64 * 1024)
+
+class CachedStreamTest(StandInServerTest):
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.mkdtemp()
+        self.client.cache = HttpCache(os.path.join(self.dir, "http.sqlite"))
+
+    def tearDown(self):
+        self.client.cache.close()
+        shutil.rmtree(self.dir)
+        super().tearDown()
+
+    def test_stream_stores_the_prefix_it_read(self):
+        url = self.base + "/cached"
+        self.assertFalse(self.client.stream(url, lambda text: True).complete)
+        self.assertTrue(self.client.stream(url, lambda text: True).from_cache)
+        chunks = []
+        resp = self.client.stream(url, chunks.append)
+        self.assertTrue(resp.complete)
+        self.assertEqual("".join(chunks), PAGE.decode())
+        # The whole page is stored now, so a plain get is served from the cache
+        self.assertTrue(self.client.get(url).from_cache)
+        counters = self.client.cache.counters
+        self.assertEqual((counters["hits"], counters["misses"]), (2, 2))
+        self.assertEqual(self.client.stats()["requests"], 2)
+
+    def test_stream_revalidates_stale_entries(self):
+        url = self.base + "/etag"
+        for _ in range(2):
+            chunks = []
+            self.assertTrue(self.client.stream(url, chunks.append).complete)
+            self.assertEqual("".join(chunks), PAGE.decode())
+        counters = self.client.cache.counters
+        self.assertEqual((counters["hits"], counters["revalidated"], counters["misses"]), (0, 1, 1))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared keyword matcher against plain substring checks
+Run with: python3 -m pytest tests/ (or python3 -m unittest discover tests)
+"""
+
+import os
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from analyze_from_html import KEYWORD_MATCHER, SCAN_SLICE, KeywordMatcher, html_to_text  # noqa: E402
+from synthetic_pages import synthetic_page  # noqa: E402
+
+# Nested and overlapping keywords: "free" / "free pickup" / "free return pickup" / "pickup",
+# "was" inside other words, "% off" and "+ gst" with punctuation
+TRICKY = [
+    "free return pickup and free pickup at doorstep; pickup free",
+    "it wasn't on sale, the mrp was higher; 50% off + gst",
+    "warrantywarranty brand warranty manufacturer warranty extended warranty",
+    "deliverydelivery free delivery, free shipping",
+    "",
+]
+
+def occurrences(keyword, lower):
+    """Overlapping occurrences, like KeywordHits.count()."""
+    return sum(1 for _ in re.finditer("(?=%s)" % re.escape(keyword), lower))
+
+class KeywordMatcherTest(unittest.TestCase):
+    def assertMatchesSubstringChecks(self, lower, matcher=KEYWORD_MATCHER):
+        hits = matcher.scan(lower)
+        for k in matcher.keywords:
+            self.assertEqual(hits.has(k), k in lower, k)
+            self.assertEqual(hits.first(k), lower.find(k), k)
+            self.assertEqual(hits.count(k), occurrences(k, lower), k)
+            self.assertEqual(hits.has(k, 4000), k in lower[:4000], k)
+
+    def test_tricky_strings(self):
+        for lower in TRICKY:
+            self.assertMatchesSubstringChecks(lower)
+
+    def test_synthetic_pages(self):
+        for seed in range(4):
+            _, lower = html_to_text(synthetic_page(60_000, seed=seed))
+            self.assertMatchesSubstringChecks(lower)
+
+    def test_keywords_straddling_scan_slices(self):
+        for offset in (1, 3, 7, 15):
+            lower = "x" * (SCAN_SLICE - offset) + "free return pickup" + "y" * (SCAN_SLICE - 4) + "warranty"
+            self.assertMatchesSubstringChecks(lower)
+
+    def test_keywords_the_matcher_was_not_built_with(self):
+        hits = KeywordMatcher(["free"]).scan("free pickup, free pickup")
+        self.assertEqual((hits.first("pickup"), hits.count("pickup")), (5, 2))
+        self.assertFalse(hits.has("refund"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the browser search cache and the stale-while-revalidate path in compare_across_sites
+Run with: python3 -m pytest tests/ (or python3 -m unittest discover tests)
+"""
+
+import os
+import sys
+import time
+import shutil
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import compare_across_sites  # noqa: E402
+from search_cache import SearchCache  # noqa: E402
+
+URLS = ["https://shop.example/p/1", "https://shop.example/p/2"]
+
+class SearchCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "search.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_fresh_stale_and_expired(self):
+        cache = SearchCache(self.path, ttl=60, stale_ttl=60)
+        cache.put("shop.example", "Wireless  Earbuds", 3, URLS)
+        self.assertEqual(cache.get("shop.example", "earbuds wireless", 3), (URLS, "fresh"))
+        with mock.patch("time.time", return_value=time.time() + 90):
+            self.assertEqual(cache.get("shop.example", "wireless earbuds", 3), (URLS, "stale"))
+        with mock.patch("time.time", return_value=time.time() + 150):
+            self.assertEqual(cache.get("shop.example", "wireless earbuds", 3), (None, None))
+        self.assertEqual(cache.get("shop.example", "wireless earbuds", 5), (None, None))
+        cache.close()
+
+    def test_empty_results_are_not_stored(self):
+        cache = SearchCache(self.path)
+        self.assertFalse(cache.put("shop.example", "earbuds", 3, []))
+        self.assertEqual(cache.get("shop.example", "earbuds", 3), (None, None))
+        cache.close()
+
+    def test_one_refresh_lease_across_connections(self):
+        first, second = SearchCache(self.path), SearchCache(self.path)
+        first.put("shop.example", "earbuds", 3, URLS)
+        self.assertTrue(first.claim_refresh("shop.example", "earbuds", 3))
+        self.assertFalse(second.claim_refresh("shop.example", "earbuds", 3))
+        first.release_refresh("shop.example", "earbuds", 3)
+        self.assertTrue(second.claim_refresh("shop.example", "earbuds", 3))
+        # Storing the refreshed result ends the lease too
+        second.put("shop.example", "earbuds", 3, URLS[:1])
+        self.assertTrue(first.claim_refresh("shop.example", "earbuds", 3))
+        first.close()
+        second.close()
+
+class StaleSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = SearchCache(os.path.join(self.dir, "search.sqlite"), ttl=0)  # every entry is stale
+        self.cache.put("shop.example", "earbuds", 3, URLS)
+        self.browsers = []
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.dir)
+
+    async def _browser(self, cmd, timeout):
+        self.browsers.append(cmd)
+        await asyncio.sleep(self.browser_seconds)
+        return 0, "{}", ""
+
+    def _run(self, budget=None):
+        async def run():
+            limits = compare_across_sites.Limits(deadline=compare_across_sites.Deadline(budget))
+            start = time.monotonic()
+            urls = await compare_across_sites.fetch_with_browser("shop.example", "earbuds", 3, limits)
+            answered = time.monotonic() - start
+            await limits.finish_background()
+            return urls, answered, time.monotonic() - start
+
+        with mock.patch.object(compare_across_sites, "SEARCH_CACHE", self.cache), \
+                mock.patch.object(compare_across_sites, "run_subprocess", self._browser), \
+                mock.patch.object(compare_across_sites, "BACKGROUND_GRACE", 0.2):
+            return asyncio.run(run())
+
+    def test_stale_entry_is_served_while_one_refresh_runs(self):
+        self.browser_seconds = 0.05
+        urls, answered, _ = self._run()
+        self.assertEqual(urls, URLS)
+        self.assertLess(answered, 0.05)
+        self.assertEqual(len(self.browsers), 1)
+        self.assertIn("--search-cache", self.browsers[0])
+
+    def test_slow_refresh_is_cut_at_the_grace_period_and_releases_its_lease(self):
+        self.browser_seconds = 5
+        urls, _, total = self._run()
+        self.assertEqual(urls, URLS)
+        self.assertLess(total, 1.0)
+        self.assertTrue(self.cache.claim_refresh("shop.example", "earbuds", 3))
+
+if __name__ == "__main__":
+    unittest.main()
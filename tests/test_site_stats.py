@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for per-site stats and site selection
+Run with: python3 -m pytest tests/ (or python3 -m unittest discover tests)
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from site_stats import PROBE_INTERVAL, SiteStats  # noqa: E402
+
+SITES = ["A", "B", "C", "D", "E"]
+
+class SiteStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.stats = SiteStats(os.path.join(self.dir, "sites.sqlite"))
+        self.now = time.time()
+
+    def tearDown(self):
+        self.stats.close()
+        shutil.rmtree(self.dir)
+
+    def record(self, site, status="ok", seconds=5.0, products=3, runs=3):
+        for _ in range(runs):
+            self.stats.record(site, status, seconds, products)
+
+    def names(self, plan):
+        return [name for name, _, _ in plan]
+
+    def test_ranked_by_products_per_run_then_latency(self):
+        self.record("A", products=1)
+        self.record("B", products=3, seconds=20)
+        self.record("C", products=3, seconds=5)
+        plan = self.stats.plan(["A", "B", "C"], max_sites=3, now=self.now)
+        self.assertEqual(plan, [("C", 10.0, "history"), ("B", 30.0, "history"), ("A", 10.0, "history")])
+
+    def test_cold_start_order_until_min_runs(self):
+        self.record("C", products=5)
+        self.record("A", runs=1)
+        plan = self.stats.plan(["A", "B", "C"], max_sites=2, priority=["B", "A"], now=self.now)
+        self.assertEqual(plan, [("B", None, "default"), ("A", None, "default")])
+
+    def test_demoted_sites_go_last_but_still_fill_the_plan(self):
+        for site in ("A", "B", "C"):
+            self.record(site, seconds=30)
+        self.record("D", status="failed", products=0)
+        plan = self.stats.plan(["A", "B", "C", "D"], max_sites=3, budget=20, now=self.now)
+        self.assertEqual([reason for _, _, reason in plan], ["demoted"] * 3)
+        plan = self.stats.plan(["A", "B", "C", "D"], max_sites=3, now=self.now)
+        self.assertEqual(self.names(plan), ["A", "B", "C"])
+        self.assertNotIn("D", self.names(plan))
+
+    def test_untried_sites_come_before_demoted_ones(self):
+        self.record("A")
+        self.record("B", status="failed", products=0)
+        plan = self.stats.plan(["A", "B", "C"], max_sites=2, now=self.now)
+        self.assertEqual(plan, [("A", 10.0, "history"), ("C", None, "untried")])
+
+    def test_first_probe_comes_one_interval_after_the_first_plan(self):
+        for site in SITES:
+            self.record(site)
+        self.assertEqual(len(self.stats.plan(SITES, max_sites=3, now=self.now)), 3)
+        self.assertEqual(len(self.stats.plan(SITES, max_sites=3, now=self.now + 60)), 3)
+        plan = self.stats.plan(SITES, max_sites=3, now=self.now + PROBE_INTERVAL)
+        self.assertEqual(plan[-1], ("D", 10.0, "probe"))
+        # Once per interval, and the next one goes to the site left out longest
+        self.assertEqual(len(self.stats.plan(SITES, max_sites=3, now=self.now + PROBE_INTERVAL + 60)), 3)
+        plan = self.stats.plan(SITES, max_sites=3, now=self.now + 2 * PROBE_INTERVAL)
+        self.assertEqual(plan[-1], ("E", 10.0, "probe"))
+
+    def test_budget_cut_offs_are_left_out_of_the_samples(self):
+        self.record("A", seconds=40)
+        self.record("A", status="budget_cut", seconds=3, products=0, runs=5)
+        summary = self.stats.summary("A")
+        self.assertEqual((summary["runs"], summary["budget_cuts"]), (3, 5))
+        self.assertEqual((summary["p95_s"], summary["success_rate"]), (40.0, 1.0))
+        self.record("B", status="budget_cut", runs=2)
+        self.assertIsNone(self.stats.summary("B"))
+
+    def test_window_keeps_the_latest_runs(self):
+        self.record("A", status="failed", products=0, runs=30)
+        self.record("A", runs=15)
+        self.assertEqual(self.stats.summary("A")["success_rate"], 0.5)
+
+if __name__ == "__main__":
+    unittest.main()